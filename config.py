@@ -52,16 +52,156 @@ RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-12-v2"
 PDF_DIR = "./pdfs"
 DB_PATH = "./vector_db"
 
+# ===== EXTRACTION CACHE =====
+# Bereinigte Seitentexte und Tabellen pro PDF, Schlüssel: SHA-256 des
+# Dateiinhalts + Extraktor-Version (siehe rag/extraction_cache.py).
+EXTRACT_CACHE_ENABLED = True
+EXTRACT_CACHE_DIR = "./cache/extract"
+
 # ===== CHUNKING =====
 CHUNK_SIZE = 120
 CHUNK_OVERLAP = 50
 
+# ===== CHUNK STORE =====
+# Chunk-Texte liegen nicht in Chroma, sondern als Offsets (Seite, Start, Ende)
+# in einen einmal gespeicherten Seitentext (rag/chunk_store.py). Die Pipeline
+# reicht nur Chunk-IDs weiter und erzeugt Texte erst für Reranking/Prompt.
+CHUNK_STORE_ENABLED = True
+CHUNK_STORE_DIR = "chunk_store"   # relativ zum Pfad der Vektor-DB, je Collection ein Unterordner
+# Dateibasierte Indizes (Dokumente, Tabellen, Agenda, Nachbarschaftsgraph)
+# liegen ebenfalls je Collection getrennt: <DB_PATH>/<INDEX_DIR>/<collection>/
+INDEX_DIR = "indexes"
+
+# ===== NEAR-DUPLICATE ELIMINATION =====
+# MinHash/LSH über Wort-Shingles; nahezu gleiche Chunks (Briefköpfe,
+# Fußzeilen, Boilerplate) werden vor dem Embedding zusammengefasst.
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.8          # geschätzte Jaccard-Ähnlichkeit (Wort-Shingles)
+DEDUP_NUM_PERM = 64            # Anzahl MinHash-Funktionen
+DEDUP_BANDS = 16               # LSH-Bänder (num_perm / bands Zeilen je Band)
+DEDUP_SHINGLE_WORDS = 3
+
 # ===== RETRIEVAL =====
 TOP_K = 20
 RERANK_TOP_N = 10
+COMBINE_MAX_CHUNKS = 15      # Chunks im Prompt der Antwort-Kombination
+
+# ===== VECTOR INDEX (HNSW) =====
+# Gilt für neu angelegte Collections (bestehende behalten Space/M; neu
+# aufbauen per Re-Ingestion oder tests/manage_shards.py reindex).
+# Embedder liefert L2-normierte Vektoren -> Kosinus-Distanz.
+HNSW_SPACE = "cosine"            # "cosine" | "l2" | "ip"
+HNSW_M = 16                      # Kanten pro Knoten
+HNSW_CONSTRUCTION_EF = 200       # Kandidatenliste beim Aufbau
+HNSW_SEARCH_EF = 64              # Kandidatenliste bei der Suche (>= TOP_K); Recall vs. Latenz:
+                                 #   python -m tests.sweep_hnsw_ef --efs 10,20,40,80,160
+VDB_ADD_BATCH_SIZE = 0           # 0 = maximale Batchgröße des Chroma-Clients
+
+# ===== SHARDING =====
+# Mehrere Chroma-Collections ("Shards") statt einer einzigen "pdf"-Collection,
+# z.B. eine pro Senatssitzung (rag/sharded_retriever.py). Suchen laufen
+# parallel über alle Shards, die Top-k werden zusammengeführt.
+# Verwaltung: python -m tests.manage_shards list | drop <shard> | reindex <shard>
+VDB_SHARDING = False
+SHARD_PREFIX = "pdf"                 # Collection-Name: <prefix>-<shard>
+SHARD_KEY_PATTERN = r"^(\d+)-"      # Shard aus dem Dateinamen, "101-TOP 03 ....pdf" -> "s101"
+SHARD_DEFAULT = "misc"               # für Dateien ohne Treffer
+SHARD_SEARCH_WORKERS = 8
+
+# ===== HIERARCHICAL RETRIEVAL =====
+# Zweistufige Suche für große Korpora: zuerst die DOC_SELECT_TOP_N PDFs mit
+# dem ähnlichsten Dokument-Vektor (Mittelwert der Chunk-Embeddings,
+# rag/doc_index.py), danach exakte Chunk-Suche nur innerhalb dieser PDFs.
+# Der Dokument-Index wird bei jeder Ingestion aktualisiert.
+HIERARCHICAL_RETRIEVAL = False
+DOC_INDEX_FILE = "doc_index.npz"   # in INDEX_DIR/<collection>
+DOC_SELECT_TOP_N = 8
+
+# ===== TABLE ROW INDEX =====
+# Tabellenzeilen (PyMuPDF find_tables) werden separat von den Text-Chunks
+# indiziert; passende Zeilen kommen direkt in den Kontext (rag/table_index.py).
+TABLE_INDEX_ENABLED = True
+TABLE_INDEX_FILE = "table_rows.jsonl.gz"   # in INDEX_DIR/<collection>
+TABLE_LOOKUP_TOP_N = 2
+TABLE_LOOKUP_MIN_SCORE = 0.6     # Anteil der (IDF-gewichteten) Query-Tokens in der Zeile
+
+# ===== AGENDA INDEX =====
+# Bei der Ingestion: TOP-Nummern, Titel und Felder (Beschlussempfehlung,
+# Berichterstattung, Rechtliche Grundlage, Anlage, ...) sowie
+# "Beschluss Nr."-Erwähnungen je Sitzung (rag/agenda_index.py). Mit
+# AGENDA_FAST_PATH beantwortet PDFRAG.query Fragen nach genau einem Feld
+# eines TOP direkt aus dem Index (ohne Embedding, Retrieval und LLM);
+# alle anderen Fragen laufen durch die normale Pipeline.
+AGENDA_INDEX_ENABLED = True
+AGENDA_INDEX_FILE = "agenda_index.json"   # in INDEX_DIR/<collection>
+AGENDA_FILE_PATTERN = r"Tagesordnung"     # Dateinamen von Tagesordnungen (Vorrang)
+AGENDA_FAST_PATH = True
+
+# ===== SEMANTIC ANSWER CACHE =====
+# PDFRAG.query beantwortet sinngleiche Fragen (Kosinus-Ähnlichkeit der
+# Frage-Embeddings) aus dem Cache (rag/answer_cache.py). Jede Ingestion
+# schreibt eine neue Ingest-Version in die DB und leert damit den Cache.
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_THRESHOLD = 0.92    # Kosinus-Ähnlichkeit ab der eine Frage als Paraphrase gilt
+ANSWER_CACHE_MAX_ENTRIES = 256
+INGEST_VERSION_FILE = "ingest_version"   # relativ zum Pfad der Vektor-DB
+
+# ===== RERANK MICRO-BATCHING =====
+# Sammelt (Query, Dokument)-Paare paralleler Anfragen für einen gemeinsamen
+# predict-Aufruf des CrossEncoders (siehe rag/rerank_batcher.py).
+# Lohnt sich nur, wenn mehrere Anfragen gleichzeitig laufen.
+RERANK_MICRO_BATCHING = False
+RERANK_BATCH_MAX_PAIRS = 64      # Obergrenze Paare pro predict-Aufruf
+RERANK_BATCH_MAX_WAIT_MS = 5.0   # max. Wartezeit auf weitere Anfragen
+
+# ===== RERANK CASCADE =====
+# Stufe 1: die Vektor-Ähnlichkeit (1 - Distanz) entscheidet, wie viele der
+# besten RERANK_TOP_N Treffer überhaupt cross-encodet werden: mindestens
+# RERANK_MIN_N, danach nur Kandidaten höchstens RERANK_MAX_DROP unter dem
+# besten Treffer, abgeschnitten am größten Sprung >= RERANK_KNEE_GAP.
+# Stufe 2 (enhanced): die gefilterten Treffer aller Gap-Queries werden in
+# EINEM CrossEncoder-Aufruf bewertet und mit dem ersten Pass nach Score
+# sortiert, statt unsortiert angehängt zu werden (rag/rerank_cascade.py).
+RERANK_CASCADE = True
+RERANK_MIN_N = 4
+RERANK_MAX_DROP = 0.15
+RERANK_KNEE_GAP = 0.05
+
+# ===== QUERY DEADLINE =====
+# Zeitbudget pro PDFRAG.query (Sekunden, None = unbegrenzt; pro Aufruf per
+# budget_s= überschreibbar). Optionale Stufen (Reranking, Gap-Analyse +
+# zweiter Retrieval-Pass, Fail-Safe) entfallen, wenn die Restzeit ihre
+# erwartete Dauer plus die noch nötige Antwort-Kombination nicht abdeckt
+# (rag/deadline.py). Erwartete Dauern: gleitender Mittelwert der gemessenen
+# Stufen, anfangs diese Defaults.
+QUERY_BUDGET_S = None
+STAGE_COST_DEFAULTS_S = {
+    "rerank": 0.3,
+    "gap": 5.0,
+    "combine": 5.0,
+    "failsafe": 10.0,
+}
+STAGE_COST_EWMA_ALPHA = 0.2
+
+# ===== NEIGHBOR GRAPH / CONTEXT EXPANSION =====
+# Bei jeder Ingestion: kNN-Graph über alle Chunk-Embeddings plus
+# Vorgänger/Nachfolger je PDF-Seite (rag/neighbor_graph.py). Im Modus
+# RAG_MODE = "expand" wird der Kontext von den EXPAND_SEEDS besten
+# Reranking-Treffern aus entlang dieses Graphen erweitert, statt per LLM
+# Gap-Queries zu erzeugen und erneut zu suchen – ohne zusätzliche
+# Embedding- oder LLM-Aufrufe.
+NEIGHBOR_GRAPH_ENABLED = True
+NEIGHBOR_GRAPH_FILE = "neighbor_graph.npz"   # in INDEX_DIR/<collection>
+NEIGHBOR_GRAPH_K = 8
+NEIGHBOR_GRAPH_BATCH = 256       # Zeilen pro Block der kNN-Berechnung
+EXPAND_SEEDS = 3
+EXPAND_SPAN = 1                  # Sequenz-Nachbarn je Richtung
+EXPAND_KNN = 3                   # kNN-Nachbarn je Chunk
+EXPAND_MIN_SIM = 0.75
+EXPAND_HOPS = 1
 
 # ===== RAG MODES =====
-RAG_MODE = "enhanced"        # "simple" | "enhanced"
+RAG_MODE = "enhanced"        # "simple" | "enhanced" | "expand"
 ENABLE_GAP_RETRIEVAL = True
 
 
@@ -73,6 +213,7 @@ def set_rag_mode(mode: str, enable_gap: bool):
     Beispiel:
         set_rag_mode("simple", False)
         set_rag_mode("enhanced", True)
+        set_rag_mode("expand", False)
     """
     global RAG_MODE, ENABLE_GAP_RETRIEVAL
     RAG_MODE = mode
@@ -83,6 +224,34 @@ def set_rag_mode(mode: str, enable_gap: bool):
 OLLAMA_MODEL = "llama3.2"
 OLLAMA_TEMPERATURE = 0.25
 
+# Adresse des Ollama-Servers. Leer = Default des ollama-Clients.
+# Für reproduzierbare Performance-Messungen ohne echte Modelle kann hier der
+# lokale Stand-in eingetragen werden (siehe tests/ollama_stub.py), z.B.:
+#   python -m tests.ollama_stub --port 11500
+#   RAG_OLLAMA_HOST=http://127.0.0.1:11500 python run_query.py
+# Hinweis: Der ollama-Client liest OLLAMA_HOST beim Import, config muss also
+# vor rag.* importiert werden (so wie in allen Einstiegsskripten).
+OLLAMA_HOST = os.environ.get("RAG_OLLAMA_HOST", "")
+if OLLAMA_HOST:
+    os.environ["OLLAMA_HOST"] = OLLAMA_HOST
+
+# ===== OLLAMA ENDPOINT POOL =====
+# Mehrere Ollama-Instanzen (kommagetrennt, z.B. über RAG_OLLAMA_HOSTS):
+# Chat-Anfragen und Embedding-Batches gehen an den gesunden Host mit den
+# wenigsten laufenden Anfragen; nach einem Fehler wird der Host als
+# ungesund markiert und die Anfrage auf einem anderen wiederholt. Ein
+# Hintergrund-Thread prüft ungesunde Hosts regelmäßig (GET /api/version).
+# Leer = nur OLLAMA_HOST bzw. Default des ollama-Clients (rag/ollama_pool.py).
+#   python -m tests.ollama_stub --port 11500 --instances 3
+#   RAG_OLLAMA_HOSTS=http://127.0.0.1:11500,http://127.0.0.1:11501,http://127.0.0.1:11502
+OLLAMA_HOSTS = [h.strip() for h in os.environ.get("RAG_OLLAMA_HOSTS", "").split(",") if h.strip()]
+OLLAMA_MAX_ATTEMPTS = 3            # Versuche pro Anfrage (je auf einem anderen Host)
+OLLAMA_HEALTH_INTERVAL_S = 10.0
+OLLAMA_HEALTH_TIMEOUT_S = 2.0
+OLLAMA_REQUEST_TIMEOUT_S = 300.0
+OLLAMA_EMBED_BATCH_SIZE = 32       # Texte pro /api/embed-Aufruf
+OLLAMA_PARALLEL_PER_HOST = 2       # gleichzeitige Embedding-Batches je Host
+
 # ===== LOGGING =====
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -93,6 +262,13 @@ LOG_FILE = os.path.join(
     f"pdf_rag_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 )
 
+# Chunk-Texte im Log: "full" = vollständige Texte an jeder Stelle (alt),
+# "ids" = nur Chunk-IDs, Scores und Ränge; jeder Text landet einmal pro Lauf
+# im Chunk-Wörterbuch neben der Logdatei (rag/chunk_log.py). Volltext-Log
+# bei Bedarf: python -m tests.rehydrate_log <logdatei>
+LOG_CHUNKS = os.environ.get("RAG_LOG_CHUNKS", "ids")   # "ids" | "full"
+CHUNK_DICT_FILE = LOG_FILE[:-len(".log")] + ".chunks.jsonl"
+
 
 def log_line(msg: str):
     """
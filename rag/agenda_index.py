@@ -0,0 +1,294 @@
+# rag/agenda_index.py
+
+import bisect
+import json
+import os
+import re
+import threading
+
+from config import log_line, AGENDA_FILE_PATTERN, SHARD_KEY_PATTERN
+
+# Beginn eines Tagesordnungspunkts ("TOP 4", "TOP 04")
+_TOP_RE = re.compile(r"\bTOP\s+(\d{1,3})\b")
+
+# Feldbezeichnungen innerhalb eines TOP (Schreibweise im Index -> Muster)
+_FIELDS = {
+    "Rechtliche Grundlage": r"Rechtliche\s+Grundlagen?",
+    "Berichterstattung": r"Berichterstattung",
+    "Beschlussempfehlung": r"Beschlussempfehlung",
+    "Anlage": r"Anlagen?",
+    "Sachstand": r"Sachstand",
+    "Begründung": r"Begründung\s+für\s+die\s+Aufnahme\s+des\s+TOP",
+}
+_FIELD_RE = re.compile(
+    "|".join(f"(?P<f{i}>{pat})\\s*:" for i, pat in enumerate(_FIELDS.values()))
+)
+_FIELD_NAMES = list(_FIELDS)
+
+# Abschnittsgrenzen der Tagesordnung, die nicht mehr zum Titel gehören
+_BREAK_RE = re.compile(r"Mittagspause|(?:Nicht|Hochschul)?öffentlicher\s+Teil\b", re.IGNORECASE)
+
+_BESCHLUSS_RE = re.compile(r"Beschluss\s*(?:Nr\.?|Nummer)\s*:?\s*(\d[\d./-]*\d)")
+
+_SESSION_RE = re.compile(SHARD_KEY_PATTERN)
+_AGENDA_FILE_RE = re.compile(AGENDA_FILE_PATTERN, re.IGNORECASE)
+
+MAX_TITLE_CHARS = 200
+MAX_FIELD_CHARS = 1500
+
+# Frage -> gesuchtes Feld; spezifische Muster zuerst. "_title" = Titel,
+# "_item" = vollständiger Eintrag des TOP
+_INTENTS = [
+    (re.compile(r"beschlussempfehlung", re.I), "Beschlussempfehlung"),
+    (re.compile(r"berichterstatt", re.I), "Berichterstattung"),
+    (re.compile(r"rechtliche\w*\s+grundlage|rechtsgrundlage", re.I), "Rechtliche Grundlage"),
+    (re.compile(r"\banlage", re.I), "Anlage"),
+    (re.compile(r"sachstand", re.I), "Sachstand"),
+    (re.compile(r"\bgrund\b.*\baufgenommen|\bbegründung", re.I), "Begründung"),
+    (re.compile(r"\binhalt", re.I), "_item"),
+    (re.compile(r"\btitel|\bthema\b|\bworum\b", re.I), "_title"),
+]
+
+_QUESTION_SESSION_RE = re.compile(r"\b(\d{1,4})\.\s*(?:Senats)?[Ss]itzung")
+
+
+def session_of(pdf_name: str) -> str:
+    """Sitzung aus dem Dateinamen (SHARD_KEY_PATTERN), z.B. "101"; sonst ""."""
+    m = _SESSION_RE.search(pdf_name)
+    return m.group(1) if m else ""
+
+
+def _clean(text: str, limit: int) -> str:
+    text = re.sub(r"\s+", " ", text).strip(" ;,")
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+def extract_agenda_items(pdf_name: str, pages) -> list[dict]:
+    """
+    Tagesordnungspunkte eines PDFs aus den extrahierten Seiten.
+
+    Der Seitentext wird an "TOP <n>" geteilt; je Abschnitt werden Titel
+    (Text bis zum ersten Feld bzw. zur nächsten Abschnittsgrenze) und Felder
+    wie "Beschlussempfehlung: ..." erkannt. Erwähnungen ohne Felder zählen
+    nur in Tagesordnungen (AGENDA_FILE_PATTERN), sonst wären Querverweise
+    ("siehe TOP 3") Einträge. Mehrfach erwähnte TOPs werden
+    zusammengeführt (erstes Vorkommen je Feld gilt).
+
+    Rückgabe
+    --------
+    list[dict]
+        {"top", "title", "fields", "text", "page"} je TOP.
+    """
+    starts: list[int] = []
+    pnos: list[int] = []
+    parts: list[str] = []
+    pos = 0
+    for pno, text in pages:
+        starts.append(pos)
+        pnos.append(pno)
+        parts.append(text)
+        pos += len(text) + 1
+    full = " ".join(parts)
+    is_agenda = bool(_AGENDA_FILE_RE.search(pdf_name))
+
+    matches = list(_TOP_RE.finditer(full))
+    items: dict[str, dict] = {}
+    for i, m in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(full)
+        segment = full[m.end():end]
+
+        fields: dict[str, str] = {}
+        labels = list(_FIELD_RE.finditer(segment))
+        for j, lm in enumerate(labels):
+            name = _FIELD_NAMES[int(lm.lastgroup[1:])]
+            value_end = labels[j + 1].start() if j + 1 < len(labels) else len(segment)
+            brk = _BREAK_RE.search(segment, lm.end(), value_end)
+            value = _clean(segment[lm.end():brk.start() if brk else value_end], MAX_FIELD_CHARS)
+            if value:
+                fields.setdefault(name, value)
+
+        if not fields and not is_agenda:
+            continue
+
+        title_end = labels[0].start() if labels else len(segment)
+        brk = _BREAK_RE.search(segment, 0, title_end)
+        title = _clean(segment[:brk.start() if brk else title_end], MAX_TITLE_CHARS)
+        body_end = brk.start() if brk and not labels else len(segment)
+
+        top = str(int(m.group(1)))
+        page = pnos[bisect.bisect_right(starts, m.start()) - 1] if pnos else 0
+        item = items.get(top)
+        if item is None:
+            items[top] = {
+                "top": top,
+                "title": title,
+                "fields": fields,
+                "text": _clean(f"TOP {top} {segment[:body_end]}", MAX_FIELD_CHARS),
+                "page": page,
+            }
+            continue
+        for name, value in fields.items():
+            item["fields"].setdefault(name, value)
+        if not item["title"]:
+            item["title"] = title
+    return list(items.values())
+
+
+def extract_beschluesse(pages) -> list[dict]:
+    """Erwähnungen "Beschluss Nr. <nummer>" mit dem zugehörigen Satz."""
+    out = []
+    for pno, text in pages:
+        for m in _BESCHLUSS_RE.finditer(text):
+            stop = text.find(". ", m.end(), m.end() + 400)
+            sentence = text[m.start():stop + 1 if stop >= 0 else m.end() + 400]
+            out.append({"nr": m.group(1), "text": _clean(sentence, MAX_FIELD_CHARS), "page": pno})
+    return out
+
+
+class AgendaIndex:
+    def __init__(self, path: str):
+        """
+        Index über Tagesordnungspunkte und Beschlüsse der Senatsunterlagen.
+
+        Bei der Ingestion werden je PDF TOP-Nummer, Titel und Felder
+        (Beschlussempfehlung, Berichterstattung, Rechtliche Grundlage,
+        Anlage, ...) sowie "Beschluss Nr."-Erwähnungen extrahiert und unter
+        (Sitzung, TOP) bzw. Beschlussnummer abgelegt. Passende Fragen
+        beantwortet lookup() direkt aus dem Index, ohne Retrieval und LLM.
+
+        Gespeichert wird pro Datei die Liste ihrer Einträge (JSON); die
+        Schlüssel-Sicht wird beim Laden/Speichern aufgebaut. Einträge aus
+        Tagesordnungen haben Vorrang, fehlende Felder kommen aus den
+        TOP-Unterlagen derselben Sitzung.
+
+        Parameter
+        ---------
+        path : str
+            Datei des Index (z.B. <DB_PATH>/indexes/pdf/agenda_index.json).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # file -> {"items": [...], "beschluesse": [...]}
+        self._files: dict[str, dict] = {}
+        self._items: dict[tuple[str, str], dict] = {}
+        self._beschluesse: dict[str, dict] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            self._files = json.load(f)
+        self._rebuild()
+        log_line(f"[AGENDA_INDEX] geladen path={self.path} tops={len(self._items)}")
+
+    def _rebuild(self):
+        items: dict[tuple[str, str], dict] = {}
+        beschluesse: dict[str, dict] = {}
+        # Tagesordnungen zuerst, damit ihre Titel und Felder Vorrang haben
+        order = sorted(self._files, key=lambda f: (not _AGENDA_FILE_RE.search(f), f))
+        for file in order:
+            session = session_of(file)
+            for it in self._files[file]["items"]:
+                key = (session, it["top"])
+                merged = items.get(key)
+                if merged is None:
+                    items[key] = {**it, "fields": dict(it["fields"]), "session": session, "file": file}
+                    continue
+                for name, value in it["fields"].items():
+                    merged["fields"].setdefault(name, value)
+                if not merged["title"]:
+                    merged["title"] = it["title"]
+            for b in self._files[file]["beschluesse"]:
+                beschluesse.setdefault(b["nr"], {**b, "file": file})
+        self._items = items
+        self._beschluesse = beschluesse
+
+    def reload(self):
+        """Verwirft den Stand im Speicher und liest die Datei neu."""
+        with self._lock:
+            self._files = {}
+            self._items = {}
+            self._beschluesse = {}
+            self._load()
+
+    def set_document(self, file: str, pages):
+        """Extrahiert die Einträge eines PDFs und ersetzt die bisherigen."""
+        pages = list(pages)
+        items = extract_agenda_items(file, pages)
+        beschluesse = extract_beschluesse(pages)
+        with self._lock:
+            if items or beschluesse:
+                self._files[file] = {"items": items, "beschluesse": beschluesse}
+            else:
+                self._files.pop(file, None)
+        return len(items)
+
+    def save(self):
+        """Schreibt den Index atomar auf die Platte und baut die Schlüssel neu auf."""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp{os.getpid()}"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._files, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._rebuild()
+        log_line(
+            f"[AGENDA_INDEX] gespeichert path={self.path} tops={len(self._items)} "
+            f"beschluesse={len(self._beschluesse)}"
+        )
+
+    def _session_for(self, question: str, top: str) -> str | None:
+        m = _QUESTION_SESSION_RE.search(question)
+        if m:
+            return m.group(1)
+        sessions = {s for s, t in self._items if t == top}
+        # Mehrdeutig (TOP in mehreren Sitzungen) -> keine Direktantwort
+        return sessions.pop() if len(sessions) == 1 else None
+
+    def lookup(self, question: str) -> dict | None:
+        """
+        Direktantwort für Fragen nach einem Feld genau eines TOP (bzw. nach
+        einem Beschluss mit Nummer), sonst None.
+
+        Rückgabe
+        --------
+        dict | None
+            {"answer": str, "source": "datei:seite", "key": str}
+        """
+        m = _BESCHLUSS_RE.search(question)
+        if m and m.group(1) in self._beschluesse:
+            b = self._beschluesse[m.group(1)]
+            return {"answer": b["text"], "source": f"{b['file']}:{b['page']}", "key": f"beschluss:{b['nr']}"}
+
+        tops = {str(int(t)) for t in _TOP_RE.findall(question)}
+        if len(tops) != 1:
+            return None
+        top = tops.pop()
+        field = next((name for pattern, name in _INTENTS if pattern.search(question)), None)
+        if field is None:
+            return None
+        session = self._session_for(question, top)
+        item = self._items.get((session, top)) if session is not None else None
+        if item is None:
+            return None
+
+        if field == "_title":
+            answer = f"TOP {top} {item['title']}" if item["title"] else None
+        elif field == "_item":
+            answer = item["text"]
+        else:
+            value = item["fields"].get(field)
+            answer = f"{field}: {value}" if value else None
+        if answer is None:
+            return None
+        return {
+            "answer": answer,
+            "source": f"{item['file']}:{item['page']}",
+            "key": f"{session}:TOP {top}:{field}",
+        }
@@ -0,0 +1,174 @@
+# rag/answer_cache.py
+
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from config import log_line, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_THRESHOLD, INGEST_VERSION_FILE
+
+
+# Zahlen einer Frage (TOP, Beschluss-Nr., Sitzung, Paragraph, Jahr, ...)
+_NUMBER_RE = re.compile(r"\d+(?:[./-]\d+)*")
+
+
+def question_key(question: str) -> frozenset[str]:
+    """
+    Zahlen der Frage ohne führende Nullen ("TOP 04" = "TOP 4"). Fragen,
+    die sich nur darin unterscheiden, liegen im Embedding-Raum fast
+    aufeinander, meinen aber einen anderen TOP bzw. Beschluss.
+    """
+    return frozenset(n.lstrip("0") or "0" for n in _NUMBER_RE.findall(question))
+
+
+def read_ingest_version(db_path: str) -> str:
+    """Aktuelle Ingest-Version der Datenbank ("" = noch nie geschrieben)."""
+    try:
+        with open(os.path.join(db_path, INGEST_VERSION_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_ingest_version(db_path: str) -> str:
+    """Setzt nach einer Ingestion eine neue Version (macht alle Antwort-Caches ungültig)."""
+    version = f"{datetime.now().isoformat(timespec='seconds')}-{uuid.uuid4().hex[:8]}"
+    os.makedirs(db_path, exist_ok=True)
+    path = os.path.join(db_path, INGEST_VERSION_FILE)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, path)
+    return version
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+    ):
+        """
+        Cache für Antworten auf sinngleiche Fragen.
+
+        Verglichen wird das (normierte) Embedding einer neuen Frage per
+        Kosinus-Ähnlichkeit mit den Embeddings bereits beantworteter Fragen
+        desselben Modus. Ab `threshold` gilt die Frage als Paraphrase und die
+        gespeicherte Antwort samt Quell-Chunk-IDs wird zurückgegeben – aber
+        nur, wenn beide Fragen dieselben Zahlen enthalten (question_key()),
+        sonst beantwortet der Cache "TOP 5" mit der Antwort zu "TOP 4".
+
+        Der Cache hält höchstens `max_entries` Einträge (Verdrängung des am
+        längsten nicht genutzten Eintrags) und leert sich, sobald sich die
+        Ingest-Version von `db_path` ändert (neue Ingestion, auch aus einem
+        anderen Prozess).
+        """
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self.threshold = float(threshold)
+        self._lock = threading.Lock()
+        self._clock = 0
+        self._version = read_ingest_version(db_path)
+        self._embs: np.ndarray | None = None      # (max_entries, dim), Zeilen = Slots
+        self._entries: list[dict | None] = [None] * self.max_entries
+        self._last_used = np.zeros(self.max_entries, dtype=np.int64)
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self):
+        version = read_ingest_version(self.db_path)
+        if version != self._version:
+            n = sum(e is not None for e in self._entries)
+            self._entries = [None] * self.max_entries
+            self._last_used[:] = 0
+            self._version = version
+            log_line(f"[ANSWER_CACHE] Ingest-Version geändert ({version}), {n} Einträge verworfen")
+
+    @staticmethod
+    def _normalize(qemb) -> np.ndarray:
+        v = np.asarray(qemb, dtype=np.float32).ravel()
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def lookup(self, qemb, mode: str, question: str) -> dict | None:
+        """
+        Sucht eine sinngleiche, bereits beantwortete Frage im selben Modus
+        mit denselben Zahlen (TOP, Beschluss-Nr., Sitzung, ...).
+
+        Rückgabe
+        --------
+        dict oder None
+            {"question", "answer", "source_ids", "similarity"} bei Treffer.
+        """
+        v = self._normalize(qemb)
+        key = question_key(question)
+        with self._lock:
+            self._check_version()
+            slots = [
+                i for i, e in enumerate(self._entries)
+                if e is not None and e["mode"] == mode and e["key"] == key
+            ]
+            if not slots or self._embs is None or self._embs.shape[1] != v.shape[0]:
+                self.misses += 1
+                return None
+
+            sims = self._embs[slots] @ v
+            best = int(np.argmax(sims))
+            sim = float(sims[best])
+            if sim < self.threshold:
+                self.misses += 1
+                log_line(f"[ANSWER_CACHE] MISS best_similarity={sim:.4f}")
+                return None
+
+            slot = slots[best]
+            self._clock += 1
+            self._last_used[slot] = self._clock
+            self.hits += 1
+            entry = self._entries[slot]
+            log_line(
+                f"[ANSWER_CACHE] HIT similarity={sim:.4f} "
+                f"cached_question={entry['question']}"
+            )
+            return {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "source_ids": list(entry["source_ids"]),
+                "similarity": sim,
+            }
+
+    def put(self, question: str, qemb, mode: str, answer: str, source_ids: list[str]):
+        """Speichert eine Antwort; verdrängt bei vollem Cache den ältesten Eintrag."""
+        v = self._normalize(qemb)
+        with self._lock:
+            self._check_version()
+            if self._embs is None or self._embs.shape[1] != v.shape[0]:
+                self._embs = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+                self._entries = [None] * self.max_entries
+
+            free = [i for i, e in enumerate(self._entries) if e is None]
+            slot = free[0] if free else int(np.argmin(self._last_used))
+            if not free:
+                log_line(f"[ANSWER_CACHE] EVICT question={self._entries[slot]['question']}")
+
+            self._clock += 1
+            self._embs[slot] = v
+            self._last_used[slot] = self._clock
+            self._entries[slot] = {
+                "question": question,
+                "mode": mode,
+                "key": question_key(question),
+                "answer": answer,
+                "source_ids": list(source_ids),
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": sum(e is not None for e in self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -1,6 +1,7 @@
 # rag/answer_combiner.py
 
 from rag.llm import call_llm
+from config import COMBINE_MAX_CHUNKS
 
 PROMPT = """
 Du erhältst eine Benutzerfrage und mehrere Textausschnitte aus PDF-Dokumenten.
@@ -81,10 +82,10 @@ def combine(question: str, chunks: list[str]) -> str:
         gegebenen Informationen stützt, oder ein expliziter Hinweis darauf,
         dass die Informationen nicht ausreichen.
     """
-    # Aus Performance-Gründen verwenden wir eine begrenzte Anzahl von Chunks.
-    # Falls du später mehr Kontext zulassen möchtest, kann dieser Wert erhöht
-    # oder konfigurierbar gemacht werden.
-    max_chunks = 15
+    # Aus Performance-Gründen verwenden wir eine begrenzte Anzahl von Chunks
+    # (COMBINE_MAX_CHUNKS); die Reihenfolge der Chunks entscheidet also,
+    # was im Prompt landet.
+    max_chunks = COMBINE_MAX_CHUNKS
     selected_chunks = chunks[:max_chunks]
 
     info = "\n---\n".join(selected_chunks)
@@ -0,0 +1,55 @@
+# rag/chunk_log.py
+
+import json
+import threading
+
+import config
+from rag.chunker import chunk_id
+from config import log_line
+
+_lock = threading.Lock()
+_registered: set[str] = set()
+
+
+def full_text() -> bool:
+    """True, wenn Chunk-Texte vollständig ins Log geschrieben werden (LOG_CHUNKS="full")."""
+    return config.LOG_CHUNKS == "full"
+
+
+def register(cid: str, text: str | None):
+    """
+    Schreibt den Text eines Chunks ins Chunk-Wörterbuch des Laufs
+    (CHUNK_DICT_FILE, JSONL {"id", "text"}) – pro Lauf höchstens einmal je ID.
+    """
+    if text is None:
+        return
+    with _lock:
+        if cid in _registered:
+            return
+        if not _registered:
+            log_line(f"[CHUNK_LOG] Chunk-Wörterbuch: {config.CHUNK_DICT_FILE}")
+        _registered.add(cid)
+        with open(config.CHUNK_DICT_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": cid, "text": text}, ensure_ascii=False) + "\n")
+
+
+def ref(text: str, cid: str | None = None) -> str:
+    """
+    Log-Darstellung eines Chunks innerhalb einer Ergebniszeile.
+
+    "full": "id=<id> text_START ... text_END" wie bisher,
+    "ids":  nur "id=<id>"; der Text wird einmalig im Wörterbuch abgelegt.
+    Ohne `cid` wird die ID aus dem Text berechnet (chunk_id), das gilt
+    auch für Tabellenzeilen im Kontext.
+    """
+    if cid is None:
+        cid = chunk_id(text)
+    if full_text():
+        return f"id={cid} text_START\n{text}\ntext_END"
+    register(cid, text)
+    return f"id={cid}"
+
+
+def id_lines(ids: list[str]) -> str:
+    """Ergebnisblock im "ids"-Modus: eine Zeile "rank=<n> id=<id>" pro Chunk."""
+    return "\n".join(f"  rank={rank} id={cid}" for rank, cid in enumerate(ids, start=1))
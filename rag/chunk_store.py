@@ -0,0 +1,221 @@
+# rag/chunk_store.py
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+from rag.chunker import format_chunk
+from config import log_line
+
+# Seitentabelle: Datei (Index in files.json), Seitennummer, Byte-Offset und
+# Byte-Länge des bereinigten Seitentextes im Blob
+PAGE_DTYPE = np.dtype([("file", "<u4"), ("pno", "<u4"), ("offset", "<u8"), ("length", "<u4")])
+
+# Chunk-Referenzen, nach ID sortiert: Seite (Zeile der Seitentabelle) und
+# Byte-Bereich [start, end) relativ zum Seitenanfang
+CHUNK_DTYPE = np.dtype([("id", "S16"), ("page", "<u4"), ("start", "<u4"), ("end", "<u4")])
+
+_FILES = "files.json"
+_PAGES = "pages.npy"
+_CHUNKS = "chunks.npy"
+_BLOB = "text.bin"
+
+
+class ChunkStore:
+    def __init__(self, path: str):
+        """
+        Kompakter Speicher für Chunk-Texte.
+
+        Jeder bereinigte Seitentext liegt genau einmal als UTF-8 in einem
+        Blob (text.bin, per mmap gelesen). Chunks sind nur Referenzen
+        (ID, Seite, Byte-Start, Byte-Ende) in einem NumPy-Structured-Array;
+        überlappende Chunks teilen sich also denselben Seitentext. Der Text
+        eines Chunks wird erst bei Bedarf (Reranking, Prompt) erzeugt.
+
+        Parameter
+        ---------
+        path : str
+            Verzeichnis des Stores (z.B. <DB_PATH>/chunk_store/pdf).
+        """
+        self.path = path
+        self._load()
+
+    def _load(self):
+        files: list[str] = []
+        pages = np.zeros(0, dtype=PAGE_DTYPE)
+        chunks = np.zeros(0, dtype=CHUNK_DTYPE)
+        blob = np.zeros(0, dtype=np.uint8)
+
+        if os.path.exists(os.path.join(self.path, _CHUNKS)):
+            with open(os.path.join(self.path, _FILES), encoding="utf-8") as f:
+                files = json.load(f)
+            pages = np.load(os.path.join(self.path, _PAGES), mmap_mode="r")
+            chunks = np.load(os.path.join(self.path, _CHUNKS), mmap_mode="r")
+            blob_path = os.path.join(self.path, _BLOB)
+            if os.path.getsize(blob_path) > 0:
+                blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+
+        # Erst vollständig laden, dann austauschen (parallele Leser sehen
+        # entweder den alten oder den neuen Stand)
+        self._files, self._pages, self._chunks, self._blob = files, pages, chunks, blob
+        if not len(chunks):
+            return
+        log_line(
+            f"[CHUNK_STORE] geladen path={self.path} chunks={len(self._chunks)} "
+            f"pages={len(self._pages)} text_bytes={self._blob.size}"
+        )
+
+    def reload(self):
+        """Liest den Store neu von der Platte (z.B. nach Ingestion in einem anderen Prozess)."""
+        self._load()
+
+    def _close(self):
+        # Offene Memory-Maps freigeben (unter Windows Voraussetzung zum Ersetzen)
+        self._pages = np.zeros(0, dtype=PAGE_DTYPE)
+        self._chunks = np.zeros(0, dtype=CHUNK_DTYPE)
+        self._blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def __contains__(self, cid: str) -> bool:
+        return self._row(cid) is not None
+
+    def _row(self, cid: str) -> int | None:
+        if not len(self._chunks):
+            return None
+        key = cid.encode("ascii")
+        ids = self._chunks["id"]
+        i = int(np.searchsorted(ids, key))
+        if i < len(ids) and ids[i] == key:
+            return i
+        return None
+
+    def _page_text(self, p: int) -> str:
+        page = self._pages[p]
+        offset = int(page["offset"])
+        return self._blob[offset:offset + int(page["length"])].tobytes().decode("utf-8")
+
+    def locate(self, cid: str) -> tuple[str, int, str] | None:
+        """Fundstelle eines Chunks als (datei, seite, text_ohne_präfix) oder None."""
+        i = self._row(cid)
+        if i is None:
+            return None
+        ref = self._chunks[i]
+        page = self._pages[int(ref["page"])]
+        base = int(page["offset"])
+        body = self._blob[base + int(ref["start"]):base + int(ref["end"])].tobytes().decode("utf-8")
+        return self._files[int(page["file"])], int(page["pno"]), body
+
+    def text(self, cid: str) -> str | None:
+        """Chunk-Text mit Datei-/Seitenpräfix wie bei der Indizierung, oder None."""
+        loc = self.locate(cid)
+        return format_chunk(*loc) if loc is not None else None
+
+    def texts(self, ids: list[str]) -> list[str | None]:
+        return [self.text(cid) for cid in ids]
+
+    def _entries(self):
+        """Bestehender Inhalt als ({(datei, seite): text}, [(id, datei, seite, start, end)])."""
+        pages: dict[tuple[str, int], str] = {}
+        for p in range(len(self._pages)):
+            key = (self._files[int(self._pages[p]["file"])], int(self._pages[p]["pno"]))
+            pages[key] = self._page_text(p)
+        refs = []
+        for ref in self._chunks:
+            page = self._pages[int(ref["page"])]
+            key = (self._files[int(page["file"])], int(page["pno"]))
+            refs.append((ref["id"].decode("ascii"), key, int(ref["start"]), int(ref["end"])))
+        return pages, refs
+
+    def write(self, pages: dict[tuple[str, int], str], chunks: list[tuple[str, str, int, str]]):
+        """
+        Übernimmt Seitentexte und Chunks in den Store und schreibt ihn neu.
+
+        Parameter
+        ---------
+        pages : dict[tuple[str, int], str]
+            Bereinigte Seitentexte, Schlüssel (datei, seite). Ersetzt
+            gleichnamige Seiten; deren alte Chunks bleiben nur erhalten,
+            wenn sich der Seitentext nicht geändert hat.
+        chunks : list[tuple[str, str, int, str]]
+            (id, datei, seite, text_ohne_präfix). Der Text muss ein
+            Teilstring des Seitentextes sein (so erzeugt chunk_page die
+            Chunks); andernfalls wird er als eigene Pseudo-Seite abgelegt.
+        """
+        old_pages, old_refs = self._entries()
+        changed = {k for k, t in pages.items() if old_pages.get(k, t) != t}
+        all_pages = {**old_pages, **pages}
+        refs = {cid: (key, s, e) for cid, key, s, e in old_refs if key not in changed}
+
+        # Byte-Offsets der neuen Chunks im jeweiligen Seitentext bestimmen
+        page_bytes = {k: t.encode("utf-8") for k, t in all_pages.items()}
+        extra_pages: list[tuple[tuple[str, int], bytes]] = []
+        cursor: dict[tuple[str, int], int] = {}
+        for cid, file, pno, body in chunks:
+            key = (file, pno)
+            raw = body.encode("utf-8")
+            data = page_bytes.get(key, b"")
+            start = data.find(raw, cursor.get(key, 0))
+            if start < 0:
+                start = data.find(raw)
+            if start < 0:
+                extra_pages.append((key, raw))
+                refs[cid] = (len(extra_pages) - 1, 0, len(raw))
+                continue
+            cursor[key] = start
+            refs[cid] = (key, start, start + len(raw))
+
+        # Seitentabelle + Blob; Seiten ohne Chunks werden nicht gespeichert
+        used = {ref[0] for ref in refs.values() if not isinstance(ref[0], int)}
+        keys = sorted(used)
+        files = sorted({k[0] for k in keys} | {k[0] for k, _ in extra_pages})
+        file_idx = {f: i for i, f in enumerate(files)}
+
+        page_rows = np.zeros(len(keys) + len(extra_pages), dtype=PAGE_DTYPE)
+        page_idx: dict = {}
+        offset = 0
+        blobs = [page_bytes[k] for k in keys] + [raw for _, raw in extra_pages]
+        for p, (key, raw) in enumerate(zip(keys + [k for k, _ in extra_pages], blobs)):
+            page_rows[p] = (file_idx[key[0]], key[1], offset, len(raw))
+            offset += len(raw)
+        for p, key in enumerate(keys):
+            page_idx[key] = p
+        for j in range(len(extra_pages)):
+            page_idx[j] = len(keys) + j
+
+        chunk_rows = np.zeros(len(refs), dtype=CHUNK_DTYPE)
+        for i, cid in enumerate(sorted(refs)):
+            page_key, s, e = refs[cid]
+            chunk_rows[i] = (cid.encode("ascii"), page_idx[page_key], s, e)
+
+        self._close()
+        tmp = f"{self.path}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        with open(os.path.join(tmp, _FILES), "w", encoding="utf-8") as f:
+            json.dump(files, f, ensure_ascii=False)
+        np.save(os.path.join(tmp, _PAGES), page_rows)
+        np.save(os.path.join(tmp, _CHUNKS), chunk_rows)
+        with open(os.path.join(tmp, _BLOB), "wb") as f:
+            for raw in blobs:
+                f.write(raw)
+
+        # Verzeichnis austauschen (alter Stand erst nach erfolgreichem Schreiben weg)
+        old = f"{self.path}.old{os.getpid()}"
+        if os.path.exists(self.path):
+            os.replace(self.path, old)
+        os.replace(tmp, self.path)
+        shutil.rmtree(old, ignore_errors=True)
+
+        text_bytes = sum(len(b) for b in blobs)
+        chunk_bytes = sum(len(b.encode("utf-8")) for _, _, _, b in chunks)
+        log_line(
+            f"[CHUNK_STORE] gespeichert path={self.path} chunks={len(chunk_rows)} "
+            f"pages={len(page_rows)} text_bytes={text_bytes} "
+            f"(Chunk-Texte dieses Laufs einzeln: {chunk_bytes} bytes) "
+            f"ref_bytes={chunk_rows.nbytes}"
+        )
+        self._load()
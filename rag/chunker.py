@@ -1,5 +1,6 @@
 # rag/chunker.py
 
+import hashlib
 import re
 
 
@@ -22,6 +23,23 @@ def _split_into_sentences(text: str) -> list[str]:
     return [s.strip() for s in sentences if s.strip()]
 
 
+def format_chunk(pdf_name: str, pno: int, body: str) -> str:
+    """Chunk-Text mit Datei-/Seitenpräfix, so wie er indiziert und im Prompt verwendet wird."""
+    # Page-Information im Text belassen (wie bisher)
+    return f"[file {pdf_name}] [page {pno}] {body}"
+
+
+def chunk_id(doc: str) -> str:
+    """
+    Stabile ID eines Chunks auf Basis seines Textes.
+
+    Im Gegensatz zu Pythons hash() ist die ID über Prozesse hinweg
+    reproduzierbar, sodass Gold-Chunks in der Evaluation per ID
+    referenziert werden können.
+    """
+    return hashlib.sha1(doc.encode("utf-8")).hexdigest()[:16]
+
+
 def chunk_page(text: str, size: int, overlap: int) -> list[str]:
     """
     Erzeugt Chunks aus einer Seiten-Textpassage.
@@ -0,0 +1,89 @@
+# rag/deadline.py
+
+import math
+import threading
+import time
+
+from config import log_line, STAGE_COST_DEFAULTS_S, STAGE_COST_EWMA_ALPHA
+
+# Optionale bzw. reservierte Einheiten einer Anfrage und die Profile-Stufen,
+# aus denen sich ihre Dauer zusammensetzt
+STAGE_UNITS = {
+    "rerank": ("rerank",),
+    "gap": ("gap_analysis", "embed_gap", "second_retrieval", "rerank_pool"),
+    "combine": ("combine",),
+    "failsafe": ("failsafe_collect", "failsafe_choose"),
+}
+
+
+class StageCostModel:
+    def __init__(self, defaults: dict[str, float] = STAGE_COST_DEFAULTS_S, alpha: float = STAGE_COST_EWMA_ALPHA):
+        """
+        Erwartete Dauer (Sekunden) je Einheit aus STAGE_UNITS als
+        exponentiell gleitender Mittelwert über abgeschlossene Anfragen.
+        Bis zur ersten Messung gelten die Defaults aus config.
+        """
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._expected = dict(defaults)
+
+    def expected(self, unit: str) -> float:
+        with self._lock:
+            return self._expected.get(unit, 0.0)
+
+    def update_from(self, profile):
+        """Übernimmt die Dauern aller Einheiten, die in `profile` gelaufen sind."""
+        with self._lock:
+            for unit, stages in STAGE_UNITS.items():
+                if not any(s in profile.stages for s in stages):
+                    continue
+                seconds = sum(profile.stages.get(s, 0.0) for s in stages)
+                old = self._expected.get(unit)
+                self._expected[unit] = seconds if old is None else (1 - self.alpha) * old + self.alpha * seconds
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._expected)
+
+
+class Deadline:
+    def __init__(self, budget_s: float | None = None, deadline: float | None = None):
+        """
+        Zeitbudget einer Anfrage.
+
+        Parameter
+        ---------
+        budget_s : float, optional
+            Budget in Sekunden ab jetzt.
+        deadline : float, optional
+            Absoluter Zeitpunkt (time.perf_counter()). Bei beiden Angaben
+            gilt der frühere. Ohne Angabe ist das Budget unbegrenzt.
+        """
+        now = time.perf_counter()
+        ends = [t for t in (deadline, now + budget_s if budget_s is not None else None) if t is not None]
+        self.end = min(ends) if ends else math.inf
+        self.t_start = now
+
+    @property
+    def bounded(self) -> bool:
+        return self.end != math.inf
+
+    def remaining(self) -> float:
+        return self.end - time.perf_counter()
+
+    def allows(self, costs: StageCostModel, unit: str, reserve: tuple[str, ...] = ()) -> bool:
+        """
+        True, wenn die Restzeit die erwartete Dauer von `unit` plus die der
+        danach noch nötigen Einheiten (`reserve`) abdeckt.
+        """
+        if not self.bounded:
+            return True
+        need = costs.expected(unit) + sum(costs.expected(r) for r in reserve)
+        remaining = self.remaining()
+        if remaining >= need:
+            return True
+        log_line(
+            f"[DEADLINE] SKIP stage={unit} remaining_ms={remaining * 1000.0:.0f} "
+            f"expected_ms={need * 1000.0:.0f} (inkl. Reserve {','.join(reserve) or '-'})"
+        )
+        return False
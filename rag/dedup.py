@@ -0,0 +1,166 @@
+# rag/dedup.py
+
+import re
+import zlib
+
+import numpy as np
+
+from config import (
+    log_line,
+    DEDUP_THRESHOLD,
+    DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+    DEDUP_SHINGLE_WORDS,
+    RANDOM_SEED,
+)
+
+# Mersenne-Primzahl für die universellen Hashfunktionen (a*x + b) mod p
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Zahlen inkl. Dezimal-/Gliederungstrennern ("19", "3.2", "1,5", "2023/24")
+_NUMBER_RE = re.compile(r"\d+(?:[.,/]\d+)*")
+
+
+def _numbers(text: str) -> frozenset[str]:
+    """Menge der Zahlen eines Textes (Vergleichsschlüssel für Fassungen)."""
+    return frozenset(_NUMBER_RE.findall(text))
+
+
+def _shingles(text: str, k: int) -> np.ndarray:
+    """
+    Wort-k-Shingles eines Textes als uint64-Hashes (CRC32).
+    Texte mit weniger als k Wörtern bilden genau ein Shingle.
+    """
+    words = text.lower().split()
+    if len(words) <= k:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+    return np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) for g in set(grams)),
+        dtype=np.uint64,
+    )
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, seed: int = RANDOM_SEED):
+        """
+        MinHash-Signaturen mit `num_perm` Hashfunktionen der Form
+        (a*x + b) mod p, vektorisiert über alle Shingles eines Textes.
+        """
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # a, b < 2^32, damit a*x (x < 2^32) nicht über 2^64 läuft
+        self.a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        if shingles.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashed = (np.outer(self.a, shingles) + self.b[:, None]) % _PRIME
+        return (hashed & _MAX_HASH).min(axis=1)
+
+
+def find_near_duplicates(
+    texts: list[str],
+    threshold: float = DEDUP_THRESHOLD,
+    num_perm: int = DEDUP_NUM_PERM,
+    bands: int = DEDUP_BANDS,
+    shingle_words: int = DEDUP_SHINGLE_WORDS,
+) -> list[int]:
+    """
+    Gruppiert nahezu identische Texte per MinHash + LSH (Banding).
+
+    Kandidatenpaare aus gemeinsamen LSH-Buckets werden über die geschätzte
+    Jaccard-Ähnlichkeit (Anteil gleicher Signaturwerte) gegen `threshold`
+    geprüft; Gruppen entstehen transitiv (Union-Find).
+
+    Zusammengefasst werden nur Texte mit derselben Menge an Zahlen: Fassungen
+    einer Ordnung, die sich nur in Fristen, Paragraphen oder Beträgen
+    unterscheiden, sehen für MinHash fast gleich aus, der Unterschied ist
+    aber gerade der Inhalt (alt/neu-Vergleich). Da nur der Repräsentant
+    eingebettet wird, bleiben solche Chunks getrennt.
+
+    Rückgabe
+    --------
+    list[int]
+        Pro Text der Index seines Repräsentanten (erstes Vorkommen der
+        Gruppe); Texte ohne Duplikat zeigen auf sich selbst.
+    """
+    n = len(texts)
+    if n == 0:
+        return []
+
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    sigs = np.vstack([hasher.signature(_shingles(t, shingle_words)) for t in texts])
+    numbers = [_numbers(t) for t in texts]
+
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked: set[tuple[int, int]] = set()
+    for band in range(bands):
+        buckets: dict[bytes, list[int]] = {}
+        band_sig = sigs[:, band * rows:(band + 1) * rows]
+        for i in range(n):
+            buckets.setdefault(band_sig[i].tobytes(), []).append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            for j in members[1:]:
+                pair = (first, j)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if numbers[first] != numbers[j]:
+                    continue
+                if np.mean(sigs[first] == sigs[j]) >= threshold:
+                    ri, rj = find(first), find(j)
+                    if ri != rj:
+                        # Kleinster Index (erstes Vorkommen) bleibt Repräsentant
+                        parent[max(ri, rj)] = min(ri, rj)
+
+    return [find(i) for i in range(n)]
+
+
+def collapse_duplicates(bodies: list[str], locations: list[str], threshold: float = DEDUP_THRESHOLD):
+    """
+    Fasst nahezu doppelte Chunks zusammen.
+
+    Parameter
+    ---------
+    bodies : list[str]
+        Chunk-Texte ohne Datei-/Seitenpräfix (Grundlage des Vergleichs).
+    locations : list[str]
+        Herkunft je Chunk, z.B. "datei.pdf:3".
+
+    Rückgabe
+    --------
+    tuple[list[int], list[list[str]]]
+        (keep, sources): Indizes der zu speichernden Repräsentanten und pro
+        Repräsentant die Liste aller Fundstellen seiner Gruppe.
+    """
+    reps = find_near_duplicates(bodies, threshold=threshold)
+
+    groups: dict[int, list[str]] = {}
+    for i, r in enumerate(reps):
+        groups.setdefault(r, []).append(locations[i])
+
+    keep = sorted(groups)
+    sources = [groups[i] for i in keep]
+
+    removed = len(bodies) - len(keep)
+    log_line(
+        f"[DEDUP] chunks={len(bodies)} unique={len(keep)} removed={removed} "
+        f"groups_with_duplicates={sum(1 for s in sources if len(s) > 1)}"
+    )
+    return keep, sources
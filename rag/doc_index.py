@@ -0,0 +1,126 @@
+# rag/doc_index.py
+
+import os
+import threading
+
+import numpy as np
+
+from config import log_line
+
+
+class DocumentIndex:
+    def __init__(self, path: str):
+        """
+        Dokument-Vektoren für die zweistufige Suche (erst PDFs, dann Chunks).
+
+        Pro PDF werden ein Dokument-Vektor (normierter Mittelwert seiner
+        Chunk-Embeddings) und die IDs seiner Chunks gespeichert, kompakt als
+        .npz: Dateinamen, Vektor-Matrix, alle Chunk-IDs als S16-Array plus
+        Offsets je Dokument.
+
+        Parameter
+        ---------
+        path : str
+            Datei des Index (z.B. <DB_PATH>/indexes/pdf/doc_index.npz).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.files: list[str] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._chunk_ids: list[list[str]] = []
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        data = np.load(self.path)
+        self.files = [str(f) for f in data["files"]]
+        self.vectors = data["vectors"].astype(np.float32)
+        ids = [i.decode("ascii") for i in data["chunk_ids"]]
+        offsets = data["offsets"]
+        self._chunk_ids = [ids[offsets[i]:offsets[i + 1]] for i in range(len(self.files))]
+        log_line(f"[DOC_INDEX] geladen path={self.path} docs={len(self.files)}")
+
+    def reload(self):
+        """Verwirft den Stand im Speicher und liest die Datei neu."""
+        with self._lock:
+            self.files = []
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+            self._chunk_ids = []
+            self._load()
+
+    def set_document(self, file: str, chunk_ids: list[str], embs: np.ndarray):
+        """Setzt bzw. ersetzt den Eintrag eines PDFs aus den Embeddings seiner Chunks."""
+        vec = np.asarray(embs, dtype=np.float32).mean(axis=0)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        with self._lock:
+            if file in self.files:
+                i = self.files.index(file)
+                self.vectors[i] = vec
+                self._chunk_ids[i] = list(chunk_ids)
+                return
+            if self.vectors.size == 0:
+                self.vectors = vec[None, :]
+            else:
+                self.vectors = np.vstack([self.vectors, vec[None, :]])
+            self.files.append(file)
+            self._chunk_ids.append(list(chunk_ids))
+
+    def remove(self, files: list[str]):
+        """Entfernt die Einträge der angegebenen PDFs."""
+        drop = set(files)
+        with self._lock:
+            keep = [i for i, f in enumerate(self.files) if f not in drop]
+            if len(keep) == len(self.files):
+                return
+            self.files = [self.files[i] for i in keep]
+            self.vectors = self.vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+            self._chunk_ids = [self._chunk_ids[i] for i in keep]
+
+    def save(self):
+        """Schreibt den Index atomar auf die Platte."""
+        with self._lock:
+            offsets = np.zeros(len(self.files) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(c) for c in self._chunk_ids])
+            all_ids = np.array(
+                [cid.encode("ascii") for ids in self._chunk_ids for cid in ids], dtype="S16"
+            )
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp{os.getpid()}.npz"
+            np.savez(
+                tmp,
+                files=np.array(self.files, dtype=str),
+                vectors=self.vectors,
+                chunk_ids=all_ids,
+                offsets=offsets,
+            )
+            os.replace(tmp, self.path)
+        log_line(f"[DOC_INDEX] gespeichert path={self.path} docs={len(self.files)} chunks={len(all_ids)}")
+
+    def select(self, qemb, top_n: int) -> list[tuple[str, float]]:
+        """Die `top_n` PDFs mit der höchsten Kosinus-Ähnlichkeit zur Query."""
+        if not self.files:
+            return []
+        q = np.asarray(qemb, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        sims = self.vectors @ q
+        n = min(top_n, len(sims))
+        top = np.argpartition(-sims, n - 1)[:n]
+        top = top[np.argsort(-sims[top])]
+        return [(self.files[i], float(sims[i])) for i in top]
+
+    def chunk_ids(self, files: list[str]) -> list[str]:
+        """Chunk-IDs der angegebenen PDFs (ohne Duplikate)."""
+        index = {f: i for i, f in enumerate(self.files)}
+        out: dict[str, None] = {}
+        for f in files:
+            if f in index:
+                out.update(dict.fromkeys(self._chunk_ids[index[f]]))
+        return list(out)
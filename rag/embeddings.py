@@ -1,18 +1,19 @@
 # rag/embeddings.py
 
 import numpy as np
-import ollama
 
-from config import log_line
+from rag.ollama_pool import get_pool
+from config import log_line, OLLAMA_EMBED_BATCH_SIZE
 
 
 class Embedder:
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, batch_size: int = OLLAMA_EMBED_BATCH_SIZE):
         """
         Embedder auf Basis eines Ollama-Embedding-Modells
         (z.B. "qwen3-embedding:0.6b").
         """
         self.model_name = model_name
+        self.batch_size = max(1, batch_size)
         log_line(f"[EMBED_INIT_OLLAMA] model={model_name}")
 
     def encode(self, texts):
@@ -20,7 +21,9 @@ class Embedder:
         Berechnet Embeddings für eine Liste von Texten über Ollama.
 
         Verhalten:
-        - Ruft für jeden Text `ollama.embeddings(model=self.model_name, prompt=...)` auf.
+        - Teilt die Texte in Batches zu `batch_size` und schickt sie über
+          /api/embed an den Ollama-Endpoint-Pool (rag/ollama_pool.py);
+          mehrere Batches laufen parallel auf den verfügbaren Hosts.
         - Normalisiert die Embeddings (L2-Norm), damit die Kosinus-Ähnlichkeit
           gut mit Chroma funktioniert.
 
@@ -38,13 +41,11 @@ class Embedder:
             log_line("[EMBED_OLLAMA] encode aufgerufen mit leerer Textliste")
             return np.zeros((0, 0), dtype=np.float32)
 
-        embeddings = []
-        for idx, t in enumerate(texts):
-            res = ollama.embeddings(model=self.model_name, prompt=t)
-            emb = np.array(res["embedding"], dtype=np.float32)
-            embeddings.append(emb)
+        texts = list(texts)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = get_pool().embed_batches(self.model_name, batches)
 
-        embs = np.vstack(embeddings)
+        embs = np.vstack([np.asarray(r, dtype=np.float32) for r in results])
 
         # L2-Normalisierung (wie vorher mit normalize_embeddings=True)
         norms = np.linalg.norm(embs, axis=1, keepdims=True)
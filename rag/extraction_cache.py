@@ -0,0 +1,99 @@
+# rag/extraction_cache.py
+
+import gzip
+import hashlib
+import json
+import os
+
+from rag.pdf_reader import extract_pages
+from rag.table_extractor import extract_tables
+from config import log_line, EXTRACT_CACHE_DIR, EXTRACT_CACHE_ENABLED
+
+# Version der Extraktion. MUSS erhöht werden, wenn sich das Ergebnis von
+# rag/pdf_reader.py (_clean_page_text, extract_pages) oder
+# rag/table_extractor.py ändert – alte Cache-Einträge werden dann ignoriert.
+EXTRACTOR_VERSION = "2"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 über den Dateiinhalt (blockweise gelesen)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_file(digest: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, digest[:2], f"{digest}.v{EXTRACTOR_VERSION}.jsonl.gz")
+
+
+def iter_cached(path: str):
+    """
+    Liest einen Cache-Eintrag zeilenweise (gzip-komprimiertes JSONL).
+
+    Liefert Records der Form {"page": int, "text": str} bzw. {"table": dict};
+    die Kopfzeile wird übersprungen. Es wird nie die ganze Datei auf einmal
+    dekomprimiert.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != EXTRACTOR_VERSION:
+            raise ValueError(f"Falsche Extraktor-Version in {path}")
+        for line in f:
+            yield json.loads(line)
+
+
+def _write_cache(path: str, digest: str, source: str, pages, tables):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(json.dumps({"version": EXTRACTOR_VERSION, "sha256": digest, "source": source}) + "\n")
+        for pno, text in pages:
+            f.write(json.dumps({"page": pno, "text": text}, ensure_ascii=False) + "\n")
+        for t in tables:
+            f.write(json.dumps({"table": t}, ensure_ascii=False) + "\n")
+    # Atomar ersetzen, damit parallele Läufe nie halbe Einträge lesen
+    os.replace(tmp, path)
+
+
+def extract_cached(pdf_path: str, cache_dir: str = EXTRACT_CACHE_DIR, enabled: bool = EXTRACT_CACHE_ENABLED):
+    """
+    Liefert (pages, tables) eines PDFs wie extract_pages / extract_tables,
+    aber über einen persistenten Cache.
+
+    Schlüssel ist der SHA-256 des Dateiinhalts plus EXTRACTOR_VERSION:
+    Umbenannte oder verschobene Dateien treffen den Cache weiterhin,
+    geänderte Dateien oder eine neue Extraktor-Version nicht.
+
+    Rückgabe
+    --------
+    tuple[list[tuple[int, str]], list[dict], bool]
+        (pages, tables, cache_hit); Tabellen wie extract_tables:
+        {"page": int, "header": list[str], "rows": list[list[str]]}.
+    """
+    if not enabled:
+        return extract_pages(pdf_path), extract_tables(pdf_path), False
+
+    digest = file_sha256(pdf_path)
+    path = _cache_file(digest, cache_dir)
+
+    if os.path.exists(path):
+        try:
+            pages, tables = [], []
+            for rec in iter_cached(path):
+                if "page" in rec:
+                    pages.append((rec["page"], rec["text"]))
+                else:
+                    tables.append(rec["table"])
+            log_line(f"[EXTRACT_CACHE] HIT {pdf_path} sha256={digest[:12]} pages={len(pages)}")
+            return pages, tables, True
+        except (OSError, ValueError, EOFError) as e:
+            # Defekter Eintrag -> neu extrahieren und überschreiben
+            log_line(f"[EXTRACT_CACHE] defekter Eintrag {path}: {e!r}")
+
+    pages = extract_pages(pdf_path)
+    tables = extract_tables(pdf_path)
+    _write_cache(path, digest, os.path.basename(pdf_path), pages, tables)
+    log_line(f"[EXTRACT_CACHE] MISS {pdf_path} sha256={digest[:12]} pages={len(pages)}")
+    return pages, tables, False
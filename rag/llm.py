@@ -1,8 +1,10 @@
 # rag/llm.py
 
+import time
 import uuid
 
-import ollama
+from rag.llm_metrics import get_metrics, usage_of
+from rag.ollama_pool import get_pool
 from config import log_line, OLLAMA_MODEL, OLLAMA_TEMPERATURE
 
 
@@ -33,15 +35,30 @@ def call_llm(prompt: str, tag: str = "GENERIC") -> str:
         f"PROMPT_END"
     )
 
-    # LLM-Aufruf
-    res = ollama.chat(
-        model=OLLAMA_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        options={"temperature": OLLAMA_TEMPERATURE}
-    )
+    # LLM-Aufruf (über den Endpoint-Pool, ggf. mit Wiederholung auf einem anderen Host)
+    t0 = time.perf_counter()
+    try:
+        res = get_pool().chat(
+            model=OLLAMA_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            options={"temperature": OLLAMA_TEMPERATURE}
+        )
+    except Exception:
+        get_metrics().record_failure(tag, time.perf_counter() - t0)
+        raise
+    wall_s = time.perf_counter() - t0
 
     out = (res.get("message", {}).get("content") or "").strip()
 
+    # Token-Zähler und Prefill/Decode-Dauer je Tag erfassen
+    usage = usage_of(res)
+    get_metrics().record(tag, usage, wall_s)
+    log_line(
+        f"[LLM_USAGE] [QID={qid}] [TAG={tag}] prompt_tokens={usage['prompt_tokens']} "
+        f"eval_tokens={usage['eval_tokens']} prefill_ms={usage['prefill_s'] * 1000.0:.1f} "
+        f"decode_ms={usage['decode_s'] * 1000.0:.1f} wall_ms={wall_s * 1000.0:.1f}"
+    )
+
     # Vollständige Antwort loggen
     log_line(
         f"[LLM_RESP] [QID={qid}] [TAG={tag}] RESP_START\n"
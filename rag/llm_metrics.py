@@ -0,0 +1,128 @@
+# rag/llm_metrics.py
+
+import threading
+
+from config import log_line
+
+# Zähler je Tag: Name -> (Prometheus-Suffix, Hilfetext)
+_COUNTERS = {
+    "calls": ("calls_total", "LLM-Aufrufe"),
+    "failures": ("failures_total", "fehlgeschlagene LLM-Aufrufe"),
+    "prompt_tokens": ("prompt_tokens_total", "Eingabe-Tokens (prompt_eval_count)"),
+    "eval_tokens": ("eval_tokens_total", "Ausgabe-Tokens (eval_count)"),
+    "prefill_s": ("prefill_seconds_total", "Prefill-Zeit (prompt_eval_duration)"),
+    "decode_s": ("decode_seconds_total", "Decode-Zeit (eval_duration)"),
+    "load_s": ("load_seconds_total", "Modell-Ladezeit (load_duration)"),
+    "server_s": ("server_seconds_total", "Gesamtzeit laut Server (total_duration)"),
+    "wall_s": ("wall_seconds_total", "Gesamtzeit beim Client inkl. Netz und Wiederholungen"),
+}
+
+_GAUGES = {
+    "prefill_tok_s": ("prefill_tokens_per_second", "Eingabe-Tokens pro Sekunde Prefill"),
+    "decode_tok_s": ("decode_tokens_per_second", "Ausgabe-Tokens pro Sekunde Decode"),
+}
+
+
+def _ns(res, key: str) -> float:
+    """Dauer-Feld einer Ollama-Antwort (Nanosekunden) in Sekunden; fehlend = 0."""
+    return (res.get(key) or 0) / 1e9
+
+
+def usage_of(res) -> dict:
+    """Token-Zähler und Dauern aus einer Ollama-Chat-Antwort."""
+    return {
+        "prompt_tokens": int(res.get("prompt_eval_count") or 0),
+        "eval_tokens": int(res.get("eval_count") or 0),
+        "prefill_s": _ns(res, "prompt_eval_duration"),
+        "decode_s": _ns(res, "eval_duration"),
+        "load_s": _ns(res, "load_duration"),
+        "server_s": _ns(res, "total_duration"),
+    }
+
+
+class LLMMetrics:
+    def __init__(self):
+        """
+        Prozessweite Token- und Durchsatzzähler der LLM-Aufrufe je Tag
+        (GAP_ANALYSIS, ANSWER_COMBINE, ...).
+
+        Ollama liefert pro Chat-Aufruf prompt_eval_count/eval_count sowie
+        Prefill- und Decode-Dauer; call_llm() übergibt sie hier. snapshot()
+        liefert die Summen samt Tokens/s, prometheus_text() dieselben Werte
+        im Prometheus-Textformat.
+        """
+        self._lock = threading.Lock()
+        self._tags: dict[str, dict[str, float]] = {}
+
+    def _entry(self, tag: str) -> dict[str, float]:
+        entry = self._tags.get(tag)
+        if entry is None:
+            entry = self._tags[tag] = {name: 0 for name in _COUNTERS}
+        return entry
+
+    def record(self, tag: str, usage: dict, wall_s: float):
+        """Addiert einen erfolgreichen Aufruf (usage aus usage_of())."""
+        with self._lock:
+            entry = self._entry(tag)
+            entry["calls"] += 1
+            entry["wall_s"] += wall_s
+            for name, value in usage.items():
+                entry[name] += value
+
+    def record_failure(self, tag: str, wall_s: float):
+        with self._lock:
+            entry = self._entry(tag)
+            entry["failures"] += 1
+            entry["wall_s"] += wall_s
+
+    def reset(self):
+        with self._lock:
+            self._tags.clear()
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """
+        Summen je Tag plus abgeleitete Werte (Tokens/s für Prefill und
+        Decode, Tokens je Aufruf). Tag "_total" fasst alle zusammen.
+        """
+        with self._lock:
+            tags = {tag: dict(entry) for tag, entry in self._tags.items()}
+        if tags:
+            tags["_total"] = {name: sum(e[name] for e in tags.values()) for name in _COUNTERS}
+        for entry in tags.values():
+            calls = entry["calls"]
+            entry["prefill_tok_s"] = entry["prompt_tokens"] / entry["prefill_s"] if entry["prefill_s"] > 0 else 0.0
+            entry["decode_tok_s"] = entry["eval_tokens"] / entry["decode_s"] if entry["decode_s"] > 0 else 0.0
+            entry["prompt_tokens_per_call"] = entry["prompt_tokens"] / calls if calls else 0.0
+            entry["eval_tokens_per_call"] = entry["eval_tokens"] / calls if calls else 0.0
+        return tags
+
+    def prometheus_text(self, prefix: str = "rag_llm") -> str:
+        """Aktueller Stand im Prometheus-Textformat (ein Label "tag")."""
+        snap = self.snapshot()
+        snap.pop("_total", None)
+        lines: list[str] = []
+        for metrics, kind in ((_COUNTERS, "counter"), (_GAUGES, "gauge")):
+            for name, (suffix, help_text) in metrics.items():
+                metric = f"{prefix}_{suffix}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for tag in sorted(snap):
+                    lines.append(f'{metric}{{tag="{tag}"}} {snap[tag][name]:g}')
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self):
+        for tag, s in self.snapshot().items():
+            log_line(
+                f"[LLM_METRICS] tag={tag} calls={s['calls']} failures={s['failures']} "
+                f"prompt_tokens={s['prompt_tokens']} eval_tokens={s['eval_tokens']} "
+                f"prefill_s={s['prefill_s']:.2f} decode_s={s['decode_s']:.2f} "
+                f"prefill_tok_s={s['prefill_tok_s']:.1f} decode_tok_s={s['decode_tok_s']:.1f}"
+            )
+
+
+_metrics = LLMMetrics()
+
+
+def get_metrics() -> LLMMetrics:
+    """Prozessweite Zähler (werden von call_llm() befüllt)."""
+    return _metrics
@@ -0,0 +1,407 @@
+# rag/neighbor_graph.py
+
+import os
+import threading
+
+import numpy as np
+
+from config import log_line, NEIGHBOR_GRAPH_K, NEIGHBOR_GRAPH_BATCH
+
+
+def _normalize(embs) -> np.ndarray:
+    e = np.asarray(embs, dtype=np.float32)
+    norms = np.linalg.norm(e, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return e / norms
+
+
+def merge_topk(
+    idx_a: np.ndarray, sim_a: np.ndarray, idx_b: np.ndarray, sim_b: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vereinigt zeilenweise zwei Kandidatenlisten (Indizes, Ähnlichkeiten) zu
+    den k besten, absteigend sortiert. Leere Plätze: Index -1, Ähnlichkeit -inf.
+    """
+    idx = np.concatenate([idx_a, idx_b], axis=1)
+    sim = np.concatenate([sim_a, sim_b], axis=1).astype(np.float32)
+    sim[idx < 0] = -np.inf
+    if idx.shape[1] > k:
+        top = np.argpartition(-sim, k - 1, axis=1)[:, :k]
+        idx = np.take_along_axis(idx, top, axis=1)
+        sim = np.take_along_axis(sim, top, axis=1)
+    order = np.argsort(-sim, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(sim, order, axis=1)
+
+
+def knn_matrix(embs: np.ndarray, k: int, batch_size: int = NEIGHBOR_GRAPH_BATCH) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Exakte k nächste Nachbarn (Kosinus) aller Zeilen von `embs` untereinander.
+
+    Blockweise Matrixmultiplikation (`batch_size` Zeilen gegen alle), damit
+    der Speicher bei großen Korpora begrenzt bleibt. Rückgabe: Indizes
+    (n, k) int32 und Ähnlichkeiten (n, k) float16, absteigend sortiert;
+    bei weniger als k+1 Vektoren mit -1 bzw. 0 aufgefüllt.
+    """
+    n = len(embs)
+    idx = np.full((n, k), -1, dtype=np.int32)
+    sims = np.zeros((n, k), dtype=np.float16)
+    if n < 2 or k <= 0:
+        return idx, sims
+
+    e = _normalize(embs)
+
+    kk = min(k, n - 1)
+    for start in range(0, n, batch_size):
+        block = e[start:start + batch_size] @ e.T
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf   # sich selbst ausschließen
+        top = np.argpartition(-block, kk - 1, axis=1)[:, :kk]
+        top_sims = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        idx[start:start + len(block), :kk] = np.take_along_axis(top, order, axis=1)
+        sims[start:start + len(block), :kk] = np.take_along_axis(top_sims, order, axis=1)
+    return idx, sims
+
+
+class NeighborGraph:
+    def __init__(self, path: str):
+        """
+        Vorberechneter Nachbarschaftsgraph über alle Chunks.
+
+        Zwei Arten von Kanten:
+        - kNN: die NEIGHBOR_GRAPH_K ähnlichsten Chunks (Kosinus der
+          gespeicherten Embeddings), bei der Ingestion in einem Batch
+          berechnet;
+        - Sequenz: Vorgänger/Nachfolger innerhalb derselben PDF-Seite in
+          Lesereihenfolge.
+
+        Gespeichert als .npz: Chunk-IDs (S16, sortiert), Nachbar-Indizes
+        int32 und Ähnlichkeiten float16 je Zeile sowie die Chunk-Reihenfolge
+        je Seite (Indizes + Offsets). Zur Anfragezeit sind Nachbarn damit
+        ohne Embedding- oder LLM-Aufruf verfügbar (expand()).
+
+        Parameter
+        ---------
+        path : str
+            Datei des Graphen (z.B. <DB_PATH>/indexes/pdf/neighbor_graph.npz).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.ids = np.zeros(0, dtype="S16")
+        self.knn = np.zeros((0, 0), dtype=np.int32)
+        self.sims = np.zeros((0, 0), dtype=np.float16)
+        # "datei:seite" -> Chunk-IDs in Lesereihenfolge
+        self._pages: dict[str, list[str]] = {}
+        self._prev = np.zeros(0, dtype=np.int32)
+        self._next = np.zeros(0, dtype=np.int32)
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        data = np.load(self.path)
+        self.ids = data["ids"]
+        self.knn = data["knn"]
+        self.sims = data["sims"]
+        keys = [str(k) for k in data["page_keys"]]
+        seq = data["seq"]
+        offsets = data["seq_offsets"]
+        self._pages = {
+            key: [self.ids[j].decode("ascii") for j in seq[offsets[i]:offsets[i + 1]]]
+            for i, key in enumerate(keys)
+        }
+        self._link_pages()
+        log_line(f"[NEIGHBOR_GRAPH] geladen path={self.path} chunks={len(self.ids)} pages={len(keys)}")
+
+    def reload(self):
+        """Verwirft den Stand im Speicher und liest die Datei neu."""
+        with self._lock:
+            self.ids = np.zeros(0, dtype="S16")
+            self.knn = np.zeros((0, 0), dtype=np.int32)
+            self.sims = np.zeros((0, 0), dtype=np.float16)
+            self._pages = {}
+            self._prev = np.zeros(0, dtype=np.int32)
+            self._next = np.zeros(0, dtype=np.int32)
+            self._load()
+
+    def _index(self, cids: list[str]) -> np.ndarray:
+        """Zeilen der IDs im Graphen; -1 für unbekannte IDs."""
+        if not len(self.ids) or not cids:
+            return np.full(len(cids), -1, dtype=np.int64)
+        keys = np.array([c.encode("ascii") for c in cids], dtype="S16")
+        pos = np.searchsorted(self.ids, keys)
+        pos_c = np.minimum(pos, len(self.ids) - 1)
+        return np.where(self.ids[pos_c] == keys, pos_c, -1)
+
+    def _link_pages(self):
+        n = len(self.ids)
+        self._prev = np.full(n, -1, dtype=np.int32)
+        self._next = np.full(n, -1, dtype=np.int32)
+        for cids in self._pages.values():
+            rows = self._index(cids)
+            for a, b in zip(rows, rows[1:]):
+                # Ein zusammengefasster Chunk steht ggf. auf mehreren Seiten:
+                # es gilt das erste Vorkommen
+                if self._next[a] == -1:
+                    self._next[a] = b
+                if self._prev[b] == -1:
+                    self._prev[b] = a
+
+    def set_pages(self, pages: dict[tuple[str, int], list[str]]):
+        """Setzt bzw. ersetzt die Chunk-Reihenfolge der angegebenen Seiten."""
+        with self._lock:
+            for (file, pno), cids in pages.items():
+                self._pages[f"{file}:{pno}"] = list(cids)
+
+    def build(self, ids: list[str], embs: np.ndarray, k: int = NEIGHBOR_GRAPH_K):
+        """
+        Berechnet den kNN-Graphen über alle übergebenen Chunks neu.
+        Seiten-Reihenfolgen behalten nur noch vorhandene IDs.
+        """
+        order = np.argsort(np.array([c.encode("ascii") for c in ids], dtype="S16"), kind="stable")
+        sorted_ids = np.array([ids[i].encode("ascii") for i in order], dtype="S16")
+        knn, sims = knn_matrix(np.asarray(embs)[order], k)
+        with self._lock:
+            self.ids, self.knn, self.sims = sorted_ids, knn, sims
+            present = set(ids)
+            self._pages = {
+                key: kept for key, cids in self._pages.items()
+                if (kept := [c for c in cids if c in present])
+            }
+            self._link_pages()
+        log_line(f"[NEIGHBOR_GRAPH] build chunks={len(ids)} k={k} pages={len(self._pages)}")
+
+    def update(
+        self,
+        all_ids: list[str],
+        pages,
+        fetch,
+        new: tuple[list[str], np.ndarray] | None = None,
+        k: int = NEIGHBOR_GRAPH_K,
+        batch_size: int = NEIGHBOR_GRAPH_BATCH,
+    ):
+        """
+        Bringt den kNN-Graphen inkrementell auf den Stand `all_ids` (alle
+        Chunk-IDs der DB), statt ihn über alle Chunks neu zu berechnen.
+
+        Neu berechnet werden nur die Zeilen neuer Chunks sowie bestehender
+        Chunks, deren Nachbarliste auf einen entfernten Chunk zeigte
+        (Reparatur nach drop_shard) – jeweils gegen alle Chunks. Alle übrigen
+        Zeilen behalten ihre Liste und nehmen nur die neuen Chunks als
+        Kandidaten auf. Aufwand O(neu · n) statt O(n²); die Embeddings
+        aller Chunks werden nur seitenweise gelesen.
+
+        Parameter
+        ---------
+        all_ids : list[str]
+            Alle Chunk-IDs nach der Änderung.
+        pages : callable
+            pages() liefert (ids, embs) seitenweise über alle Chunks.
+        fetch : callable
+            fetch(ids) -> (gefundene_ids, embs), z.B. Retriever.get_embeddings.
+        new : tuple[list[str], np.ndarray], optional
+            Bereits bekannte Embeddings neuer Chunks (spart fetch()).
+        """
+        with self._lock:
+            universe = np.unique(np.array([c.encode("ascii") for c in all_ids], dtype="S16"))
+            n = len(universe)
+            old_ids = self.ids
+            old_knn, old_sims = self.knn, self.sims
+            in_old = np.zeros(n, dtype=bool)
+            old_row = np.full(n, -1, dtype=np.int64)
+            if len(old_ids) and n:
+                pos = np.minimum(np.searchsorted(old_ids, universe), len(old_ids) - 1)
+                in_old = old_ids[pos] == universe
+                old_row = np.where(in_old, pos, -1)
+
+            # Alte Nachbar-Indizes auf Zeilen des neuen Stands abbilden (-1 = entfernt)
+            old_to_new = np.full(len(old_ids) + 1, -1, dtype=np.int64)
+            old_to_new[old_row[in_old]] = np.nonzero(in_old)[0]
+            lists_idx = np.full((n, k), -1, dtype=np.int64)
+            lists_sim = np.full((n, k), -np.inf, dtype=np.float32)
+            kk_old = min(k, old_knn.shape[1]) if old_knn.ndim == 2 else 0
+            rows_old = np.nonzero(in_old)[0]
+            if kk_old and len(rows_old):
+                src = old_knn[old_row[rows_old], :kk_old].astype(np.int64)
+                mapped = old_to_new[src]                                # Padding -1 -> letzter Eintrag (-1)
+                lost = (src >= 0) & (mapped < 0)
+                sims_old = old_sims[old_row[rows_old], :kk_old].astype(np.float32)
+                lists_idx[rows_old, :kk_old] = mapped
+                lists_sim[rows_old, :kk_old] = np.where(mapped < 0, -np.inf, sims_old)
+            else:
+                lost = np.zeros((len(rows_old), 0), dtype=bool)
+
+            # Neu zu berechnende Zeilen: neue Chunks und Reparaturfälle
+            recompute = ~in_old
+            if lost.size:
+                recompute[rows_old[lost.any(axis=1)]] = True
+            is_new = ~in_old
+            q_rows = np.nonzero(recompute)[0]
+
+        q_ids = [universe[r].decode("ascii") for r in q_rows]
+        known = {}
+        if new is not None:
+            known = {cid: e for cid, e in zip(new[0], np.asarray(new[1]))}
+        missing = [cid for cid in q_ids if cid not in known]
+        for start in range(0, len(missing), 5000):
+            f, e = fetch(missing[start:start + 5000])
+            known.update(zip(f, e))
+        has_emb = np.array([cid in known for cid in q_ids], dtype=bool)
+        q_rows = q_rows[has_emb]
+        q = _normalize([known[cid] for cid, ok in zip(q_ids, has_emb) if ok]) if has_emb.any() else None
+        q_is_new = is_new[q_rows]
+
+        best_idx = np.full((len(q_rows), k), -1, dtype=np.int64)
+        best_sim = np.full((len(q_rows), k), -np.inf, dtype=np.float32)
+        if q is not None:
+            for pids, pembs in pages():
+                if not len(pids):
+                    continue
+                keys = np.array([c.encode("ascii") for c in pids], dtype="S16")
+                prow = np.minimum(np.searchsorted(universe, keys), n - 1)
+                ok = universe[prow] == keys
+                prow = prow[ok]
+                p = _normalize(np.asarray(pembs)[ok])
+                # Bestehende, nicht neu berechnete Zeilen dieser Seite
+                keep_mask = ~recompute[prow]
+                for start in range(0, len(q_rows), batch_size):
+                    qb = slice(start, start + batch_size)
+                    sims = p @ q[qb].T                                  # (seite, block)
+                    sims[prow[:, None] == q_rows[qb][None, :]] = -np.inf  # sich selbst ausschließen
+                    # Zeilen der neu berechneten Chunks: alle Seiten-Chunks sind Kandidaten
+                    cand_idx = np.broadcast_to(prow, (sims.shape[1], len(prow)))
+                    best_idx[qb], best_sim[qb] = merge_topk(best_idx[qb], best_sim[qb], cand_idx, sims.T, k)
+                    # Unveränderte Zeilen: nur neue Chunks kommen als Kandidaten hinzu
+                    cols = np.nonzero(q_is_new[qb])[0]
+                    if keep_mask.any() and len(cols):
+                        rows = prow[keep_mask]
+                        lists_idx[rows], lists_sim[rows] = merge_topk(
+                            lists_idx[rows], lists_sim[rows],
+                            np.broadcast_to(q_rows[qb][cols], (len(rows), len(cols))),
+                            sims[keep_mask][:, cols], k,
+                        )
+        lists_idx[q_rows] = best_idx
+        lists_sim[q_rows] = best_sim
+        lists_idx[~np.isfinite(lists_sim)] = -1
+        lists_sim[~np.isfinite(lists_sim)] = 0.0
+
+        with self._lock:
+            self.ids = universe
+            self.knn = lists_idx.astype(np.int32)
+            self.sims = lists_sim.astype(np.float16)
+            present = set(c.decode("ascii") for c in universe)
+            self._pages = {
+                key: kept for key, cids in self._pages.items()
+                if (kept := [c for c in cids if c in present])
+            }
+            self._link_pages()
+        log_line(
+            f"[NEIGHBOR_GRAPH] update chunks={n} recomputed={len(q_rows)} "
+            f"new={int(q_is_new.sum())} removed={len(old_ids) - int(in_old.sum())} k={k}"
+        )
+
+    def save(self):
+        """Schreibt den Graphen atomar auf die Platte."""
+        with self._lock:
+            keys = list(self._pages)
+            rows = [self._index(self._pages[key]) for key in keys]
+            rows = [r[r >= 0] for r in rows]
+            offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(r) for r in rows])
+            seq = np.concatenate(rows).astype(np.int32) if rows else np.zeros(0, dtype=np.int32)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp{os.getpid()}.npz"
+            np.savez(
+                tmp,
+                ids=self.ids,
+                knn=self.knn,
+                sims=self.sims,
+                page_keys=np.array(keys, dtype=str),
+                seq=seq,
+                seq_offsets=offsets,
+            )
+            os.replace(tmp, self.path)
+        log_line(f"[NEIGHBOR_GRAPH] gespeichert path={self.path} chunks={len(self.ids)}")
+
+    def neighbors(self, cid: str, k: int | None = None, min_sim: float = 0.0) -> list[tuple[str, float]]:
+        """kNN-Nachbarn eines Chunks als (id, ähnlichkeit), absteigend."""
+        row = int(self._index([cid])[0])
+        if row < 0:
+            return []
+        out = []
+        for j, s in zip(self.knn[row][:k], self.sims[row][:k]):
+            if j < 0 or s < min_sim:
+                break
+            out.append((self.ids[j].decode("ascii"), float(s)))
+        return out
+
+    def sequential(self, cid: str, span: int = 1) -> tuple[list[str], list[str]]:
+        """Bis zu `span` Vorgänger (nächster zuletzt) und Nachfolger auf derselben Seite."""
+        row = int(self._index([cid])[0])
+        before: list[str] = []
+        after: list[str] = []
+        if row < 0:
+            return before, after
+        r = row
+        for _ in range(span):
+            r = self._prev[r]
+            if r < 0:
+                break
+            before.insert(0, self.ids[r].decode("ascii"))
+        r = row
+        for _ in range(span):
+            r = self._next[r]
+            if r < 0:
+                break
+            after.append(self.ids[r].decode("ascii"))
+        return before, after
+
+    def expand(
+        self,
+        seeds: list[str],
+        max_total: int,
+        knn_k: int,
+        min_sim: float,
+        span: int = 1,
+        hops: int = 1,
+    ) -> list[str]:
+        """
+        Erweitert die Treffer `seeds` (in Rangfolge) entlang des Graphen.
+
+        Jeder Seed steht mit seinen Sequenz-Nachbarn (`span` je Seite) in
+        Lesereihenfolge im Ergebnis; danach folgen die kNN-Nachbarn
+        (höchstens `knn_k` je Chunk, Ähnlichkeit >= `min_sim`), bei
+        `hops` > 1 auch deren Nachbarn. Ohne Duplikate, höchstens
+        `max_total` IDs.
+        """
+        out: dict[str, None] = {}
+
+        def add(cid: str) -> bool:
+            if len(out) >= max_total:
+                return False
+            out.setdefault(cid)
+            return True
+
+        for cid in seeds:
+            before, after = self.sequential(cid, span)
+            for c in before + [cid] + after:
+                if not add(c):
+                    return list(out)
+
+        frontier = list(seeds)
+        for _ in range(hops):
+            nxt: list[str] = []
+            for cid in frontier:
+                for nb, _ in self.neighbors(cid, knn_k, min_sim):
+                    if nb in out:
+                        continue
+                    if not add(nb):
+                        return list(out)
+                    nxt.append(nb)
+            frontier = nxt
+        return list(out)
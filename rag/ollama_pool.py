@@ -0,0 +1,241 @@
+# rag/ollama_pool.py
+
+import itertools
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import ollama
+
+from config import (
+    log_line,
+    OLLAMA_HOST,
+    OLLAMA_HOSTS,
+    OLLAMA_MAX_ATTEMPTS,
+    OLLAMA_HEALTH_INTERVAL_S,
+    OLLAMA_HEALTH_TIMEOUT_S,
+    OLLAMA_REQUEST_TIMEOUT_S,
+    OLLAMA_PARALLEL_PER_HOST,
+)
+
+
+def retryable(error: Exception) -> bool:
+    """
+    True für Fehler des Hosts: Verbindungsfehler, Timeouts und 5xx. Fehler
+    der Anfrage selbst (4xx, z.B. unbekanntes Modell oder zu langer
+    Kontext) würden auf jedem Host gleich scheitern.
+    """
+    if isinstance(error, ollama.ResponseError):
+        return not 400 <= error.status_code < 500
+    return isinstance(error, (ConnectionError, TimeoutError, OSError, httpx.TransportError))
+
+
+class Endpoint:
+    def __init__(self, host: str | None, timeout_s: float):
+        """Ein Ollama-Host samt Client, Zustand und Zählern."""
+        self.host = host
+        self.client = ollama.Client(host=host, timeout=timeout_s) if host else ollama.Client(timeout=timeout_s)
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.items = 0
+        self.busy_s = 0.0
+        self.last_error = ""
+
+    @property
+    def name(self) -> str:
+        return self.host or "default"
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "items": self.items,
+            "busy_s": self.busy_s,
+            "items_per_s": (self.items / self.busy_s) if self.busy_s > 0 else 0.0,
+            "avg_latency_ms": (self.busy_s / self.requests * 1000.0) if self.requests else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaPool:
+    def __init__(
+        self,
+        hosts: list[str | None],
+        max_attempts: int = OLLAMA_MAX_ATTEMPTS,
+        health_interval_s: float = OLLAMA_HEALTH_INTERVAL_S,
+        health_timeout_s: float = OLLAMA_HEALTH_TIMEOUT_S,
+        timeout_s: float = OLLAMA_REQUEST_TIMEOUT_S,
+        parallel_per_host: int = OLLAMA_PARALLEL_PER_HOST,
+    ):
+        """
+        Verteilt Ollama-Anfragen auf mehrere Hosts.
+
+        - Auswahl: gesunder Host mit den wenigsten laufenden Anfragen
+          (least outstanding requests), bei Gleichstand reihum.
+        - Fehler des Hosts (Verbindung, Timeout, 5xx, siehe retryable()):
+          Host gilt als ungesund, die Anfrage läuft auf einem anderen Host
+          weiter (höchstens `max_attempts` Versuche). Sind alle Hosts
+          ungesund, wird trotzdem der am wenigsten belastete versucht.
+          Andere Fehler (z.B. 4xx) werden sofort weitergereicht.
+        - Ein Hintergrund-Thread prüft ungesunde Hosts alle
+          `health_interval_s` Sekunden und nimmt sie bei Erfolg wieder auf.
+        - Pro Host werden Anfragen, Fehler, verarbeitete Einträge und
+          Durchsatz gezählt (stats()).
+
+        Parameter
+        ---------
+        hosts : list[str | None]
+            Basis-URLs; None = Default des ollama-Clients.
+        """
+        self.endpoints = [Endpoint(h, timeout_s) for h in hosts]
+        self.max_attempts = max(1, max_attempts)
+        self.health_timeout_s = health_timeout_s
+        self._lock = threading.Lock()
+        self._rr = itertools.count()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, parallel_per_host * len(self.endpoints)),
+            thread_name_prefix="ollama-pool",
+        )
+        self._health = None
+        if len(self.endpoints) > 1 and health_interval_s > 0:
+            self._health = threading.Thread(
+                target=self._health_loop, args=(health_interval_s,), name="ollama-health", daemon=True
+            )
+            self._health.start()
+        log_line(f"[OLLAMA_POOL] init hosts={[ep.name for ep in self.endpoints]}")
+
+    # ----- Auswahl und Ausführung -----
+
+    def _acquire(self, tried: set[int]) -> Endpoint:
+        with self._lock:
+            candidates = [i for i in range(len(self.endpoints)) if i not in tried]
+            if not candidates:
+                candidates = list(range(len(self.endpoints)))
+            healthy = [i for i in candidates if self.endpoints[i].healthy]
+            pool = healthy or candidates
+            start = next(self._rr)
+            # Gleichstand reihum auflösen: Rotation ab `start` als Zweitschlüssel
+            i = min(pool, key=lambda j: (self.endpoints[j].outstanding, (j - start) % len(self.endpoints)))
+            ep = self.endpoints[i]
+            ep.outstanding += 1
+            tried.add(i)
+            return ep
+
+    def _release(self, ep: Endpoint, seconds: float, items: int, error: Exception | None):
+        with self._lock:
+            ep.outstanding -= 1
+            ep.requests += 1
+            ep.busy_s += seconds
+            if error is None:
+                ep.items += items
+                return
+            ep.failures += 1
+            ep.last_error = repr(error)
+            if not retryable(error):
+                return
+            was_healthy, ep.healthy = ep.healthy, False
+        if was_healthy:
+            log_line(f"[OLLAMA_POOL] host={ep.name} UNHEALTHY error={error!r}")
+
+    def call(self, fn, kind: str, items: int = 1):
+        """
+        Führt `fn(client)` auf einem Host des Pools aus und wiederholt bei
+        Fehlern des Hosts (retryable()) auf anderen Hosts. Der letzte
+        Fehler wird weitergereicht, Fehler der Anfrage sofort.
+        """
+        tried: set[int] = set()
+        last_error: Exception | None = None
+        for attempt in range(self.max_attempts):
+            ep = self._acquire(tried)
+            t0 = time.perf_counter()
+            try:
+                result = fn(ep.client)
+            except Exception as e:
+                self._release(ep, time.perf_counter() - t0, items, e)
+                log_line(f"[OLLAMA_POOL] {kind} FEHLER host={ep.name} attempt={attempt + 1} error={e!r}")
+                if not retryable(e):
+                    raise
+                last_error = e
+                continue
+            self._release(ep, time.perf_counter() - t0, items, None)
+            return result
+        raise last_error
+
+    def chat(self, **kwargs) -> dict:
+        return self.call(lambda c: c.chat(**kwargs), "chat")
+
+    def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        """Ein Batch über /api/embed."""
+        res = self.call(lambda c: c.embed(model=model, input=inputs), "embed", items=len(inputs))
+        return res["embeddings"]
+
+    def embed_batches(self, model: str, batches: list[list[str]]) -> list[list[list[float]]]:
+        """Mehrere Batches parallel über die Hosts verteilt (Reihenfolge bleibt erhalten)."""
+        if len(batches) <= 1:
+            return [self.embed(model, b) for b in batches]
+        return list(self._executor.map(lambda b: self.embed(model, b), batches))
+
+    # ----- Health-Checks -----
+
+    def check(self, ep: Endpoint) -> bool:
+        """GET /api/version gegen den Host; aktualisiert dessen Zustand."""
+        base = (ep.host or OLLAMA_HOST or "http://127.0.0.1:11434").rstrip("/")
+        if "://" not in base:
+            base = f"http://{base}"
+        try:
+            with urllib.request.urlopen(f"{base}/api/version", timeout=self.health_timeout_s) as resp:
+                ok = resp.status == 200
+        except OSError as e:
+            ok = False
+            ep.last_error = repr(e)
+        with self._lock:
+            changed = ep.healthy != ok
+            ep.healthy = ok
+        if changed:
+            log_line(f"[OLLAMA_POOL] host={ep.name} {'HEALTHY' if ok else 'UNHEALTHY'} (health check)")
+        return ok
+
+    def _health_loop(self, interval_s: float):
+        while not self._stop.wait(interval_s):
+            for ep in self.endpoints:
+                if not ep.healthy:
+                    self.check(ep)
+
+    # ----- Statistik -----
+
+    def stats(self) -> dict[str, dict]:
+        """Zähler und Durchsatz je Host."""
+        with self._lock:
+            return {ep.name: ep.stats() for ep in self.endpoints}
+
+    def log_stats(self):
+        for name, s in self.stats().items():
+            log_line(
+                f"[OLLAMA_POOL] STATS host={name} healthy={s['healthy']} requests={s['requests']} "
+                f"failures={s['failures']} items={s['items']} items_per_s={s['items_per_s']:.1f} "
+                f"avg_latency_ms={s['avg_latency_ms']:.1f}"
+            )
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+
+_pool: OllamaPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> OllamaPool:
+    """Prozessweiter Pool aus OLLAMA_HOSTS (bzw. OLLAMA_HOST / Client-Default)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OllamaPool(OLLAMA_HOSTS or [OLLAMA_HOST or None])
+        return _pool
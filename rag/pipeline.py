@@ -1,13 +1,22 @@
 # rag/pipeline.py
 
+import json
 from pathlib import Path
 
-from rag.pdf_reader import extract_pages
-from rag.table_extractor import extract_tables
-from rag.chunker import chunk_page
-from rag.embeddings import Embedder
-from rag.retriever import Retriever
-from rag.reranker import Reranker
+import numpy as np
+
+from rag.extraction_cache import extract_cached
+from rag.chunker import chunk_page, format_chunk
+from rag.retriever import chunk_id
+from rag.sharded_retriever import ShardedRetriever, shard_for
+from rag import chunk_log, registry
+from rag.rag_config import RAGConfig
+from rag.profiling import Profile
+from rag.reranker import sort_by_scores
+from rag.rerank_cascade import select_candidates
+from rag.dedup import collapse_duplicates
+from rag.deadline import Deadline, StageCostModel
+from rag.answer_cache import SemanticAnswerCache, bump_ingest_version
 from rag.gap_analyzer import analyze_gap
 from rag.answer_combiner import (
     combine,
@@ -15,91 +24,295 @@ from rag.answer_combiner import (
     collect_relevant_snippets,
     choose_best_answer,
 )
-from config import (
-    PDF_DIR,
-    DB_PATH,
-    EMBED_MODEL,
-    RERANK_MODEL,
-    CHUNK_SIZE,
-    CHUNK_OVERLAP,
-    TOP_K,
-    RERANK_TOP_N,
-    RAG_MODE,
-    ENABLE_GAP_RETRIEVAL,
-    log_line,
-)
+from config import PDF_DIR, CHUNK_STORE_ENABLED, COMBINE_MAX_CHUNKS, log_line
+
+
+def iter_pdfs(pdf_dir: str):
+    """
+    Liefert alle echten Dateien mit Endung .pdf (case-insensitive) in `pdf_dir`.
+    """
+    for pdf in Path(pdf_dir).iterdir():
+        if not pdf.is_file():
+            continue
+        if pdf.suffix.lower() != ".pdf":
+            continue
+        yield pdf
+
+
+def chunk_records(pdf_name: str, pages, size: int, overlap: int) -> list[tuple[str, int, str]]:
+    """
+    Chunks eines PDFs als (pdf_name, seite, text_ohne_präfix).
+    """
+    records: list[tuple[str, int, str]] = []
+    for pno, text in pages:
+        for c in chunk_page(text, size, overlap):
+            records.append((pdf_name, pno, c))
+    return records
+
+
+def build_chunks(pdf_name: str, pages, size: int, overlap: int) -> list[str]:
+    """
+    Erzeugt die zu indizierenden Chunk-Texte eines PDFs aus bereits
+    extrahierten Seiten.
+
+    Ausgelagert aus PDFRAG.ingest, damit z.B. ein Chunking-Sweep einmal
+    geparste Seiten mit verschiedenen (size, overlap) neu chunken kann.
+    Tabellen werden nicht als Chunks indiziert (ihr Text steht bereits in
+    den Seiten), sondern zeilenweise im TableRowIndex.
+    """
+    return [format_chunk(*r) for r in chunk_records(pdf_name, pages, size, overlap)]
+
+
+def dedup_records(records: list[tuple[str, int, str]], group=None):
+    """
+    collapse_duplicates() über Chunk-Records (datei, seite, text), getrennt
+    je Gruppe `group(record)` (z.B. Ziel-Shard); ohne `group` über alle.
+
+    Rückgabe
+    --------
+    tuple[list[int], list[list[str]]]
+        Wie collapse_duplicates: Indizes der Repräsentanten (aufsteigend)
+        und pro Repräsentant alle Fundstellen "datei:seite".
+    """
+    groups: dict[str, list[int]] = {}
+    for i, r in enumerate(records):
+        groups.setdefault(group(r) if group is not None else "", []).append(i)
+
+    pairs: list[tuple[int, list[str]]] = []
+    for idx in groups.values():
+        keep, sources = collapse_duplicates(
+            [records[i][2] for i in idx],
+            [f"{records[i][0]}:{records[i][1]}" for i in idx],
+        )
+        pairs.extend((idx[k], src) for k, src in zip(keep, sources))
+    pairs.sort(key=lambda p: p[0])
+    return [i for i, _ in pairs], [src for _, src in pairs]
 
 
 class PDFRAG:
-    def __init__(self):
+    def __init__(
+        self,
+        cfg: RAGConfig | None = None,
+        db_path: str | None = None,
+        micro_batching: bool | None = None,
+        answer_cache: bool | None = None,
+    ):
         """
         Initialisiert Embedder, Retriever und Reranker.
-        """
-        log_line("[PIPELINE] Initialisiere PDFRAG-Komponenten")
-        self.embedder = Embedder(EMBED_MODEL)
-        self.retriever = Retriever(DB_PATH)
-        self.reranker = Reranker(RERANK_MODEL)
 
-    def ingest(self):
+        Modelle, Chroma-Client, Retriever und Indizes kommen aus
+        rag.registry und werden von allen PDFRAG-Instanzen eines Prozesses
+        mit gleichen Modellen bzw. gleichem db_path und gleicher Collection
+        geteilt – eine zweite Instanz (anderer Modus, andere top_k, ...)
+        lädt nichts erneut. Mehrere Korpora (cfg.collection) in derselben
+        DB haben getrennte Indizes.
+        Antwort-Cache und Stufenkosten bleiben pro Instanz.
+
+        Parameter
+        ---------
+        cfg : RAGConfig, optional
+            Konfiguration dieser Instanz. Default: RAGConfig() (Werte aus config).
+        db_path : str, optional
+            Pfad der Vektor-Datenbank (überschreibt cfg.db_path), z.B. für
+            Benchmarks mit synthetischen Korpora.
+        micro_batching : bool, optional
+            Kapselt den Reranker in einen RerankBatcher, sodass parallele
+            query()-Aufrufe ihre Reranking-Paare in gemeinsamen
+            predict-Batches verarbeiten (überschreibt cfg.micro_batching).
+        answer_cache : bool, optional
+            Semantischer Antwort-Cache für query() (überschreibt
+            cfg.answer_cache; für Latenz-Benchmarks abschalten).
         """
-        Liest alle PDFs aus PDF_DIR ein, extrahiert Text und Tabellen,
-        chunked sie, erzeugt Embeddings und speichert alles im Vector-Store.
+        overrides = {"db_path": db_path, "micro_batching": micro_batching, "answer_cache": answer_cache}
+        cfg = cfg or RAGConfig()
+        cfg = cfg.replace(**{k: v for k, v in overrides.items() if v is not None})
+        self.cfg = cfg
+
+        log_line(f"[PIPELINE] Initialisiere PDFRAG-Komponenten {cfg!r}")
+        self.db_path = cfg.db_path
+        self.embedder = registry.embedder(cfg.embed_model)
+        self.retriever = registry.retriever(cfg.db_path, cfg.collection, cfg.sharding)
+        self.tables = registry.table_index(cfg.db_path, cfg.collection) if cfg.table_index else None
+        self.agenda = registry.agenda_index(cfg.db_path, cfg.collection) if cfg.agenda_index else None
+        self.reranker = registry.reranker(cfg.rerank_model, cfg.micro_batching)
+        self.answer_cache = SemanticAnswerCache(cfg.db_path) if cfg.answer_cache else None
+        self.docs = registry.doc_index(cfg.db_path, cfg.collection)
+        self.graph = registry.neighbor_graph(cfg.db_path, cfg.collection) if cfg.neighbor_graph else None
+        # Erwartete Stufendauern für zeitbudgetierte Anfragen
+        self.stage_costs = StageCostModel()
+
+    def ingest(self, pdf_dir: str = PDF_DIR, profile: Profile | None = None, shard: str | None = None):
         """
-        log_line(f"[PIPELINE] Starte Ingestion aus Verzeichnis: {PDF_DIR}")
+        Liest alle PDFs aus `pdf_dir` (Default: PDF_DIR) ein, extrahiert Text
+        und Tabellen, chunked sie, erzeugt Embeddings und speichert alles im
+        Vector-Store.
+
+        Seitentexte und Tabellen kommen aus dem Extraktions-Cache, sofern
+        das PDF (gleicher Inhalt) schon einmal verarbeitet wurde. Nahezu
+        doppelte Chunks werden vor dem Embedding zusammengefasst
+        (DEDUP_ENABLED); der gespeicherte Eintrag listet in den Metadaten
+        ("sources") alle Fundstellen.
+
+        Ist ein ChunkStore aktiv (CHUNK_STORE_ENABLED), landen die Texte
+        nur dort (Seitentext einmal, Chunks als Offsets); Chroma speichert
+        dann nur IDs, Embeddings und Metadaten.
+
+        Zusätzlich erhält jedes PDF einen Dokument-Vektor (DocumentIndex)
+        für die zweistufige Suche (HIERARCHICAL_RETRIEVAL), und der
+        Nachbarschaftsgraph (NeighborGraph) für den Modus "expand" wird
+        inkrementell um die neuen Chunks ergänzt.
+
+        Mit VDB_SHARDING landen die Chunks in einem Shard je Datei
+        (shard_for) bzw. alle in `shard`, falls angegeben.
+
+        Optional nimmt `profile` die Laufzeiten der Stufen (extract, chunk,
+        embed, index) sowie Zähler für PDFs, Seiten, Cache-Treffer, Chunks
+        und Embeddings auf.
+        """
+        if profile is None:
+            profile = Profile()
+        if shard is not None and not isinstance(self.retriever, ShardedRetriever):
+            raise ValueError("shard= erfordert VDB_SHARDING = True")
+        # Auf dem aktuellen Stand der Platte aufsetzen (Ingestion anderer Prozesse)
+        registry.sync(self.db_path)
+
+        log_line(f"[PIPELINE] Starte Ingestion aus Verzeichnis: {pdf_dir}")
 
-        docs: list[str] = []
+        records: list[tuple[str, int, str]] = []
+        page_texts: dict[tuple[str, int], str] = {}
 
         # Debug: Welche Einträge sieht Python im PDF_DIR?
-        log_line(f"[PIPELINE] Ingestion: Liste Dateien in {PDF_DIR}")
-        for entry in Path(PDF_DIR).iterdir():
+        log_line(f"[PIPELINE] Ingestion: Liste Dateien in {pdf_dir}")
+        for entry in Path(pdf_dir).iterdir():
             log_line(
                 f"[PIPELINE] Ingestion: gefundenes Entry: {entry} "
                 f"(is_file={entry.is_file()}, suffix={entry.suffix})"
             )
 
-        # Nur echte Dateien mit .pdf (case-insensitive) verarbeiten
-        for pdf in Path(PDF_DIR).iterdir():
-            if not pdf.is_file():
-                continue
-            if pdf.suffix.lower() != ".pdf":
-                continue
-
+        for pdf in iter_pdfs(pdf_dir):
             pdf_path = str(pdf)
             pdf_name = pdf.name
             log_line(f"[PIPELINE] Verarbeite PDF: {pdf_path}")
+            profile.count("pdfs")
+
+            # Text-Seiten und Tabellen extrahieren (bzw. aus dem Cache lesen)
+            with profile.stage("extract"):
+                pages, tables, cache_hit = extract_cached(pdf_path)
+            profile.count("pages", len(pages))
+            if cache_hit:
+                profile.count("extract_cache_hits")
 
-            # Text-Seiten extrahieren
-            pages = extract_pages(pdf_path)
+            with profile.stage("chunk"):
+                records.extend(chunk_records(pdf_name, pages, self.cfg.chunk_size, self.cfg.chunk_overlap))
+            if CHUNK_STORE_ENABLED:
+                page_texts.update(((pdf_name, pno), text) for pno, text in pages)
 
-            # Tabellen extrahieren
-            tables = extract_tables(pdf_path)
+            if self.tables is not None:
+                self.tables.set_tables(pdf_name, tables)
+                profile.count("table_rows", sum(len(t["rows"]) for t in tables))
 
-            # Seiten chunking
-            for pno, text in pages:
-                for c in chunk_page(text, CHUNK_SIZE, CHUNK_OVERLAP):
-                    # Page-Information im Text belassen (wie bisher)
-                    docs.append(f"[file {pdf_name}] [page {pno}] {c}")
+            if self.agenda is not None:
+                with profile.stage("agenda_extract"):
+                    profile.count("agenda_tops", self.agenda.set_document(pdf_name, pages))
 
-            # Tabellen als eigenständige Chunks
-            for t in tables:
-                docs.append(f"[file {pdf_name}] [table]\n{t}")
+        profile.count("chunks", len(records))
 
-        if not docs:
+        if self.tables is not None:
+            with profile.stage("table_index"):
+                self.tables.save()
+
+        if self.agenda is not None:
+            with profile.stage("agenda_index"):
+                self.agenda.save()
+
+        if not records:
             log_line("[PIPELINE] WARNUNG: Keine Dokumente gefunden, Ingestion beendet.")
             return
 
-        # Embeddings berechnen
-        embs = self.embedder.encode(docs)
+        # Nahezu doppelte Chunks (Briefköpfe, Fußzeilen, Boilerplate)
+        # zu einem Eintrag mit allen Fundstellen zusammenfassen (cfg.dedup)
+        if self.cfg.dedup:
+            with profile.stage("dedup"):
+                keep, sources = self._dedup(records, shard)
+        else:
+            keep = list(range(len(records)))
+            sources = [[f"{r[0]}:{r[1]}"] for r in records]
 
-        # Einfache IDs auf Basis des Hashes des Textes
-        ids = [str(hash(d)) for d in docs]
+        docs = [format_chunk(*records[i]) for i in keep]
+        metadatas = [{"sources": json.dumps(src, ensure_ascii=False), "n_sources": len(src)}
+                     for src in sources]
 
-        # In Vector-DB speichern
-        self.retriever.add(ids, docs, embs)
+        # Embeddings berechnen
+        with profile.stage("embed"):
+            embs = self.embedder.encode(docs)
+        profile.count("embeddings", len(docs))
+
+        removed = len(records) - len(docs)
+        if removed:
+            profile.count("dedup_removed", removed)
+            dropped_text = sum(
+                len(format_chunk(*r).encode("utf-8")) for r in records
+            ) - sum(len(d.encode("utf-8")) for d in docs)
+            saved_bytes = dropped_text + removed * embs.shape[1] * embs.dtype.itemsize
+            log_line(
+                f"[PIPELINE] DEDUP_SAVINGS embeddings_saved={removed} "
+                f"index_bytes_saved~{saved_bytes} ({saved_bytes / 1e6:.2f} MB, "
+                f"Text + float32-Vektoren)"
+            )
 
-        log_line(f"[PIPELINE] Ingestion abgeschlossen. Dokumente: {len(docs)}")
+        # Stabile IDs auf Basis des Textes (reproduzierbar über Läufe hinweg)
+        ids = [chunk_id(d) for d in docs]
 
-    def query(self, question: str) -> str:
+        # In Vector-DB speichern (Texte als Offsets im ChunkStore, sofern aktiv)
+        with profile.stage("index"):
+            chunks = [records[i] for i in keep]
+            texts = page_texts if CHUNK_STORE_ENABLED else None
+            if shard is not None:
+                self.retriever.add_chunks(ids, chunks, embs, metadatas, page_texts=texts, shard=shard)
+            else:
+                self.retriever.add_chunks(ids, chunks, embs, metadatas, page_texts=texts)
+
+        # Dokument-Vektoren für die zweistufige Suche; ein zusammengefasster
+        # Chunk zählt zu jedem PDF, in dem er vorkommt
+        with profile.stage("doc_index"):
+            by_file: dict[str, list[int]] = {}
+            for j, src in enumerate(sources):
+                for f in dict.fromkeys(loc.rsplit(":", 1)[0] for loc in src):
+                    by_file.setdefault(f, []).append(j)
+            for f, js in by_file.items():
+                self.docs.set_document(f, [ids[j] for j in js], embs[js])
+            self.docs.save()
+
+        # Nachbarschaftsgraph: Seitenreihenfolge der neuen Chunks, kNN nur für
+        # die neuen Chunks gegen alle (bestehende Zeilen werden nachgeführt)
+        if self.graph is not None:
+            with profile.stage("neighbor_graph"):
+                pages: dict[tuple[str, int], list[str]] = {}
+                for j, i in sorted(enumerate(keep), key=lambda x: x[1]):
+                    f, pno, _ = records[i]
+                    pages.setdefault((f, pno), []).append(ids[j])
+                self.graph.set_pages(pages)
+                self._update_graph(new=(ids, embs))
+                self.graph.save()
+
+        # Neue Ingest-Version -> Antwort-Caches und geladene Indizes anderer
+        # Prozesse ungültig; dieser Prozess ist bereits auf dem neuen Stand
+        registry.mark_current(self.db_path, bump_ingest_version(self.db_path))
+
+        profile.finish()
+        log_line(
+            f"[PIPELINE] Ingestion abgeschlossen. Dokumente: {len(docs)} "
+            f"(Chunks vor Deduplikation: {len(records)})"
+        )
+        log_line(f"[PIPELINE] INGEST_PROFILE {profile.summary()}")
+
+    def query(
+        self,
+        question: str,
+        profile: Profile | None = None,
+        budget_s: float | None = None,
+        deadline: float | None = None,
+    ) -> str:
         """
         Beantwortet eine Frage auf Basis der indizierten PDFs.
 
@@ -111,43 +324,438 @@ class PDFRAG:
         5. (Optional) Zweiter Retrieval-Pass auf Basis der Gap-Queries
         6. Kombination aller relevanten Chunks zu einer finalen Antwort (LLM)
 
+        Modus und Gap-Analyse kommen aus cfg.mode / cfg.enable_gap; sind
+        sie nicht gesetzt, werden sie bei jedem Aufruf aus config gelesen,
+        damit set_rag_mode() im selben Prozess wirkt.
+
+        Parameter
+        ---------
+        question : str
+            Die Benutzerfrage.
+        profile : Profile, optional
+            Nimmt Laufzeiten pro Stufe und Zähler (LLM-/Embedding-Aufrufe)
+            auf, z.B. für Benchmarks. Ohne Angabe wird intern ein Profile
+            angelegt und nur ins Log geschrieben.
+        budget_s : float, optional
+            Zeitbudget in Sekunden (Default: cfg.budget_s). Optionale
+            Stufen, deren erwartete Dauer nicht mehr ins Budget passt,
+            werden übersprungen; die beste bis dahin verfügbare Antwort wird
+            geliefert. Übersprungene Stufen stehen im Log ("[DEADLINE] SKIP")
+            und als Zähler "skipped_<stufe>" im Profile.
+        deadline : float, optional
+            Alternativ absoluter Zeitpunkt (time.perf_counter()).
+
         Rückgabe:
         ---------
         str: Finale Antwort auf Deutsch.
         """
+        return self.query_with_sources(question, profile, budget_s, deadline)["answer"]
+
+    def query_with_sources(
+        self,
+        question: str,
+        profile: Profile | None = None,
+        budget_s: float | None = None,
+        deadline: float | None = None,
+    ) -> dict:
+        """
+        Wie query(), liefert aber zusätzlich die Quell-Chunk-IDs des
+        Antwort-Kontexts.
+
+        Fragen nach genau einem Feld eines TOP (z.B. "Beschlussempfehlung
+        für TOP 4") beantwortet zuerst der AgendaIndex, noch vor dem
+        Embedding. Ist der Antwort-Cache aktiv (ANSWER_CACHE_ENABLED), wird
+        eine sinngleiche, bereits beantwortete Frage desselben Modus direkt
+        aus dem Cache beantwortet – ohne Retrieval und ohne LLM-Aufrufe.
+
+        Rückgabe
+        --------
+        dict
+            {"answer": str, "source_ids": list[str], "cached": bool,
+            "similarity": float | None (nur bei Cache-Treffer),
+            "agenda_source": "datei:seite" | None (nur bei Index-Antwort)}
+        """
+        if profile is None:
+            profile = Profile()
+        budget = Deadline(budget_s if budget_s is not None else self.cfg.budget_s, deadline)
+        # Nach einer Ingestion in einem anderen Prozess Stores und Indizes neu
+        # laden, sonst fehlen neue Chroma-Treffer im ChunkStore
+        registry.sync(self.db_path)
+
+        mode = self.cfg.mode_name()
+
+        if self.agenda is not None and self.cfg.agenda_fast_path:
+            with profile.stage("agenda_lookup"):
+                fact = self.agenda.lookup(question)
+            if fact is not None:
+                profile.count("agenda_fast_path")
+                profile.finish()
+                log_line(f"[PIPELINE] AGENDA_FAST_PATH key={fact['key']} source={fact['source']}")
+                log_line(f"[PIPELINE] QUERY_END (agenda index) Frage: {question}")
+                log_line(f"[PIPELINE] QUERY_PROFILE {profile.summary()}")
+                return {
+                    "answer": fact["answer"],
+                    "source_ids": [],
+                    "cached": False,
+                    "similarity": None,
+                    "agenda_source": fact["source"],
+                }
+
+        with profile.stage("embed_query"):
+            qemb = self.embedder.encode([question])[0]
+        profile.count("embed_calls")
+
+        if self.answer_cache is not None:
+            with profile.stage("answer_cache"):
+                hit = self.answer_cache.lookup(qemb, mode, question)
+            if hit is not None:
+                profile.count("answer_cache_hits")
+                profile.finish()
+                log_line(f"[PIPELINE] QUERY_END (answer cache) Frage: {question}")
+                log_line(f"[PIPELINE] QUERY_PROFILE {profile.summary()}")
+                return {
+                    "answer": hit["answer"],
+                    "source_ids": hit["source_ids"],
+                    "cached": True,
+                    "similarity": hit["similarity"],
+                    "agenda_source": None,
+                }
+
+        first = self.first_stage(question, profile, qemb=qemb, deadline=budget)
+        answer, source_ids = self._answer(
+            first, mode == "enhanced", profile, deadline=budget, expand=mode == "expand"
+        )
+
+        # "Nicht gefunden"-Antworten und gekürzte Läufe nicht cachen
+        degraded = any(k.startswith("skipped_") for k in profile.counters)
+        if self.answer_cache is not None and not degraded and not is_not_found_answer(answer):
+            self.answer_cache.put(question, qemb, mode, answer, source_ids)
+
+        self.stage_costs.update_from(profile)
+        if budget.bounded and budget.remaining() < 0:
+            profile.count("deadline_exceeded")
+            log_line(f"[DEADLINE] überschritten um {-budget.remaining() * 1000.0:.0f}ms")
+        profile.finish()
+        log_line(f"[PIPELINE] QUERY_PROFILE {profile.summary()}")
+        return {
+            "answer": answer,
+            "source_ids": source_ids,
+            "cached": False,
+            "similarity": None,
+            "agenda_source": None,
+        }
+
+    def first_stage(
+        self,
+        question: str,
+        profile: Profile | None = None,
+        qemb=None,
+        deadline: Deadline | None = None,
+    ) -> dict:
+        """
+        Modusunabhängiger erster Teil der Anfrage: Embedding der Frage,
+        erster Retrieval-Pass und Reranking.
+
+        Das Ergebnis kann für mehrere answer()-Aufrufe (z.B. simple und
+        enhanced in der Evaluation) wiederverwendet werden und wird dabei
+        nicht verändert.
+
+        Chunks werden nur über ihre IDs weitergereicht; Texte entstehen
+        erst für das Reranking bzw. in answer() beim Aufbau der Prompts.
+        Ein bereits berechnetes Frage-Embedding kann als `qemb` übergeben
+        werden. Reicht das Zeitbudget (`deadline`) nicht für das Reranking,
+        bleibt die Reihenfolge der Vektorsuche.
+
+        Mit cfg.rerank_cascade bestimmt die Verteilung der
+        Vektor-Ähnlichkeiten, wie viele Treffer cross-encodet werden
+        (rag/rerank_cascade.py); deren Scores werden für das gemeinsame
+        Reranking mit dem zweiten Pass in answer() aufbewahrt.
+
+        Rückgabe
+        --------
+        dict
+            Schlüssel: "question", "qemb", "first_ids", "reranked_ids",
+            "rerank_scores" (Chunk-ID -> CrossEncoder-Score, leer ohne
+            Reranking), "table_rows" (passende Tabellenzeilen, ggf. leer).
+        """
+        if profile is None:
+            profile = Profile()
+
         log_line(f"[PIPELINE] QUERY_START Frage: {question}")
 
         # ===== 1) Embedding der Frage =====
-        qemb = self.embedder.encode([question])[0]
+        if qemb is None:
+            with profile.stage("embed_query"):
+                qemb = self.embedder.encode([question])[0]
+            profile.count("embed_calls")
 
         # ===== 2) Erster Retrieval-Pass =====
-        first_docs = self.retriever.search(qemb, TOP_K)
-        log_line(
-            "[PIPELINE] FIRST_RETRIEVAL Ergebnisse START\n"
-            + "\n---\n".join(first_docs)
-            + "\n[PIPELINE] FIRST_RETRIEVAL Ergebnisse ENDE"
-        )
+        with profile.stage("retrieve"):
+            first_ids, first_dists = self._search(qemb, self.cfg.top_k, profile)
+        profile.count("vdb_searches")
+        self._log_chunks("FIRST_RETRIEVAL Ergebnisse", first_ids)
 
         # ===== 3) Reranking =====
-        reranked_docs = self.reranker.rerank(question, first_docs[:RERANK_TOP_N])
-        log_line(
-            "[PIPELINE] RERANKED Ergebnisse START\n"
-            + "\n---\n".join(reranked_docs)
-            + "\n[PIPELINE] RERANKED Ergebnisse ENDE"
+        rerank_scores: dict[str, float] = {}
+        if self._may_run("rerank", deadline, profile, reserve=("combine",)):
+            with profile.stage("rerank"):
+                candidates = self._rerank_candidates(first_ids, first_dists, "first")
+                cand_texts = self.retriever.texts(candidates)
+                candidates = [cid for cid, t in zip(candidates, cand_texts) if t is not None]
+                cand_texts = [t for t in cand_texts if t is not None]
+                scores = self.reranker.scores(question, cand_texts)
+                order = sort_by_scores(cand_texts, scores)
+                reranked_ids = [candidates[i] for i in order]
+                rerank_scores = dict(zip(candidates, scores))
+            profile.count("rerank_pairs", len(candidates))
+            self._log_chunks("RERANKED Ergebnisse", reranked_ids, [cand_texts[i] for i in order])
+        else:
+            reranked_ids = first_ids[:self.cfg.rerank_top_n]
+
+        # ===== 3b) Tabellenzeilen (Stichwortsuche im TableRowIndex) =====
+        table_rows: list[str] = []
+        if self.tables is not None:
+            with profile.stage("table_lookup"):
+                table_rows = self.tables.lookup(
+                    question, self.cfg.table_lookup_top_n, self.cfg.table_lookup_min_score
+                )
+            if table_rows:
+                log_line(
+                    "[PIPELINE] TABLE_ROWS START\n"
+                    + "\n".join(table_rows)
+                    + "\n[PIPELINE] TABLE_ROWS ENDE"
+                )
+
+        return {
+            "question": question,
+            "qemb": qemb,
+            "first_ids": first_ids,
+            "reranked_ids": reranked_ids,
+            "rerank_scores": rerank_scores,
+            "table_rows": table_rows,
+        }
+
+    def _may_run(self, unit: str, deadline: Deadline | None, profile: Profile, reserve: tuple[str, ...] = ()) -> bool:
+        """Prüft das Zeitbudget für eine optionale Stufe; zählt Auslassungen im Profile."""
+        if deadline is None or deadline.allows(self.stage_costs, unit, reserve):
+            return True
+        profile.count(f"skipped_{unit}")
+        profile.count("stages_skipped")
+        return False
+
+    def _rerank_candidates(self, ids: list[str], dists: list[float], label: str) -> list[str]:
+        """Treffer einer Suche, die cross-encodet werden (Kaskade oder feste Top-N)."""
+        cfg = self.cfg
+        if not cfg.rerank_cascade:
+            return ids[:cfg.rerank_top_n]
+        return select_candidates(
+            ids, dists, self.retriever.space,
+            cfg.rerank_min_n, cfg.rerank_top_n, cfg.rerank_max_drop, cfg.rerank_knee_gap,
+            label=label,
         )
 
-        # ===== 4) Einfacher Modus oder Gap-Analyse deaktiviert =====
-        if RAG_MODE == "simple" or not ENABLE_GAP_RETRIEVAL:
+    def _rerank_pool(
+        self,
+        question: str,
+        ids: list[str],
+        scored: dict[str, float],
+        profile: Profile,
+    ) -> tuple[list[str], list[str]]:
+        """
+        Zweite Stufe der Kaskade: bewertet alle noch nicht bewerteten
+        Chunks aus `ids` in EINEM CrossEncoder-Aufruf und sortiert den
+        gesamten Pool (bereits bewertete aus `scored` inklusive) nach Score.
+        Rückgabe: (ids, texte) in dieser Reihenfolge.
+        """
+        pool = [(cid, t) for cid, t in zip(ids, self.retriever.texts(ids)) if t is not None]
+        new = [(cid, t) for cid, t in pool if cid not in scored]
+        with profile.stage("rerank_pool"):
+            new_scores = self.reranker.scores(question, [t for _, t in new])
+            scores = {**scored, **{cid: s for (cid, _), s in zip(new, new_scores)}}
+            order = sort_by_scores([t for _, t in pool], [scores[cid] for cid, _ in pool])
+        profile.count("rerank_pairs", len(new))
+        log_line(f"[RERANK_CASCADE] pool={len(pool)} new_pairs={len(new)} reused={len(pool) - len(new)}")
+        return [pool[i][0] for i in order], [pool[i][1] for i in order]
+
+    def _search(self, emb, k: int, profile: Profile) -> tuple[list[str], list[float]]:
+        """
+        Chunk-Suche (IDs und Distanzen); mit cfg.hierarchical zweistufig: erst die
+        cfg.doc_select_top_n ähnlichsten PDFs, dann exakte Suche nur über deren
+        Chunks. Bei kleinen Korpora (nicht mehr PDFs als ausgewählt würden)
+        bleibt es bei der normalen Suche.
+        """
+        top_n = self.cfg.doc_select_top_n
+        if self.cfg.hierarchical and len(self.docs) > top_n:
+            selected = self.docs.select(emb, top_n)
+            candidates = self.docs.chunk_ids([f for f, _ in selected])
+            profile.count("doc_candidates", len(candidates))
             log_line(
-                f"[PIPELINE] SIMPLE_MODE oder GAP_ANALYSE deaktiviert "
-                f"(RAG_MODE={RAG_MODE}, ENABLE_GAP_RETRIEVAL={ENABLE_GAP_RETRIEVAL})"
+                "[PIPELINE] DOC_SELECT "
+                + ", ".join(f"{f} ({sim:.3f})" for f, sim in selected)
+                + f" -> chunks={len(candidates)}"
             )
-            answer = combine(question, reranked_docs)
-            log_line("[PIPELINE] QUERY_END (simple / no-gap)")
-            return answer
+            return self.retriever.search_within(emb, candidates, k)
+        return self.retriever.search_ids(emb, k)
+
+    def _expand(self, reranked_ids: list[str], profile: Profile) -> list[str]:
+        """
+        Kontext für den Modus "expand": Fenster aus Sequenz- und
+        kNN-Nachbarn um die besten Treffer, danach die übrigen
+        Reranking-Treffer. Keine Embedding- oder LLM-Aufrufe.
+        """
+        cfg = self.cfg
+        if self.graph is None or not len(self.graph):
+            log_line("[PIPELINE] EXPAND: kein Nachbarschaftsgraph vorhanden, nutze Reranking-Treffer")
+            return list(reranked_ids)
+        with profile.stage("expand"):
+            window = self.graph.expand(
+                reranked_ids[:cfg.expand_seeds], COMBINE_MAX_CHUNKS,
+                cfg.expand_knn, cfg.expand_min_sim, cfg.expand_span, cfg.expand_hops,
+            )
+            ids = list(dict.fromkeys(window + list(reranked_ids)))
+        profile.count("expanded_chunks", len(ids) - len(reranked_ids))
+        return ids
+
+    def drop_shard(self, shard: str) -> list[str]:
+        """
+        Löscht einen Shard (VDB_SHARDING) samt seiner Einträge in Tabellen-,
+        Agenda- und Dokument-Index; im Nachbarschaftsgraphen werden nur die
+        Zeilen neu berechnet, die auf entfernte Chunks zeigten. Liefert die
+        entfernten PDFs.
+        """
+        if not isinstance(self.retriever, ShardedRetriever):
+            raise ValueError("drop_shard erfordert VDB_SHARDING = True")
+        registry.sync(self.db_path)
+        files = self.retriever.drop_shard(shard)
+
+        if self.tables is not None:
+            for f in files:
+                self.tables.set_tables(f, [])
+            self.tables.save()
+        if self.agenda is not None:
+            for f in files:
+                self.agenda.set_document(f, [])
+            self.agenda.save()
+        self.docs.remove(files)
+        self.docs.save()
+        if self.graph is not None:
+            self._update_graph()
+            self.graph.save()
+
+        registry.mark_current(self.db_path, bump_ingest_version(self.db_path))
+        log_line(f"[PIPELINE] DROP_SHARD shard={shard} files={files}")
+        return files
+
+    def _dedup(self, records: list[tuple[str, int, str]], shard: str | None):
+        """
+        collapse_duplicates() getrennt je Ziel-Shard (ohne Sharding über
+        alle Chunks), damit ein Shard nie auf Chunks eines anderen verweist
+        und sich unabhängig löschen lässt. Rückgabe wie collapse_duplicates.
+        """
+        if not isinstance(self.retriever, ShardedRetriever):
+            return dedup_records(records)
+        return dedup_records(records, lambda r: shard or shard_for(r[0]))
+
+    def _update_graph(self, new: tuple[list[str], np.ndarray] | None = None, page_size: int = 5000):
+        """
+        Führt den Nachbarschaftsgraphen auf den aktuellen Stand der DB nach
+        (NeighborGraph.update); die Embeddings aller Chunks werden dabei nur
+        seitenweise gelesen, nie als Ganzes gehalten.
+        """
+        all_ids = self.retriever.all_ids()
+
+        def pages():
+            for start in range(0, len(all_ids), page_size):
+                f, e = self.retriever.get_embeddings(all_ids[start:start + page_size])
+                if f:
+                    yield f, e
+
+        self.graph.update(all_ids, pages, self.retriever.get_embeddings, new=new)
+
+    def _chunk_texts(self, ids: list[str]) -> list[str]:
+        """Texte zu Chunk-IDs (unbekannte IDs werden übersprungen)."""
+        return [t for t in self.retriever.texts(ids) if t is not None]
+
+    def _log_chunks(self, label: str, ids: list[str], texts: list[str] | None = None):
+        """
+        Ergebnisblock "[PIPELINE] <label> START ... ENDE" im Log.
+
+        LOG_CHUNKS="full": Chunk-Texte wie bisher (ggf. erst jetzt geladen).
+        LOG_CHUNKS="ids": nur Rang und ID je Chunk; bereits vorhandene Texte
+        kommen einmalig ins Chunk-Wörterbuch, fehlende lassen sich mit
+        tests/rehydrate_log.py aus dem Index nachladen.
+        """
+        if chunk_log.full_text():
+            body = "\n---\n".join(texts if texts is not None else self._chunk_texts(ids))
+        else:
+            for cid, text in zip(ids, texts or []):
+                chunk_log.register(cid, text)
+            body = chunk_log.id_lines(ids)
+        log_line(f"[PIPELINE] {label} START\n{body}\n[PIPELINE] {label} ENDE")
+
+    def answer(self, first: dict, enhanced: bool, profile: Profile | None = None, expand: bool = False) -> str:
+        """
+        Zweiter, modusabhängiger Teil der Anfrage auf Basis von first_stage():
+        im simple-Modus direkt die Antwort-Kombination, im enhanced-Modus
+        zusätzlich Gap-Analyse, zweiter Retrieval-Pass und Fail-Safe, im
+        expand-Modus Kontext-Erweiterung über den Nachbarschaftsgraphen.
+
+        Parameter
+        ---------
+        first : dict
+            Ergebnis von first_stage().
+        enhanced : bool
+            True = enhanced-Modus mit Gap-Analyse, False = simple.
+        expand : bool, optional
+            Nur ohne `enhanced`: Kontext von den besten Treffern aus entlang
+            des Nachbarschaftsgraphen erweitern (Modus "expand").
+        """
+        return self._answer(first, enhanced, profile, expand=expand)[0]
+
+    def _answer(
+        self,
+        first: dict,
+        enhanced: bool,
+        profile: Profile | None = None,
+        deadline: Deadline | None = None,
+        expand: bool = False,
+    ) -> tuple[str, list[str]]:
+        """answer() plus die Chunk-IDs des verwendeten Kontexts."""
+        if profile is None:
+            profile = Profile()
+
+        # Ohne Budget für Gap-Analyse + zweiten Pass: Antwort wie im simple-Modus,
+        # sofern vorhanden mit der (kostenlosen) Erweiterung über den Graphen
+        if enhanced and not self._may_run("gap", deadline, profile, reserve=("combine",)):
+            enhanced = False
+            expand = self.graph is not None and len(self.graph) > 0
+
+        question = first["question"]
+        table_rows = first.get("table_rows", [])
+        reranked_ids = first["reranked_ids"]
+        # Passende Tabellenzeilen stehen vor den Text-Chunks im Kontext
+        reranked_docs = table_rows + self._chunk_texts(reranked_ids)
+
+        # ===== 4) Einfacher Modus / Erweiterung über den Nachbarschaftsgraphen =====
+        if not enhanced:
+            if expand:
+                log_line("[PIPELINE] EXPAND_MODE: Kontext-Erweiterung über den Nachbarschaftsgraphen")
+                context_ids = self._expand(reranked_ids, profile)
+                context_docs = table_rows + self._chunk_texts(context_ids)
+                self._log_chunks("EXPANDED_CONTEXT", context_ids)
+            else:
+                log_line("[PIPELINE] SIMPLE_MODE oder GAP_ANALYSE deaktiviert")
+                context_ids, context_docs = list(reranked_ids), reranked_docs
+            with profile.stage("combine"):
+                answer = combine(question, context_docs)
+            profile.count("llm_calls")
+            log_line(f"[PIPELINE] QUERY_END ({'expand' if expand else 'simple / no-gap'})")
+            return answer, context_ids
 
         # ===== 5) Gap-Analyse =====
-        gap_queries = analyze_gap(question, reranked_docs)
+        with profile.stage("gap_analysis"):
+            gap_queries = analyze_gap(question, reranked_docs)
+        profile.count("llm_calls")
         if not gap_queries:
             log_line("[PIPELINE] GAP_ANALYSE: NONE -> nutze Originalfrage als zusätzliche Gap-Query.")
             gap_queries = [question]
@@ -158,64 +766,77 @@ class PDFRAG:
         )
 
         # ===== 6) Zweiter Retrieval-Pass auf Basis der Gap-Queries =====
-        extra_docs: list[str] = []
+        extra_ids: list[str] = []
 
         for nq in gap_queries:
             log_line(f"[PIPELINE] SECOND_RETRIEVAL für Gap-Query: {nq}")
-            nq_emb = self.embedder.encode([nq])[0]
-            hits = self.retriever.search(nq_emb, TOP_K)
-
-            log_line(
-                "[PIPELINE] SECOND_RETRIEVAL Ergebnisse START\n"
-                + "\n---\n".join(hits)
-                + "\n[PIPELINE] SECOND_RETRIEVAL Ergebnisse ENDE"
-            )
-
-            extra_docs.extend(hits)
-
-        # Kombinieren der Chunks aus erstem und zweitem Retrieval-Pass
-        combined_docs = reranked_docs + extra_docs
-
-        # Duplikate entfernen, Reihenfolge beibehalten
+            with profile.stage("embed_gap"):
+                nq_emb = self.embedder.encode([nq])[0]
+            profile.count("embed_calls")
+            with profile.stage("second_retrieval"):
+                hits, hit_dists = self._search(nq_emb, self.cfg.top_k, profile)
+            profile.count("vdb_searches")
+
+            self._log_chunks("SECOND_RETRIEVAL Ergebnisse", hits)
+
+            # Kaskade: schwache Treffer gar nicht erst in den Pool
+            if self.cfg.rerank_cascade:
+                hits = self._rerank_candidates(hits, hit_dists, "gap")
+            extra_ids.extend(hits)
+
+        # Kombinieren der Chunks aus erstem und zweitem Retrieval-Pass;
+        # Duplikate über die IDs entfernen, Reihenfolge beibehalten
         seen = set()
-        unique_docs: list[str] = []
-        for d in combined_docs:
-            if d not in seen:
-                seen.add(d)
-                unique_docs.append(d)
-
-        log_line(
-            "[PIPELINE] COMBINED_CONTEXT START\n"
-            + "\n---\n".join(unique_docs)
-            + "\n[PIPELINE] COMBINED_CONTEXT ENDE"
-        )
+        unique_ids: list[str] = []
+        for cid in reranked_ids + extra_ids:
+            if cid not in seen:
+                seen.add(cid)
+                unique_ids.append(cid)
+
+        # Erst hier (Prompt-Aufbau) werden die Chunk-Texte erzeugt. Mit der
+        # Kaskade wird der gemeinsame Pool nach CrossEncoder-Score sortiert,
+        # damit die besten Chunks in den ersten COMBINE_MAX_CHUNKS landen.
+        scored = first.get("rerank_scores") or {}
+        if self.cfg.rerank_cascade and scored:
+            unique_ids, texts = self._rerank_pool(question, unique_ids, scored, profile)
+        else:
+            texts = self._chunk_texts(unique_ids)
+        unique_docs = table_rows + texts
+
+        # Tabellenzeilen haben keine Chunk-ID -> Referenz über den Text-Hash
+        self._log_chunks("COMBINED_CONTEXT", [chunk_id(d) for d in unique_docs], unique_docs)
 
         # ===== 7) Finale Antwort-Kombination (erster Versuch) =====
-        answer = combine(question, unique_docs)
+        with profile.stage("combine"):
+            answer = combine(question, unique_docs)
+        profile.count("llm_calls")
         log_line("[PIPELINE] FIRST_ANSWER")
         log_line(answer)
 
         # ===== 8) Fail-Safe NUR im enhanced: wenn Antwort sagt, dass Infos fehlen =====
-        if is_not_found_answer(answer):
+        if is_not_found_answer(answer) and self._may_run("failsafe", deadline, profile):
             log_line("[PIPELINE] FAILSAFE_TRIGGER: Antwort meldet fehlende Informationen. Starte Sammel-Pass.")
 
-            snippets = collect_relevant_snippets(question, unique_docs)
+            with profile.stage("failsafe_collect"):
+                snippets = collect_relevant_snippets(question, unique_docs)
+            profile.count("llm_calls")
             log_line("[PIPELINE] COLLECTED_SNIPPETS_START")
             log_line(snippets)
             log_line("[PIPELINE] COLLECTED_SNIPPETS_END")
 
-            improved_answer = choose_best_answer(question, snippets)
+            with profile.stage("failsafe_choose"):
+                improved_answer = choose_best_answer(question, snippets)
+            profile.count("llm_calls")
             log_line("[PIPELINE] IMPROVED_ANSWER")
             log_line(improved_answer)
 
             if not is_not_found_answer(improved_answer):
                 log_line("[PIPELINE] QUERY_END (enhanced, mit Fail-Safe-Verbesserung)")
-                return improved_answer
+                return improved_answer, unique_ids
             else:
                 log_line("[PIPELINE] FAILSAFE_NO_IMPROVEMENT, gebe ursprüngliche Antwort zurück.")
                 log_line("[PIPELINE] QUERY_END (enhanced, ohne Verbesserung)")
-                return answer
+                return answer, unique_ids
 
         log_line("[PIPELINE] QUERY_END (enhanced, ohne Fail-Safe)")
-        return answer
-
+        return answer, unique_ids
@@ -0,0 +1,58 @@
+# rag/profiling.py
+
+import time
+from contextlib import contextmanager
+
+
+class Profile:
+    def __init__(self):
+        """
+        Sammelt Laufzeiten pro Pipeline-Stufe und einfache Zähler
+        (z.B. Anzahl LLM- und Embedding-Aufrufe) für EINE Anfrage bzw.
+        EINEN Ingestion-Lauf.
+
+        Eine Instanz wird nicht zwischen Threads geteilt; parallele Anfragen
+        verwenden jeweils ihr eigenes Profile.
+        """
+        self.stages: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self._t_start = time.perf_counter()
+        self._t_end: float | None = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Misst die Dauer des umschlossenen Blocks und addiert sie auf die
+        Stufe `name` (mehrfach genutzte Stufen werden aufsummiert).
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def count(self, name: str, n: int = 1):
+        """Erhöht den Zähler `name` um `n`."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        """Markiert das Ende der Messung (für total_s)."""
+        self._t_end = time.perf_counter()
+
+    @property
+    def total_s(self) -> float:
+        end = self._t_end if self._t_end is not None else time.perf_counter()
+        return end - self._t_start
+
+    def as_dict(self) -> dict:
+        return {
+            "total_s": self.total_s,
+            "stages_s": dict(self.stages),
+            "counters": dict(self.counters),
+        }
+
+    def summary(self) -> str:
+        """Kompakte einzeilige Darstellung für das Log."""
+        stages = " ".join(f"{k}={v * 1000.0:.1f}ms" for k, v in self.stages.items())
+        counters = " ".join(f"{k}={v}" for k, v in self.counters.items())
+        return f"total={self.total_s * 1000.0:.1f}ms {stages} {counters}".strip()
@@ -0,0 +1,117 @@
+# rag/rag_config.py
+
+import copy
+
+import config
+
+
+class RAGConfig:
+    def __init__(
+        self,
+        db_path: str | None = None,
+        collection: str = "pdf",
+        sharding: bool | None = None,
+        embed_model: str | None = None,
+        rerank_model: str | None = None,
+        micro_batching: bool | None = None,
+        mode: str | None = None,
+        enable_gap: bool | None = None,
+        top_k: int | None = None,
+        rerank_top_n: int | None = None,
+        rerank_cascade: bool | None = None,
+        rerank_min_n: int | None = None,
+        rerank_max_drop: float | None = None,
+        rerank_knee_gap: float | None = None,
+        chunk_size: int | None = None,
+        chunk_overlap: int | None = None,
+        dedup: bool | None = None,
+        table_index: bool | None = None,
+        table_lookup_top_n: int | None = None,
+        table_lookup_min_score: float | None = None,
+        agenda_index: bool | None = None,
+        agenda_fast_path: bool | None = None,
+        hierarchical: bool | None = None,
+        doc_select_top_n: int | None = None,
+        answer_cache: bool | None = None,
+        neighbor_graph: bool | None = None,
+        expand_seeds: int | None = None,
+        expand_span: int | None = None,
+        expand_knn: int | None = None,
+        expand_min_sim: float | None = None,
+        expand_hops: int | None = None,
+        budget_s: float | None = None,
+    ):
+        """
+        Konfiguration EINER PDFRAG-Instanz.
+
+        Nicht gesetzte Werte (None) werden beim Anlegen aus config.py
+        übernommen. Ausnahme: `mode` und `enable_gap` – bleiben sie None,
+        gilt bei jeder Anfrage der aktuelle globale Stand (set_rag_mode).
+        So können mehrere unterschiedlich konfigurierte Pipelines (A/B-Modi,
+        mehrere Korpora) in einem Prozess nebeneinander laufen; schwere
+        Ressourcen teilen sie über rag.registry.
+        """
+        def pick(value, default):
+            return default if value is None else value
+
+        self.db_path = pick(db_path, config.DB_PATH)
+        self.collection = collection
+        self.sharding = pick(sharding, config.VDB_SHARDING)
+        self.embed_model = pick(embed_model, config.EMBED_MODEL)
+        self.rerank_model = pick(rerank_model, config.RERANK_MODEL)
+        self.micro_batching = pick(micro_batching, config.RERANK_MICRO_BATCHING)
+        self.mode = mode
+        self.enable_gap = enable_gap
+        self.top_k = pick(top_k, config.TOP_K)
+        self.rerank_top_n = pick(rerank_top_n, config.RERANK_TOP_N)
+        self.rerank_cascade = pick(rerank_cascade, config.RERANK_CASCADE)
+        self.rerank_min_n = pick(rerank_min_n, config.RERANK_MIN_N)
+        self.rerank_max_drop = pick(rerank_max_drop, config.RERANK_MAX_DROP)
+        self.rerank_knee_gap = pick(rerank_knee_gap, config.RERANK_KNEE_GAP)
+        self.chunk_size = pick(chunk_size, config.CHUNK_SIZE)
+        self.chunk_overlap = pick(chunk_overlap, config.CHUNK_OVERLAP)
+        self.dedup = pick(dedup, config.DEDUP_ENABLED)
+        self.table_index = pick(table_index, config.TABLE_INDEX_ENABLED)
+        self.table_lookup_top_n = pick(table_lookup_top_n, config.TABLE_LOOKUP_TOP_N)
+        self.table_lookup_min_score = pick(table_lookup_min_score, config.TABLE_LOOKUP_MIN_SCORE)
+        self.agenda_index = pick(agenda_index, config.AGENDA_INDEX_ENABLED)
+        self.agenda_fast_path = pick(agenda_fast_path, config.AGENDA_FAST_PATH)
+        self.hierarchical = pick(hierarchical, config.HIERARCHICAL_RETRIEVAL)
+        self.doc_select_top_n = pick(doc_select_top_n, config.DOC_SELECT_TOP_N)
+        self.answer_cache = pick(answer_cache, config.ANSWER_CACHE_ENABLED)
+        self.neighbor_graph = pick(neighbor_graph, config.NEIGHBOR_GRAPH_ENABLED)
+        self.expand_seeds = pick(expand_seeds, config.EXPAND_SEEDS)
+        self.expand_span = pick(expand_span, config.EXPAND_SPAN)
+        self.expand_knn = pick(expand_knn, config.EXPAND_KNN)
+        self.expand_min_sim = pick(expand_min_sim, config.EXPAND_MIN_SIM)
+        self.expand_hops = pick(expand_hops, config.EXPAND_HOPS)
+        self.budget_s = pick(budget_s, config.QUERY_BUDGET_S)
+
+    def mode_name(self) -> str:
+        """Wirksamer Modus dieser Anfrage: "simple", "enhanced" oder "expand"."""
+        mode = self.mode if self.mode is not None else config.RAG_MODE
+        gap = self.enable_gap if self.enable_gap is not None else config.ENABLE_GAP_RETRIEVAL
+        if mode == "expand":
+            return "expand"
+        return "enhanced" if mode != "simple" and gap else "simple"
+
+    def enhanced(self) -> bool:
+        """True, wenn Anfragen im enhanced-Modus mit Gap-Analyse laufen."""
+        return self.mode_name() == "enhanced"
+
+    def expand(self) -> bool:
+        """True, wenn der Kontext über den Nachbarschaftsgraphen erweitert wird."""
+        return self.mode_name() == "expand"
+
+    def replace(self, **changes) -> "RAGConfig":
+        """Kopie mit geänderten Werten (unbekannte Namen sind ein Fehler)."""
+        new = copy.copy(self)
+        for name, value in changes.items():
+            if not hasattr(new, name):
+                raise AttributeError(f"RAGConfig hat keinen Parameter {name!r}")
+            setattr(new, name, value)
+        return new
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"RAGConfig({fields})"
@@ -0,0 +1,167 @@
+# rag/registry.py
+
+import os
+import threading
+
+import chromadb
+
+from rag.embeddings import Embedder
+from rag.reranker import Reranker
+from rag.rerank_batcher import RerankBatcher
+from rag.retriever import Retriever
+from rag.sharded_retriever import ShardedRetriever
+from rag.table_index import TableRowIndex
+from rag.doc_index import DocumentIndex
+from rag.neighbor_graph import NeighborGraph
+from rag.agenda_index import AgendaIndex
+from rag.answer_cache import read_ingest_version
+from config import (
+    log_line,
+    INDEX_DIR,
+    TABLE_INDEX_FILE,
+    DOC_INDEX_FILE,
+    NEIGHBOR_GRAPH_FILE,
+    AGENDA_INDEX_FILE,
+)
+
+# Prozessweite Ressourcen: (art, schlüssel...) -> Objekt.
+# RLock, weil Fabriken ihrerseits Ressourcen anfordern (Batcher -> Reranker).
+_lock = threading.RLock()
+_resources: dict[tuple, object] = {}
+# Zuletzt gesehene Ingest-Version je DB-Pfad (für sync())
+_versions: dict[str, str] = {}
+# Ressourcen, deren erster Schlüssel der DB-Pfad ist
+_PATH_KINDS = {
+    "chroma_client", "retriever", "sharded_retriever",
+    "table_index", "agenda_index", "doc_index", "neighbor_graph",
+}
+
+
+def _shared(kind: str, key: tuple, factory):
+    with _lock:
+        k = (kind, *key)
+        obj = _resources.get(k)
+        if obj is None:
+            if kind in _PATH_KINDS:
+                # Version vor dem Laden merken: spätere Ingestion -> sync() lädt neu
+                _versions.setdefault(key[0], read_ingest_version(key[0]))
+            obj = factory()
+            _resources[k] = obj
+            log_line(f"[REGISTRY] neu {kind} {key}")
+        return obj
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def embedder(model: str) -> Embedder:
+    return _shared("embedder", (model,), lambda: Embedder(model))
+
+
+def reranker(model: str, micro_batching: bool = False):
+    """CrossEncoder einmal pro Modell; der Batcher (falls gewünscht) ebenfalls geteilt."""
+    base = _shared("reranker", (model,), lambda: Reranker(model))
+    if not micro_batching:
+        return base
+    return _shared("rerank_batcher", (model,), lambda: RerankBatcher(base))
+
+
+def chroma_client(path: str):
+    return _shared("chroma_client", (_norm(path),), lambda: chromadb.PersistentClient(path=path))
+
+
+def retriever(path: str, collection: str = "pdf", sharding: bool = False) -> Retriever:
+    if sharding:
+        return _shared(
+            "sharded_retriever", (_norm(path), collection),
+            lambda: ShardedRetriever(path, prefix=collection, client=chroma_client(path)),
+        )
+    return _shared(
+        "retriever", (_norm(path), collection),
+        lambda: Retriever(path, collection, client=chroma_client(path)),
+    )
+
+
+def index_path(path: str, collection: str, filename: str) -> str:
+    """
+    Datei eines Index der Collection: <path>/<INDEX_DIR>/<collection>/<filename>.
+    Für die Standard-Collection "pdf" wird ein Index am früheren Ort
+    (<path>/<filename>) weiter genutzt, solange es keinen neuen gibt.
+    """
+    new = os.path.join(path, INDEX_DIR, collection, filename)
+    legacy = os.path.join(path, filename)
+    if collection == "pdf" and not os.path.exists(new) and os.path.exists(legacy):
+        return legacy
+    return new
+
+
+def table_index(path: str, collection: str = "pdf") -> TableRowIndex:
+    return _shared(
+        "table_index", (_norm(path), collection),
+        lambda: TableRowIndex(index_path(path, collection, TABLE_INDEX_FILE)),
+    )
+
+
+def agenda_index(path: str, collection: str = "pdf") -> AgendaIndex:
+    return _shared(
+        "agenda_index", (_norm(path), collection),
+        lambda: AgendaIndex(index_path(path, collection, AGENDA_INDEX_FILE)),
+    )
+
+
+def doc_index(path: str, collection: str = "pdf") -> DocumentIndex:
+    return _shared(
+        "doc_index", (_norm(path), collection),
+        lambda: DocumentIndex(index_path(path, collection, DOC_INDEX_FILE)),
+    )
+
+
+def neighbor_graph(path: str, collection: str = "pdf") -> NeighborGraph:
+    return _shared(
+        "neighbor_graph", (_norm(path), collection),
+        lambda: NeighborGraph(index_path(path, collection, NEIGHBOR_GRAPH_FILE)),
+    )
+
+
+def sync(path: str) -> bool:
+    """
+    Lädt die dateibasierten Ressourcen von `path` (ChunkStores, Tabellen-,
+    Agenda- und Dokument-Index, Nachbarschaftsgraph, Shard-Liste) neu,
+    wenn sich die Ingest-Version seit dem letzten Aufruf geändert hat –
+    etwa nach einer Ingestion in einem anderen Prozess. True bei Reload.
+    """
+    key = _norm(path)
+    version = read_ingest_version(path)
+    with _lock:
+        seen = _versions.setdefault(key, version)
+        if seen == version:
+            return False
+        _versions[key] = version
+        stale = [obj for k, obj in _resources.items() if k[1:2] == (key,) and hasattr(obj, "reload")]
+        for obj in stale:
+            obj.reload()
+    log_line(f"[REGISTRY] Ingest-Version geändert ({version}), {len(stale)} Ressourcen neu geladen path={path}")
+    return True
+
+
+def mark_current(path: str, version: str):
+    """Merkt eine selbst geschriebene Ingest-Version (kein Reload bei sync())."""
+    with _lock:
+        _versions[_norm(path)] = version
+
+
+def loaded() -> list[tuple]:
+    """Schlüssel aller geladenen Ressourcen (z.B. für Logs/Tests)."""
+    with _lock:
+        return sorted(_resources, key=str)
+
+
+def clear():
+    """Vergisst alle Ressourcen; offene RerankBatcher werden beendet."""
+    with _lock:
+        for obj in _resources.values():
+            if isinstance(obj, RerankBatcher):
+                obj.close()
+        _resources.clear()
+        _versions.clear()
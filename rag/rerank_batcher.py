@@ -0,0 +1,235 @@
+# rag/rerank_batcher.py
+
+import queue
+import threading
+import time
+from collections import deque
+
+from rag.reranker import Reranker, sort_by_scores
+from config import log_line, RERANK_BATCH_MAX_PAIRS, RERANK_BATCH_MAX_WAIT_MS
+
+
+class _PendingRequest:
+    """
+    Ein einzelner rerank()-Aufruf, der auf seinen Anteil an einem
+    gemeinsamen predict-Batch wartet.
+    """
+
+    __slots__ = ("query", "docs", "scores", "error", "done", "t_submit")
+
+    def __init__(self, query: str, docs: list[str]):
+        self.query = query
+        self.docs = docs
+        self.scores = None
+        self.error = None
+        self.done = threading.Event()
+        self.t_submit = time.perf_counter()
+
+
+class RerankBatcher:
+    def __init__(
+        self,
+        reranker: Reranker,
+        max_batch_pairs: int = RERANK_BATCH_MAX_PAIRS,
+        max_wait_ms: float = RERANK_BATCH_MAX_WAIT_MS,
+        latency_window: int = 1000,
+    ):
+        """
+        Micro-Batching-Schicht vor einem Reranker.
+
+        Parallele Aufrufer übergeben ihre (Query, Dokument)-Paare an eine
+        Warteschlange. Ein Hintergrund-Thread sammelt Paare, bis entweder
+        `max_wait_ms` seit der ersten wartenden Anfrage vergangen sind oder
+        `max_batch_pairs` erreicht ist, führt EINEN predict-Aufruf des
+        CrossEncoders aus und verteilt die Scores zurück an die Aufrufer.
+        Eine Anfrage, die den Batch über `max_batch_pairs` hinaus füllen
+        würde, wartet auf den nächsten Batch; predict() rechnet in Blöcken
+        von höchstens `max_batch_pairs` Paaren, auch wenn eine einzelne
+        Anfrage allein größer ist.
+
+        Die Schnittstellen `rerank(query, docs)` und `order(query, docs)`
+        sind identisch zu `Reranker`, der Batcher kann also transparent
+        eingesetzt werden.
+        """
+        self.reranker = reranker
+        self.max_batch_pairs = max(1, int(max_batch_pairs))
+        self.max_wait_s = max(0.0, float(max_wait_ms) / 1000.0)
+
+        self._queue: queue.Queue = queue.Queue()
+        # Zurückgestellte Anfrage, die den letzten Batch überfüllt hätte
+        self._deferred: _PendingRequest | None = None
+        self._stats_lock = threading.Lock()
+        self._latencies_ms: deque = deque(maxlen=latency_window)
+        self._n_requests = 0
+        self._n_batches = 0
+        self._n_pairs = 0
+        self._predict_seconds = 0.0
+        self._t_start = time.perf_counter()
+
+        self._worker = threading.Thread(
+            target=self._run, name="rerank-batcher", daemon=True
+        )
+        self._worker.start()
+
+        log_line(
+            f"[RERANK_BATCH] init max_batch_pairs={self.max_batch_pairs} "
+            f"max_wait_ms={max_wait_ms}"
+        )
+
+    def rerank(self, query: str, docs: list[str]) -> list[str]:
+        """
+        Re-rankt `docs` für `query`; blockiert, bis der gemeinsame Batch
+        berechnet wurde.
+
+        Rückgabe
+        --------
+        list[str]
+            Die Dokumente, sortiert nach absteigender Relevanz.
+        """
+        return [docs[i] for i in self.order(query, docs)]
+
+    def order(self, query: str, docs: list[str]) -> list[int]:
+        """
+        Wie rerank(), liefert aber die Indizes der Dokumente in absteigender
+        Relevanz.
+        """
+        if not docs:
+            log_line("[RERANK] keine Dokumente übergeben, Rückgabe: []")
+            return []
+        return sort_by_scores(docs, self.scores(query, docs))
+
+    def scores(self, query: str, docs: list[str]) -> list[float]:
+        """Wie Reranker.scores(), berechnet im gemeinsamen Batch."""
+        if not docs:
+            return []
+
+        log_line(f"[RERANK] START query={query} doc_count={len(docs)} (batched)")
+
+        req = _PendingRequest(query, docs)
+        self._queue.put(req)
+        req.done.wait()
+
+        if req.error is not None:
+            raise req.error
+
+        latency_ms = (time.perf_counter() - req.t_submit) * 1000.0
+        with self._stats_lock:
+            self._n_requests += 1
+            self._latencies_ms.append(latency_ms)
+
+        return req.scores
+
+    def _collect_batch(self, first: _PendingRequest) -> tuple[list[_PendingRequest], bool]:
+        """
+        Sammelt ab `first` weitere Anfragen, bis Zeitfenster oder
+        Batch-Größe ausgeschöpft sind. Gibt (batch, stop_requested) zurück.
+        Eine Anfrage, die `max_batch_pairs` überschreiten würde, wird für
+        den nächsten Batch zurückgestellt.
+        """
+        batch = [first]
+        n_pairs = len(first.docs)
+        deadline = time.perf_counter() + self.max_wait_s
+
+        while n_pairs < self.max_batch_pairs:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                req = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if req is None:
+                return batch, True
+            if n_pairs + len(req.docs) > self.max_batch_pairs:
+                self._deferred = req
+                break
+            batch.append(req)
+            n_pairs += len(req.docs)
+
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first, self._deferred = self._deferred, None
+            if first is None:
+                first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect_batch(first)
+            self._execute(batch)
+
+    def _execute(self, batch: list[_PendingRequest]):
+        pairs = [(req.query, d) for req in batch for d in req.docs]
+
+        t0 = time.perf_counter()
+        try:
+            scores = self.reranker.model.predict(pairs, batch_size=min(len(pairs), self.max_batch_pairs))
+        except Exception as e:
+            log_line(f"[RERANK_BATCH] predict FEHLER: {e!r}")
+            for req in batch:
+                req.error = e
+                req.done.set()
+            return
+        elapsed = time.perf_counter() - t0
+
+        with self._stats_lock:
+            self._n_batches += 1
+            self._n_pairs += len(pairs)
+            self._predict_seconds += elapsed
+
+        log_line(
+            f"[RERANK_BATCH] predict requests={len(batch)} pairs={len(pairs)} "
+            f"ms={elapsed * 1000.0:.1f}"
+        )
+
+        # Scores in der Reihenfolge der Paare zurück an die Aufrufer verteilen
+        offset = 0
+        for req in batch:
+            n = len(req.docs)
+            req.scores = [float(s) for s in scores[offset:offset + n]]
+            offset += n
+            req.done.set()
+
+    def metrics(self) -> dict:
+        """
+        Liefert einen Snapshot der Batching-Metriken.
+
+        Enthält Durchsatz (Paare pro Sekunde reiner predict-Zeit und pro
+        Sekunde Wall-Clock seit Start), mittlere Batch-Größe sowie
+        Latenz-Perzentile pro rerank()-Aufruf (inkl. Wartezeit im Batch).
+        """
+        with self._stats_lock:
+            lat = sorted(self._latencies_ms)
+            n_batches = self._n_batches
+            n_pairs = self._n_pairs
+            n_requests = self._n_requests
+            predict_s = self._predict_seconds
+        wall_s = time.perf_counter() - self._t_start
+
+        def pct(p: float) -> float:
+            if not lat:
+                return 0.0
+            return lat[min(len(lat) - 1, int(round(p * (len(lat) - 1))))]
+
+        return {
+            "requests": n_requests,
+            "batches": n_batches,
+            "pairs": n_pairs,
+            "avg_pairs_per_batch": (n_pairs / n_batches) if n_batches else 0.0,
+            "avg_requests_per_batch": (n_requests / n_batches) if n_batches else 0.0,
+            "predict_pairs_per_s": (n_pairs / predict_s) if predict_s > 0 else 0.0,
+            "wall_pairs_per_s": (n_pairs / wall_s) if wall_s > 0 else 0.0,
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_max": lat[-1] if lat else 0.0,
+        }
+
+    def close(self):
+        """
+        Beendet den Hintergrund-Thread, nachdem alle bereits eingereihten
+        Anfragen abgearbeitet wurden.
+        """
+        self._queue.put(None)
+        self._worker.join()
+        log_line(f"[RERANK_BATCH] closed metrics={self.metrics()}")
@@ -0,0 +1,71 @@
+# rag/rerank_cascade.py
+
+from config import log_line
+
+
+def similarities(dists: list[float], space: str) -> list[float]:
+    """
+    Vektor-Ähnlichkeit aus Chroma-Distanzen: 1 - d für cosine/ip, für l2
+    (quadrierte Distanz) 1 - d/2 – gilt für L2-normierte Embeddings, wie
+    sie der Embedder liefert.
+    """
+    if space == "l2":
+        return [1.0 - d / 2.0 for d in dists]
+    return [1.0 - d for d in dists]
+
+
+def cascade_cut(
+    sims: list[float],
+    min_n: int,
+    max_n: int,
+    max_drop: float,
+    knee_gap: float,
+) -> int:
+    """
+    Anzahl der vorderen (nach Ähnlichkeit absteigend sortierten) Kandidaten,
+    die cross-encodet werden.
+
+    Mindestens `min_n` und höchstens `max_n`. Dazwischen bleiben nur
+    Kandidaten, deren Ähnlichkeit höchstens `max_drop` unter der des besten
+    liegt; liegt in diesem Bereich ein Sprung >= `knee_gap` zwischen zwei
+    Nachbarn, wird am größten Sprung abgeschnitten. Eindeutige Anfragen
+    (ein klarer Treffer, dann deutlich Abstand) kosten so wenige Paare,
+    gleichmäßig verteilte Scores behalten die volle Kandidatenzahl.
+    """
+    n = min(len(sims), max_n)
+    if n <= min_n:
+        return n
+
+    top = sims[0]
+    keep = min_n
+    while keep < n and sims[keep] >= top - max_drop:
+        keep += 1
+
+    # gaps[j] = Sprung zwischen Position min_n + j - 1 und min_n + j
+    gaps = [sims[i - 1] - sims[i] for i in range(min_n, keep)]
+    if gaps:
+        j = max(range(len(gaps)), key=gaps.__getitem__)
+        if gaps[j] >= knee_gap:
+            keep = min_n + j
+    return keep
+
+
+def select_candidates(
+    ids: list[str],
+    dists: list[float],
+    space: str,
+    min_n: int,
+    max_n: int,
+    max_drop: float,
+    knee_gap: float,
+    label: str = "",
+) -> list[str]:
+    """Vordere Treffer einer Suche nach cascade_cut(); loggt die Auswahl."""
+    sims = similarities(dists, space)
+    n = cascade_cut(sims, min_n, max_n, max_drop, knee_gap)
+    if sims:
+        log_line(
+            f"[RERANK_CASCADE] {label} candidates={len(ids)} keep={n} "
+            f"sim_top={sims[0]:.4f} sim_cut={sims[n - 1] if n else float('nan'):.4f}"
+        )
+    return ids[:n]
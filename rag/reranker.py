@@ -1,9 +1,31 @@
 # rag/reranker.py
 
 from sentence_transformers import CrossEncoder
+from rag import chunk_log
 from config import log_line
 
 
+def sort_by_scores(docs: list[str], scores) -> list[int]:
+    """
+    Reihenfolge der Dokumente (Indizes) absteigend nach ihren
+    CrossEncoder-Scores; loggt das Ranking.
+
+    Wird sowohl vom direkten Reranking als auch vom Micro-Batching
+    (rag.rerank_batcher) verwendet, damit beide Pfade identische
+    Ergebnisse und Logs erzeugen.
+    """
+    idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+
+    log_lines = ["[RERANK] RESULTS:"]
+    for rank, i in enumerate(idx, start=1):
+        score = scores[i]
+        log_lines.append(f"  rank={rank} index={i} score={score:.4f} {chunk_log.ref(docs[i])}")
+    log_line("\n".join(log_lines))
+
+    log_line("[RERANK] END")
+    return idx
+
+
 class Reranker:
     def __init__(self, model_path: str):
         """
@@ -31,27 +53,33 @@ class Reranker:
         list[str]
             Die Dokumente, sortiert nach absteigender Relevanz.
         """
+        return [docs[i] for i in self.order(query, docs)]
+
+    def order(self, query: str, docs: list[str]) -> list[int]:
+        """
+        Wie rerank(), liefert aber die Indizes der Dokumente in absteigender
+        Relevanz (z.B. um parallel geführte Chunk-IDs mitzusortieren).
+
+        Rückgabe
+        --------
+        list[int]
+            Indizes in `docs`, sortiert nach absteigender Relevanz.
+        """
         if not docs:
             log_line("[RERANK] keine Dokumente übergeben, Rückgabe: []")
             return []
+        return sort_by_scores(docs, self.scores(query, docs))
+
+    def scores(self, query: str, docs: list[str]) -> list[float]:
+        """
+        CrossEncoder-Scores der Dokumente (gleiche Reihenfolge wie `docs`),
+        z.B. um später weitere Kandidaten dazuzumischen, ohne bereits
+        bewertete Paare erneut zu berechnen.
+        """
+        if not docs:
+            return []
 
         log_line(f"[RERANK] START query={query} doc_count={len(docs)}")
 
         pairs = [(query, d) for d in docs]
-        scores = self.model.predict(pairs)
-
-        idx = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
-        reranked_docs = [docs[i] for i in idx]
-
-        log_lines = ["[RERANK] RESULTS:"]
-        for rank, i in enumerate(idx, start=1):
-            score = scores[i]
-            doc_text = docs[i]
-            log_lines.append(
-                f"  rank={rank} index={i} score={score:.4f} "
-                f"text_START\n{doc_text}\ntext_END"
-            )
-        log_line("\n".join(log_lines))
-
-        log_line("[RERANK] END")
-        return reranked_docs
\ No newline at end of file
+        return [float(s) for s in self.model.predict(pairs)]
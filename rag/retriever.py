@@ -1,21 +1,108 @@
 # rag/retriever.py
 
+import os
+
 import chromadb
-from config import log_line
+import numpy as np
+from rag.chunker import chunk_id, format_chunk  # chunk_id: bisheriger Importpfad bleibt gültig
+from rag.chunk_store import ChunkStore
+from rag import chunk_log
+from config import (
+    log_line,
+    CHUNK_STORE_ENABLED,
+    CHUNK_STORE_DIR,
+    HNSW_SPACE,
+    HNSW_M,
+    HNSW_CONSTRUCTION_EF,
+    HNSW_SEARCH_EF,
+    VDB_ADD_BATCH_SIZE,
+)
+
+
+def hnsw_metadata(search_ef: int = HNSW_SEARCH_EF) -> dict:
+    """Collection-Metadaten mit den HNSW-Parametern aus config."""
+    return {
+        "hnsw:space": HNSW_SPACE,
+        "hnsw:M": HNSW_M,
+        "hnsw:construction_ef": HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": search_ef,
+    }
+
+
+def max_batch_size(client) -> int:
+    """Größte Batchgröße für col.add (VDB_ADD_BATCH_SIZE oder Limit des Clients)."""
+    if VDB_ADD_BATCH_SIZE > 0:
+        return VDB_ADD_BATCH_SIZE
+    getter = getattr(client, "get_max_batch_size", None)
+    if getter is not None:
+        return int(getter())
+    return int(getattr(client, "max_batch_size", 5000))
+
+
+def bulk_add(col, batch_size: int, ids, embs, metadatas=None, documents=None):
+    """
+    Fügt Einträge in Blöcken von höchstens `batch_size` ein (Chroma lehnt
+    größere Einzelaufrufe ab). Liefert die Anzahl der Blöcke.
+    """
+    n = len(ids)
+    n_batches = 0
+    for start in range(0, n, batch_size):
+        end = min(n, start + batch_size)
+        col.add(
+            ids=ids[start:end],
+            embeddings=embs[start:end],
+            metadatas=metadatas[start:end] if metadatas is not None else None,
+            documents=documents[start:end] if documents is not None else None,
+        )
+        n_batches += 1
+    return n_batches
+
+
+def distances(embs: np.ndarray, q: np.ndarray, space: str) -> np.ndarray:
+    """Distanzen wie in Chroma/hnswlib für den jeweiligen Space."""
+    if space == "l2":
+        return ((embs - q) ** 2).sum(axis=1)
+    dots = embs @ q
+    if space == "ip":
+        return 1.0 - dots
+    norms = np.linalg.norm(embs, axis=1) * (np.linalg.norm(q) or 1.0)
+    norms[norms == 0] = 1.0
+    return 1.0 - dots / norms
 
 
 class Retriever:
-    def __init__(self, path: str):
+    def __init__(self, path: str, collection: str = "pdf", client=None):
         """
         Initialisiert einen persistenten Chroma-Client und eine Collection
         für PDF-Dokumente.
+
+        Parameter
+        ---------
+        path : str
+            Verzeichnis der Vektor-Datenbank.
+        collection : str, optional
+            Name der Collection. Default: "pdf".
+        client : chromadb.PersistentClient, optional
+            Bereits geöffneter Client für `path` (z.B. gemeinsam für alle
+            Shards eines ShardedRetriever).
         """
-        self.client = chromadb.PersistentClient(path=path)
-        # Name der Collection: "pdf" (konstant)
-        self.col = self.client.get_or_create_collection("pdf")
-        log_line(f"[VDB] init path={path}, collection=pdf")
+        self.client = client if client is not None else chromadb.PersistentClient(path=path)
+        self.collection_name = collection
+        self.col = self.client.get_or_create_collection(collection, metadata=hnsw_metadata())
+        # Space/M bestehender Collections lassen sich nicht nachträglich ändern
+        self.space = (self.col.metadata or {}).get("hnsw:space", "l2")
+        if self.space != HNSW_SPACE:
+            log_line(
+                f"[VDB] WARNUNG collection={collection} hat space={self.space}, "
+                f"config HNSW_SPACE={HNSW_SPACE} gilt erst nach Neuaufbau"
+            )
+        # Chunk-Texte außerhalb von Chroma (siehe rag/chunk_store.py)
+        self.store = None
+        if CHUNK_STORE_ENABLED:
+            self.store = ChunkStore(os.path.join(path, CHUNK_STORE_DIR, collection))
+        log_line(f"[VDB] init path={path}, collection={collection}, metadata={self.col.metadata}")
 
-    def add(self, ids, docs, embs):
+    def add(self, ids, docs, embs, metadatas=None):
         """
         Fügt Dokumente samt Embeddings in die Vektor-Datenbank ein.
 
@@ -23,16 +110,96 @@ class Retriever:
         ---------
         ids : list[str]
             Eindeutige IDs für jedes Dokument / jeden Chunk.
-        docs : list[str]
-            Die eigentlichen Textinhalte (Chunks).
+        docs : list[str] oder None
+            Die eigentlichen Textinhalte (Chunks). None, wenn die Texte
+            bereits im ChunkStore liegen – Chroma speichert dann nur IDs,
+            Embeddings und Metadaten.
         embs : list[list[float]] oder np.ndarray
             Embeddings zu den Dokumenten.
+        metadatas : list[dict], optional
+            Metadaten je Dokument (z.B. Fundstellen zusammengefasster Duplikate).
         """
-        n = len(docs)
-        log_line(f"[VDB] add START count={n}")
-        self.col.add(ids=ids, documents=docs, embeddings=embs)
+        n = len(ids)
+        batch_size = max_batch_size(self.client)
+        log_line(f"[VDB] add START count={n} batch_size={batch_size}")
+        n_batches = bulk_add(self.col, batch_size, ids, embs, metadatas, docs)
         # Hinweis: PersistentClient speichert automatisch, kein persist() mehr nötig
-        log_line(f"[VDB] add DONE count={n}")
+        log_line(f"[VDB] add DONE count={n} batches={n_batches}")
+
+    def add_chunks(self, ids, chunks, embs, metadatas=None, page_texts=None):
+        """
+        Speichert Chunks: Texte als Offsets im ChunkStore (sofern aktiv und
+        `page_texts` übergeben), sonst wie bisher als Dokumente in Chroma.
+
+        Parameter
+        ---------
+        ids : list[str]
+            Chunk-IDs.
+        chunks : list[tuple[str, int, str]]
+            (datei, seite, text_ohne_präfix) je ID.
+        embs : np.ndarray
+            Embeddings je ID.
+        metadatas : list[dict], optional
+        page_texts : dict[tuple[str, int], str], optional
+            Bereinigte Seitentexte, auf die die Chunks verweisen.
+        """
+        if self.store is not None and page_texts is not None:
+            self.store.write(page_texts, [(cid, *c) for cid, c in zip(ids, chunks)])
+            self.add(ids, None, embs, metadatas)
+        else:
+            self.add(ids, [format_chunk(*c) for c in chunks], embs, metadatas)
+
+    def count(self) -> int:
+        return self.col.count()
+
+    def reload(self):
+        """Liest den ChunkStore neu (Chunks aus einer Ingestion in einem anderen Prozess)."""
+        if self.store is not None:
+            self.store.reload()
+
+    def texts(self, ids: list[str]) -> list[str | None]:
+        """
+        Chunk-Texte zu IDs: zuerst aus dem ChunkStore, sonst (ältere
+        Datenbanken, Sweeps ohne Store) aus den Dokumenten in Chroma.
+        Unbekannte IDs liefern None.
+        """
+        out = self.store_texts(ids)
+        missing = [cid for cid, t in zip(ids, out) if t is None]
+        if missing:
+            found = self.chroma_texts(missing)
+            out = [t if t is not None else found.get(cid) for cid, t in zip(ids, out)]
+        return out
+
+    def store_texts(self, ids: list[str]) -> list[str | None]:
+        """Chunk-Texte nur aus dem ChunkStore (ohne Chroma-Aufruf)."""
+        if self.store is not None and len(self.store):
+            return self.store.texts(ids)
+        return [None] * len(ids)
+
+    def has_chroma_documents(self) -> bool:
+        """False, wenn die Texte im ChunkStore liegen und Chroma keine Dokumente hält."""
+        return self.store is None or not len(self.store)
+
+    def chroma_texts(self, ids: list[str]) -> dict[str, str]:
+        """Dokumente aus Chroma zu IDs (ein Aufruf); unbekannte IDs fehlen."""
+        res = self.col.get(ids=ids, include=["documents"])
+        return {cid: doc for cid, doc in zip(res.get("ids") or [], res.get("documents") or []) if doc is not None}
+
+    def all_ids(self) -> list[str]:
+        """Alle IDs der Collection."""
+        return self.col.get(include=[]).get("ids") or []
+
+    def _log_results(self, ids, docs, dists):
+        # Logging der Treffer: IDs und Distanzen, Texte nur bei LOG_CHUNKS="full"
+        log_lines = ["[VDB] search RESULTS:"]
+        for i, d_id in enumerate(ids):
+            dist_str = f"{dists[i]:.4f}" if i < len(dists) else "n/a"
+            line = f"  rank={i+1} id={d_id} distance={dist_str}"
+            if docs is not None:
+                doc_text = (docs[i] if i < len(docs) else "") or ""
+                line += f" text_START\n{doc_text}\ntext_END"
+            log_lines.append(line)
+        log_line("\n".join(log_lines))
 
     def search(self, emb, k: int):
         """
@@ -50,25 +217,100 @@ class Retriever:
         list[str]
             Liste der gefundenen Dokument-Texte (Chunks), sortiert nach Relevanz.
         """
+        ids, _ = self.search_ids(emb, k)
+        return [t for t in self.texts(ids) if t is not None]
+
+    def search_ids(self, emb, k: int) -> tuple[list[str], list[float]]:
+        """
+        Ähnlichkeitssuche wie search(), liefert aber nur (ids, distances).
+        Texte werden nicht aus Chroma geladen.
+        """
         log_line(f"[VDB] search START k={k}")
 
-        res = self.col.query(query_embeddings=[emb], n_results=k)
+        all_ids, all_dists = self.query_ids([emb], k)
+        ids, dists = all_ids[0], all_dists[0]
 
-        ids = res.get("ids", [[]])[0]
-        docs = res.get("documents", [[]])[0]
-        dists = res.get("distances", [[]])[0] if "distances" in res else []
+        # Texte nur für das Volltext-Log laden; im "ids"-Modus bleibt es bei IDs
+        self._log_results(ids, self.texts(ids) if chunk_log.full_text() else None, dists)
+        log_line("[VDB] search END")
 
-        # Vollständiges Logging der Treffer (IDs, Distanzen, Texte)
-        log_lines = ["[VDB] search RESULTS:"]
-        for i, d_id in enumerate(ids):
-            dist_str = f"{dists[i]:.4f}" if i < len(dists) else "n/a"
-            doc_text = docs[i] if i < len(docs) else ""
-            log_lines.append(
-                f"  rank={i+1} id={d_id} distance={dist_str} "
-                f"text_START\n{doc_text}\ntext_END"
-            )
+        return ids, dists
 
-        log_line("\n".join(log_lines))
-        log_line("[VDB] search END")
+    def query_ids(self, embs, k: int) -> tuple[list[list[str]], list[list[float]]]:
+        """
+        Reine Chroma-Abfrage ohne Logging: pro Query-Embedding die Top-k
+        (ids, distances). Wird auch von rag.sharded_retriever je Shard genutzt.
+        """
+        n = len(embs)
+        res = self.col.query(query_embeddings=embs, n_results=k, include=["distances"])
+        all_ids = res.get("ids") or [[] for _ in range(n)]
+        all_dists = res.get("distances") or [[] for _ in range(n)]
+        return all_ids, all_dists
+
+    def get_embeddings(self, ids: list[str]) -> tuple[list[str], np.ndarray]:
+        """Gespeicherte Embeddings zu IDs als (gefundene_ids, matrix)."""
+        if not ids:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        res = self.col.get(ids=ids, include=["embeddings"])
+        found = res.get("ids") or []
+        embs = res.get("embeddings")
+        if embs is None or not found:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return found, np.asarray(embs, dtype=np.float32)
+
+    def search_within(self, emb, ids: list[str], k: int) -> tuple[list[str], list[float]]:
+        """
+        Exakte Suche nur über die Chunks `ids` (z.B. die Chunks vorab
+        ausgewählter PDFs): Embeddings per ID laden, Distanzen im Space der
+        Collection direkt berechnen. Der Aufwand hängt nur von len(ids) ab,
+        nicht von der Größe der Collection.
+        """
+        log_line(f"[VDB] search_within START candidates={len(ids)} k={k}")
+        found, embs = self.get_embeddings(ids)
+        if not found:
+            log_line("[VDB] search_within END (keine Kandidaten)")
+            return [], []
+
+        q = np.asarray(emb, dtype=np.float32).ravel()
+        dists = distances(embs, q, self.space)
+        n = min(k, len(found))
+        top = np.argpartition(dists, n - 1)[:n]
+        top = top[np.argsort(dists[top])]
+
+        top_ids = [found[i] for i in top]
+        top_dists = [float(dists[i]) for i in top]
+        self._log_results(top_ids, self.texts(top_ids) if chunk_log.full_text() else None, top_dists)
+        log_line("[VDB] search_within END")
+        return top_ids, top_dists
+
+    def search_many(self, embs, k: int) -> list[dict]:
+        """
+        Ähnlichkeitssuche für mehrere Queries in EINEM Aufruf der Vektor-DB.
+
+        Parameter
+        ---------
+        embs : np.ndarray oder list[list[float]]
+            Query-Embeddings, eine Zeile pro Query.
+        k : int
+            Anzahl der Top-Ergebnisse pro Query.
+
+        Rückgabe
+        --------
+        list[dict]
+            Pro Query ein Dict mit "ids", "documents" und "distances".
+        """
+        n = len(embs)
+        log_line(f"[VDB] search_many START queries={n} k={k}")
+        if n == 0:
+            return []
+
+        all_ids, all_dists = self.query_ids(embs, k)
+
+        out = []
+        for ids, dists in zip(all_ids, all_dists):
+            docs = self.texts(ids)
+            self._log_results(ids, docs, dists)
+            out.append({"ids": ids, "documents": docs, "distances": dists})
 
-        return docs
\ No newline at end of file
+        log_line("[VDB] search_many END")
+        return out
@@ -0,0 +1,321 @@
+# rag/sharded_retriever.py
+
+import heapq
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import numpy as np
+
+from rag.retriever import Retriever, bulk_add, hnsw_metadata, max_batch_size
+from rag.rerank_cascade import similarities
+from rag.answer_cache import bump_ingest_version
+from config import (
+    log_line,
+    CHUNK_STORE_DIR,
+    SHARD_PREFIX,
+    SHARD_KEY_PATTERN,
+    SHARD_DEFAULT,
+    SHARD_SEARCH_WORKERS,
+    HNSW_SPACE,
+)
+
+_SHARD_KEY_RE = re.compile(SHARD_KEY_PATTERN)
+
+
+def shard_for(pdf_name: str) -> str:
+    """Shard eines PDFs aus dem Dateinamen (SHARD_KEY_PATTERN), z.B. "s101"."""
+    m = _SHARD_KEY_RE.search(pdf_name)
+    return f"s{m.group(1)}" if m else SHARD_DEFAULT
+
+
+def convert_distances(dists: list[float], src: str, dst: str) -> list[float]:
+    """
+    Distanzen eines Spaces in einen anderen umrechnen (über die
+    Kosinus-Ähnlichkeit, gilt für L2-normierte Embeddings): cosine/ip
+    1 - s, l2 (quadriert) 2 - 2s.
+    """
+    if src == dst:
+        return dists
+    sims = similarities(dists, src)
+    if dst == "l2":
+        return [2.0 - 2.0 * s for s in sims]
+    return [1.0 - s for s in sims]
+
+
+def _collection_names(client) -> list[str]:
+    # Je nach Chroma-Version Collection-Objekte oder bereits Namen
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+class ShardedRetriever(Retriever):
+    def __init__(
+        self,
+        path: str,
+        prefix: str = SHARD_PREFIX,
+        max_workers: int = SHARD_SEARCH_WORKERS,
+        client=None,
+    ):
+        """
+        Retriever über mehrere Chroma-Collections ("Shards") derselben
+        Datenbank, z.B. eine pro Senatssitzung.
+
+        Jeder Shard ist ein eigener Retriever (eigener HNSW-Graph, eigener
+        ChunkStore) und kann unabhängig hinzugefügt, gelöscht oder neu
+        indiziert werden. Suchen laufen in einem Thread-Pool parallel über
+        alle Shards; die Top-k je Shard werden nach Distanz zusammengeführt.
+        Nach außen gilt die Schnittstelle von Retriever (search_ids, search,
+        search_many, texts, add_chunks, ...). Distanzen gelten im Space
+        HNSW_SPACE; Shards, die unter einem anderen Space angelegt wurden,
+        werden vor dem Zusammenführen umgerechnet.
+
+        Parameter
+        ---------
+        path : str
+            Verzeichnis der Vektor-Datenbank.
+        prefix : str, optional
+            Collections "<prefix>-<shard>" gehören zu diesem Retriever.
+        max_workers : int, optional
+            Threads für die parallele Suche.
+        client : chromadb.ClientAPI, optional
+            Bestehender Client (z.B. aus rag.registry); sonst ein eigener.
+        """
+        self.path = path
+        self.prefix = prefix
+        self.client = client or chromadb.PersistentClient(path=path)
+        self.collection_name = prefix
+        self.col = None
+        self.store = None
+        # Distanzen aller Shards werden gemeinsam sortiert -> ein Space
+        self.space = HNSW_SPACE
+        self.shards: dict[str, Retriever] = {}
+        # Leere Shards (bei der Suche übersprungen, ohne count()-Aufruf)
+        self._empty: set[str] = set()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard-search")
+
+        for name in sorted(_collection_names(self.client)):
+            if name.startswith(f"{prefix}-") and not name.endswith("-reindex"):
+                self._open(name[len(prefix) + 1:])
+        log_line(f"[VDB_SHARDS] init path={path} prefix={prefix} shards={sorted(self.shards)}")
+
+    def _collection(self, shard: str) -> str:
+        return f"{self.prefix}-{re.sub(r'[^A-Za-z0-9_-]', '_', shard)}"
+
+    def _open(self, shard: str) -> Retriever:
+        r = Retriever(self.path, self._collection(shard), client=self.client)
+        if r.space != self.space:
+            log_line(
+                f"[VDB_SHARDS] WARNUNG shard={shard} space={r.space} != {self.space}: "
+                f"Distanzen werden umgerechnet, reindex_shard gleicht den Space an"
+            )
+        self.shards[shard] = r
+        if r.count() == 0:
+            self._empty.add(shard)
+        else:
+            self._empty.discard(shard)
+        return r
+
+    # ----- Verwaltung -----
+
+    def add_shard(self, shard: str) -> Retriever:
+        """Öffnet bzw. legt einen Shard an."""
+        return self.shards.get(shard) or self._open(shard)
+
+    def shard_files(self, shard: str) -> list[str]:
+        """PDFs, deren Chunks im Shard liegen (aus den "sources"-Metadaten)."""
+        r = self.shards.get(shard)
+        if r is None:
+            return []
+        files: dict[str, None] = {}
+        for meta in r.col.get(include=["metadatas"]).get("metadatas") or []:
+            for loc in json.loads((meta or {}).get("sources") or "[]"):
+                files.setdefault(loc.rsplit(":", 1)[0])
+        return sorted(files)
+
+    def drop_shard(self, shard: str) -> list[str]:
+        """
+        Löscht Collection und ChunkStore eines Shards; andere Shards bleiben
+        unberührt. Liefert die PDFs des Shards, damit pfadweite Indizes
+        (Tabellen, Agenda, Dokumente, Graph) bereinigt werden können
+        (PDFRAG.drop_shard).
+        """
+        files = self.shard_files(shard)
+        r = self.shards.pop(shard, None)
+        self._empty.discard(shard)
+        name = self._collection(shard)
+        if name in _collection_names(self.client):
+            self.client.delete_collection(name)
+        shutil.rmtree(os.path.join(self.path, CHUNK_STORE_DIR, name), ignore_errors=True)
+        log_line(
+            f"[VDB_SHARDS] drop shard={shard} collection={name} existed={r is not None} files={len(files)}"
+        )
+        return files
+
+    def reindex_shard(self, shard: str, batch_size: int = 5000):
+        """
+        Baut den HNSW-Graphen eines Shards neu auf: Einträge werden
+        seitenweise in eine neue Collection kopiert, die danach die alte
+        ersetzt. IDs, Embeddings, Metadaten und ChunkStore bleiben gleich;
+        die HNSW-Parameter kommen aus der aktuellen config.
+        """
+        old = self.shards[shard]
+        name = old.collection_name
+        tmp_name = f"{name}-reindex"
+        if tmp_name in _collection_names(self.client):
+            self.client.delete_collection(tmp_name)
+        new = self.client.create_collection(tmp_name, metadata=hnsw_metadata())
+
+        n = old.count()
+        add_batch = max_batch_size(self.client)
+        for offset in range(0, n, batch_size):
+            page = old.col.get(
+                limit=batch_size, offset=offset,
+                include=["embeddings", "metadatas", "documents"],
+            )
+            docs = page.get("documents")
+            if docs is not None and any(d is None for d in docs):
+                docs = None
+            bulk_add(new, add_batch, page["ids"], page["embeddings"], page.get("metadatas"), docs)
+
+        self.client.delete_collection(name)
+        new.modify(name=name)
+        old.col = self.client.get_collection(name)
+        old.space = (old.col.metadata or {}).get("hnsw:space", "l2")
+        bump_ingest_version(self.path)
+        log_line(f"[VDB_SHARDS] reindex shard={shard} count={n}")
+
+    def reload(self):
+        """
+        Gleicht die Shards mit den Collections der Datenbank ab (neue
+        öffnen, gelöschte vergessen) und liest die ChunkStores neu.
+        """
+        names = {
+            name[len(self.prefix) + 1:] for name in _collection_names(self.client)
+            if name.startswith(f"{self.prefix}-") and not name.endswith("-reindex")
+        }
+        for shard in list(self.shards):
+            if shard not in names:
+                self.shards.pop(shard)
+                self._empty.discard(shard)
+        for shard in sorted(names):
+            if shard in self.shards:
+                self.shards[shard].reload()
+                if self.shards[shard].count() == 0:
+                    self._empty.add(shard)
+                else:
+                    self._empty.discard(shard)
+            else:
+                self._open(shard)
+        log_line(f"[VDB_SHARDS] reload prefix={self.prefix} shards={sorted(self.shards)}")
+
+    def shard_stats(self) -> dict[str, int]:
+        """Anzahl Einträge pro Shard."""
+        return {shard: r.count() for shard, r in sorted(self.shards.items())}
+
+    # ----- Schreiben -----
+
+    def add(self, ids, docs, embs, metadatas=None, shard: str = SHARD_DEFAULT):
+        self.add_shard(shard).add(ids, docs, embs, metadatas)
+        if len(ids):
+            self._empty.discard(shard)
+
+    def add_chunks(self, ids, chunks, embs, metadatas=None, page_texts=None, shard: str | None = None):
+        """
+        Wie Retriever.add_chunks, verteilt die Chunks aber auf Shards:
+        alle nach `shard`, falls angegeben, sonst je Datei über shard_for().
+        """
+        groups: dict[str, list[int]] = {}
+        for i, (file, _, _) in enumerate(chunks):
+            groups.setdefault(shard or shard_for(file), []).append(i)
+
+        embs = np.asarray(embs)
+        for name, idx in sorted(groups.items()):
+            log_line(f"[VDB_SHARDS] add shard={name} count={len(idx)}")
+            self.add_shard(name).add_chunks(
+                [ids[i] for i in idx],
+                [chunks[i] for i in idx],
+                embs[idx],
+                [metadatas[i] for i in idx] if metadatas is not None else None,
+                page_texts=page_texts,
+            )
+            self._empty.discard(name)
+
+    # ----- Lesen -----
+
+    def count(self) -> int:
+        return sum(self.shard_stats().values())
+
+    def all_ids(self) -> list[str]:
+        return [cid for r in self.shards.values() for cid in r.all_ids()]
+
+    def texts(self, ids: list[str]) -> list[str | None]:
+        """
+        Erst alle ChunkStores (ohne Chroma-Aufruf); nur für dann noch
+        fehlende IDs ein col.get je Shard, der seine Texte in Chroma hält
+        (ältere Shards ohne Store).
+        """
+        out: list[str | None] = [None] * len(ids)
+        for r in self.shards.values():
+            missing = [i for i, t in enumerate(out) if t is None]
+            if not missing:
+                return out
+            for i, t in zip(missing, r.store_texts([ids[i] for i in missing])):
+                out[i] = t
+        for r in self.shards.values():
+            missing = [i for i, t in enumerate(out) if t is None]
+            if not missing:
+                break
+            if not r.has_chroma_documents():
+                continue
+            found = r.chroma_texts([ids[i] for i in missing])
+            for i in missing:
+                out[i] = found.get(ids[i])
+        return out
+
+    def get_embeddings(self, ids: list[str]) -> tuple[list[str], np.ndarray]:
+        found: list[str] = []
+        parts: list[np.ndarray] = []
+        missing = list(ids)
+        for r in self.shards.values():
+            if not missing:
+                break
+            f, e = r.get_embeddings(missing)
+            if f:
+                found.extend(f)
+                parts.append(e)
+                hit = set(f)
+                missing = [cid for cid in missing if cid not in hit]
+        if not parts:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return found, np.vstack(parts)
+
+    def query_ids(self, embs, k: int) -> tuple[list[list[str]], list[list[float]]]:
+        """
+        Fan-out über alle Shards im Thread-Pool; pro Query werden die
+        Top-k aller Shards nach Distanz zusammengeführt.
+        """
+        n = len(embs)
+
+        def one(item: tuple[str, Retriever]):
+            shard, r = item
+            if shard in self._empty:
+                return [[] for _ in range(n)], [[] for _ in range(n)]
+            ids, dists = r.query_ids(embs, k)
+            # Alle Shards im gemeinsamen Space vergleichen
+            return ids, [convert_distances(d, r.space, self.space) for d in dists]
+
+        per_shard = list(self._pool.map(one, list(self.shards.items())))
+
+        all_ids: list[list[str]] = []
+        all_dists: list[list[float]] = []
+        for q in range(n):
+            merged = heapq.nsmallest(
+                k,
+                ((d, cid) for ids, dists in per_shard for cid, d in zip(ids[q], dists[q])),
+            )
+            all_ids.append([cid for _, cid in merged])
+            all_dists.append([d for d, _ in merged])
+        return all_ids, all_dists
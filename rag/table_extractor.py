@@ -1,18 +1,85 @@
 # rag/table_extractor.py
+import re
+
 import fitz
 from config import log_line
 
-def extract_tables(pdf_path: str):
+# Mindestanzahl Linien/Rechtecke, ab der eine Seite als Tabellen-Kandidat gilt
+MIN_TABLE_DRAWINGS = 4
+
+
+def _clean_cell(cell) -> str:
+    if cell is None:
+        return ""
+    return re.sub(r"\s+", " ", str(cell)).strip()
+
+
+def _page_may_have_table(page) -> bool:
+    """
+    Günstiger Vorfilter, bevor der (teure) Table-Finder läuft.
+
+    Eine Seite ist Kandidat, wenn
+    - ein Textblock nach Spalten aussieht (alte Heuristik: viele doppelte
+      Leerzeichen oder "|"), oder
+    - genügend Linien/Rechtecke gezeichnet sind (Tabellengitter).
+    """
+    for b in page.get_text("blocks"):
+        text = b[4]
+        if text.count("  ") > 3 or "|" in text:
+            return True
+
+    n_lines = 0
+    for d in page.get_drawings():
+        for item in d.get("items", []):
+            if item[0] in ("l", "re"):
+                n_lines += 1
+                if n_lines >= MIN_TABLE_DRAWINGS:
+                    return True
+    return False
+
+
+def extract_tables(pdf_path: str) -> list[dict]:
+    """
+    Erkennt Tabellen mit dem Table-Finder von PyMuPDF (page.find_tables)
+    und liefert sie strukturiert.
+
+    Der Table-Finder läuft nur auf Seiten, die der Vorfilter
+    _page_may_have_table markiert.
+
+    Rückgabe
+    --------
+    list[dict]
+        Pro Tabelle: {"page": int, "header": list[str], "rows": list[list[str]]}.
+        Leere Zeilen werden verworfen.
+    """
     doc = fitz.open(pdf_path)
     tables = []
 
     for page_no, page in enumerate(doc, start=1):
-        blocks = page.get_text("blocks")
-        for b in blocks:
-            text = b[4].strip()
-            # primitive Heuristik: viele Spalten → vermutlich Tabelle
-            if text.count("  ") > 3 or "|" in text:
-                tables.append(f"[table p{page_no}]\n{text}")
-                log_line(f"[TABLE] {pdf_path} page={page_no}")
+        if not _page_may_have_table(page):
+            continue
+
+        found = page.find_tables()
+        for tab in found.tables:
+            raw_rows = tab.extract()
+            header = [_clean_cell(c) for c in tab.header.names]
+            # Interner Header steht zusätzlich als erste Zeile in extract()
+            if not tab.header.external and raw_rows:
+                raw_rows = raw_rows[1:]
+
+            rows = []
+            for r in raw_rows:
+                cells = [_clean_cell(c) for c in r]
+                if any(cells):
+                    rows.append(cells)
+
+            if not rows:
+                continue
+
+            tables.append({"page": page_no, "header": header, "rows": rows})
+            log_line(
+                f"[TABLE] {pdf_path} page={page_no} cols={len(header)} rows={len(rows)} "
+                f"header={' | '.join(header)}"
+            )
 
     return tables
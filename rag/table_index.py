@@ -0,0 +1,179 @@
+# rag/table_index.py
+
+import gzip
+import json
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+
+from config import log_line
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Mindestlänge für Präfix-Treffer (Komposita) in der Zeilensuche
+MIN_PREFIX_LEN = 5
+
+# Füllwörter, die bei der Zeilensuche nicht gewertet werden
+_STOPWORDS = {
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "und",
+    "oder", "zu", "zum", "zur", "von", "vom", "im", "in", "ist", "was", "wie",
+    "welche", "welcher", "welches", "gib", "mir", "aus", "für", "mit", "an",
+    "auf", "hat", "wird", "werden",
+}
+
+
+def _tokens(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class TableRowIndex:
+    def __init__(self, path: str):
+        """
+        Kompakter Index über Tabellenzeilen, getrennt von den Text-Chunks.
+
+        Gespeichert wird pro (Datei, Seite, Spaltenköpfe) eine Tabelle mit
+        ihren Zeilen (gzip-komprimiertes JSONL, Spaltenköpfe nur einmal pro
+        Tabelle). Im Speicher liegt zusätzlich ein invertierter Index
+        Token -> Zeilen für die Suche.
+
+        Parameter
+        ---------
+        path : str
+            Datei des Index (z.B. <DB_PATH>/indexes/pdf/table_rows.jsonl.gz).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # file -> list[{"page", "header", "rows"}]
+        self._tables: dict[str, list[dict]] = {}
+        self._postings: dict[str, list[tuple[str, int, int]]] = {}
+        self._n_rows = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                self._tables.setdefault(rec["file"], []).append(
+                    {"page": rec["page"], "header": rec["header"], "rows": rec["rows"]}
+                )
+        self._rebuild_postings()
+        log_line(f"[TABLE_INDEX] geladen path={self.path} rows={self._n_rows}")
+
+    def _rebuild_postings(self):
+        postings: dict[str, list[tuple[str, int, int]]] = defaultdict(list)
+        n_rows = 0
+        for file, tables in self._tables.items():
+            for ti, tab in enumerate(tables):
+                header_text = " ".join(tab["header"])
+                for ri, row in enumerate(tab["rows"]):
+                    n_rows += 1
+                    # Spaltenköpfe zählen für jede Zeile der Tabelle mit
+                    for tok in set(_tokens(header_text + " " + " ".join(row))):
+                        postings[tok].append((file, ti, ri))
+        self._postings = dict(postings)
+        self._n_rows = n_rows
+
+    def reload(self):
+        """Verwirft den Stand im Speicher und liest die Datei neu."""
+        with self._lock:
+            self._tables = {}
+            self._postings = {}
+            self._n_rows = 0
+            self._load()
+
+    def set_tables(self, file: str, tables: list[dict]):
+        """Ersetzt alle Tabellen einer Datei (z.B. bei erneuter Ingestion)."""
+        with self._lock:
+            if tables:
+                self._tables[file] = [
+                    {"page": t["page"], "header": t["header"], "rows": t["rows"]} for t in tables
+                ]
+            else:
+                self._tables.pop(file, None)
+
+    def save(self):
+        """Schreibt den Index atomar auf die Platte und baut die Suchstruktur neu auf."""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = f"{self.path}.tmp{os.getpid()}"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                for file, tables in self._tables.items():
+                    for t in tables:
+                        f.write(json.dumps({"file": file, **t}, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
+            self._rebuild_postings()
+        log_line(f"[TABLE_INDEX] gespeichert path={self.path} rows={self._n_rows}")
+
+    def _matching_rows(self, token: str) -> set[tuple[str, int, int]]:
+        """
+        Zeilen, die `token` enthalten. Für längere Tokens ohne exakten
+        Treffer zählen auch Präfix-Beziehungen, damit deutsche Komposita
+        passen ("abstimmungsergebnis" <-> "abstimmung").
+        """
+        refs = self._postings.get(token)
+        if refs is not None:
+            return set(refs)
+        if len(token) < MIN_PREFIX_LEN:
+            return set()
+        out: set[tuple[str, int, int]] = set()
+        for vocab, vrefs in self._postings.items():
+            if len(vocab) >= MIN_PREFIX_LEN and (token.startswith(vocab) or vocab.startswith(token)):
+                out.update(vrefs)
+        return out
+
+    @staticmethod
+    def format_row(file: str, page: int, header: list[str], row: list[str]) -> str:
+        """Zeile als Kontext-String: "Spalte: Wert | Spalte: Wert"."""
+        cells = []
+        for i, value in enumerate(row):
+            name = header[i] if i < len(header) and header[i] else f"Spalte {i + 1}"
+            if value:
+                cells.append(f"{name}: {value}")
+        return f"[file {file}] [page {page}] [table row] " + " | ".join(cells)
+
+    def lookup(self, query: str, top_n: int, min_score: float) -> list[str]:
+        """
+        Sucht die Tabellenzeilen, die am besten zur Anfrage passen.
+
+        Bewertung: Anteil der IDF-gewichteten Query-Tokens, die in der Zeile
+        vorkommen (0..1). Zeilen unter `min_score` werden verworfen.
+
+        Rückgabe
+        --------
+        list[str]
+            Bis zu `top_n` formatierte Zeilen, beste zuerst.
+        """
+        q_tokens = set(_tokens(query))
+        if not q_tokens or not self._n_rows:
+            return []
+
+        # Pro Query-Token die Menge der passenden Zeilen (inkl. Komposita)
+        matches = {t: self._matching_rows(t) for t in q_tokens}
+        idf = {
+            t: math.log(1.0 + self._n_rows / (1 + len(refs)))
+            for t, refs in matches.items()
+        }
+        total = sum(idf.values())
+
+        scores: dict[tuple[str, int, int], float] = defaultdict(float)
+        for t, refs in matches.items():
+            for ref in refs:
+                scores[ref] += idf[t]
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        out = []
+        for (file, ti, ri), s in ranked[:top_n]:
+            score = s / total
+            if score < min_score:
+                break
+            tab = self._tables[file][ti]
+            out.append(self.format_row(file, tab["page"], tab["header"], tab["rows"][ri]))
+
+        log_line(f"[TABLE_INDEX] lookup query={query} hits={len(out)}")
+        return out
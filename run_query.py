@@ -1,5 +1,145 @@
-from config import set_global_seed
+# run_query.py
+#
+# Interaktiv (eine Frage):
+#   python run_query.py
+#
+# Batch (Fragen aus JSONL, eine warme PDFRAG-Instanz, parallele Worker):
+#   python run_query.py --batch fragen.jsonl --out antworten.jsonl --workers 4
+#
+# Eingabe: je Zeile {"id": ..., "question": "..."} (ohne "id" gilt die
+# Zeilennummer). Jede Antwort wird sofort als Zeile an --out angehängt
+# (Antwort, Quellen, Latenz, Stufen-Profil); IDs, die dort bereits ohne
+# Fehler stehen, werden beim erneuten Lauf übersprungen. Am Ende folgt eine
+# Durchsatz-Zusammenfassung.
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import set_global_seed, log_line
+from rag.llm_metrics import get_metrics
 from rag.pipeline import PDFRAG
+from rag.profiling import Profile
+from rag.rag_config import RAGConfig
+
+
+def load_questions(path: str) -> list[dict]:
+    """Fragen aus JSONL; leere Zeilen werden ignoriert, IDs als str."""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            questions.append({"id": str(item.get("id", lineno)), "question": item["question"]})
+    return questions
+
+
+def completed_ids(path: str) -> set[str]:
+    """IDs, die in einer früheren Ausgabe bereits ohne Fehler beantwortet wurden."""
+    done: set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # abgebrochene letzte Zeile eines früheren Laufs
+            if row.get("error") is None and "id" in row:
+                done.add(str(row["id"]))
+    return done
+
+
+def run_batch(args):
+    questions = load_questions(args.batch)
+    done = completed_ids(args.out)
+    todo = [q for q in questions if q["id"] not in done]
+    print(f"{len(questions)} Fragen, {len(questions) - len(todo)} bereits beantwortet, {len(todo)} offen")
+    if not todo:
+        return
+
+    cfg = RAGConfig()
+    if args.mode:
+        cfg = cfg.replace(mode=args.mode, enable_gap=args.mode == "enhanced")
+    # Bei mehreren Workern werden die Reranking-Paare paralleler Fragen
+    # gemeinsam gebatcht (wie in tests/run_eval.py).
+    rag = PDFRAG(cfg, micro_batching=args.workers > 1)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    lock = threading.Lock()
+    latencies: list[float] = []
+    errors = 0
+
+    def one(item: dict, out):
+        nonlocal errors
+        profile = Profile()
+        t0 = time.perf_counter()
+        row = {"id": item["id"], "question": item["question"]}
+        try:
+            res = rag.query_with_sources(item["question"], profile=profile, budget_s=args.budget_s)
+            row.update(res)
+            row["error"] = None
+        except Exception as e:
+            row["error"] = repr(e)
+            log_line(f"[BATCH] FEHLER id={item['id']} error={e!r}")
+        row["latency_s"] = time.perf_counter() - t0
+        row["profile"] = profile.as_dict()
+        with lock:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            if row["error"] is None:
+                latencies.append(row["latency_s"])
+            else:
+                errors += 1
+            n = len(latencies) + errors
+        print(f"[{n}/{len(todo)}] id={item['id']} {row['latency_s']:.2f}s{' FEHLER' if row['error'] else ''}")
+
+    get_metrics().reset()
+    log_line(f"[BATCH] START file={args.batch} open={len(todo)} workers={args.workers}")
+    t_start = time.perf_counter()
+    with open(args.out, "a", encoding="utf-8") as out:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+            list(ex.map(lambda item: one(item, out), todo))
+    wall_s = time.perf_counter() - t_start
+
+    rate = len(latencies) / wall_s if wall_s > 0 else 0.0
+    summary = f"{len(latencies)} beantwortet, {errors} Fehler in {wall_s:.1f}s ({rate:.2f} Fragen/s)"
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95])
+        summary += f", Latenz p50={p50:.2f}s p95={p95:.2f}s"
+    total = get_metrics().snapshot().get("_total")
+    if total:
+        tok_s = total["eval_tokens"] / wall_s if wall_s > 0 else 0.0
+        summary += (
+            f", LLM calls={total['calls']} tokens in={total['prompt_tokens']} out={total['eval_tokens']} "
+            f"({tok_s:.1f} tok/s)"
+        )
+    print(summary)
+    log_line(f"[BATCH] ENDE {summary}")
+    get_metrics().log_summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fragen an die indizierten PDFs stellen")
+    parser.add_argument("--batch", help="JSONL-Datei mit Fragen (ohne Angabe: interaktiv)")
+    parser.add_argument("--out", default="answers.jsonl", help="JSONL-Ausgabe im Batch-Modus")
+    parser.add_argument("--workers", type=int, default=4, help="parallele Anfragen im Batch-Modus")
+    parser.add_argument("--mode", choices=["simple", "enhanced", "expand"], help="Default: RAG_MODE aus config")
+    parser.add_argument("--budget-s", type=float, default=None, help="Zeitbudget je Frage")
+    args = parser.parse_args()
+
+    set_global_seed()    # Seed für maximal reproduzierbare Antworten
+    if args.batch:
+        run_batch(args)
+        return
+    print(PDFRAG().query(input('Q: ')))
+
 
-set_global_seed()    # Seed für maximal reproduzierbare Antworten
-print(PDFRAG().query(input('Q: ')))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# tests/bench_common.py
+#
+# Gemeinsame Hilfsfunktionen für die Benchmarks in tests/.
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Perzentil mit linearer Interpolation (p in [0, 100]).
+    Gibt 0.0 für leere Listen zurück.
+    """
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    if len(xs) == 1:
+        return xs[0]
+    pos = (len(xs) - 1) * (p / 100.0)
+    lo = int(pos)
+    hi = min(lo + 1, len(xs) - 1)
+    frac = pos - lo
+    return xs[lo] + (xs[hi] - xs[lo]) * frac
+
+
+def latency_summary(values: list[float]) -> dict:
+    """p50/p95/p99/Mittelwert/Max einer Liste von Latenzen (gleiche Einheit wie Eingabe)."""
+    return {
+        "n": len(values),
+        "mean": (sum(values) / len(values)) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def git_revision() -> dict:
+    """
+    Liefert Commit-Hash und Dirty-Flag des Arbeitsverzeichnisses,
+    damit Benchmark-Ergebnisse einer Revision zugeordnet werden können.
+    """
+    def _git(*args: str) -> str:
+        try:
+            return subprocess.check_output(
+                ["git", *args], stderr=subprocess.DEVNULL, text=True
+            ).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {
+        "commit": _git("rev-parse", "HEAD") or "unknown",
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def run_metadata() -> dict:
+    """Metadaten eines Benchmark-Laufs (Revision, Zeitpunkt, Plattform)."""
+    return {
+        "git": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_json(path: str, payload: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_json(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,183 @@
+# tests/bench_ingest.py
+#
+# Skalierungs-Benchmark für PDFRAG.ingest auf synthetischen Korpora.
+#
+# Für jede Korpusgröße (Default 10, 100, 1000, 10000 Dokumente) wird in einem
+# eigenen Prozess (damit die Peak-RSS-Messung pro Größe sauber ist) ein frischer
+# Index gebaut und gemessen: Seiten/s, Chunks/s, Embeddings/s, Peak-RSS und
+# Größe des Index auf der Platte.
+#
+#   python -m tests.bench_ingest --stub --sizes 10,100,1000
+#
+# Die Korpora werden mit tests/generate_synthetic_pdfs.py einmalig erzeugt und
+# per Symlink auf die einzelnen Größen verteilt.
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tests.bench_common import run_metadata, write_json
+from tests.generate_synthetic_pdfs import generate_corpus
+
+DEFAULT_SIZES = "10,100,1000,10000"
+WORK_DIR = "bench/ingest"
+DEFAULT_OUT = "bench/ingest_scaling.json"
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def dir_size_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def peak_rss_mb() -> float:
+    """Peak-RSS des aktuellen Prozesses in MB (ru_maxrss: KB unter Linux, Bytes unter macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / (1024 * 1024)
+    return rss / 1024
+
+
+def prepare_corpus(all_dir: Path, size_dir: Path, size: int):
+    """Legt `size_dir` mit Symlinks auf die ersten `size` PDFs aus `all_dir` an."""
+    if size_dir.exists():
+        shutil.rmtree(size_dir)
+    size_dir.mkdir(parents=True)
+    for pdf in sorted(all_dir.glob("*.pdf"))[:size]:
+        (size_dir / pdf.name).symlink_to(pdf.resolve())
+
+
+def run_worker(args):
+    """Führt EINE Ingestion aus und gibt das Ergebnis als JSON-Zeile aus."""
+    if args.stub:
+        from tests.ollama_stub import start_stub
+        _, url = start_stub(embed_latency_ms=args.stub_embed_latency_ms)
+        os.environ["RAG_OLLAMA_HOST"] = url
+
+    import config
+    if not args.extract_cache:
+        # Vor dem Import von rag.* setzen, da die Defaults beim Import gebunden werden
+        config.EXTRACT_CACHE_ENABLED = False
+
+    from config import set_global_seed
+    from rag.pipeline import PDFRAG
+    from rag.profiling import Profile
+
+    set_global_seed()
+    if os.path.exists(args.db_path):
+        shutil.rmtree(args.db_path)
+
+    rag = PDFRAG(db_path=args.db_path)
+    profile = Profile()
+    t0 = time.perf_counter()
+    rag.ingest(pdf_dir=args.pdf_dir, profile=profile)
+    wall = time.perf_counter() - t0
+
+    c = profile.counters
+    st = profile.stages
+    result = {
+        "wall_s": wall,
+        "pdfs": c.get("pdfs", 0),
+        "pages": c.get("pages", 0),
+        "chunks": c.get("chunks", 0),
+        "embeddings": c.get("embeddings", 0),
+        "extract_cache_hits": c.get("extract_cache_hits", 0),
+        "pages_per_s": c.get("pages", 0) / wall if wall > 0 else 0.0,
+        "chunks_per_s": c.get("chunks", 0) / wall if wall > 0 else 0.0,
+        "embeddings_per_s": (
+            c.get("embeddings", 0) / st["embed"] if st.get("embed") else 0.0
+        ),
+        "stages_s": dict(st),
+        "peak_rss_mb": peak_rss_mb(),
+        "index_bytes": dir_size_bytes(args.db_path),
+    }
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion-Skalierungs-Benchmark")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--stub", action="store_true",
+                        help="lokalen Ollama-Stand-in für Embeddings verwenden")
+    parser.add_argument("--stub-embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--extract-cache", action="store_true",
+                        help="Extraktions-Cache nutzen (Default: kalte PDF-Extraktion messen)")
+    parser.add_argument("--keep-index", action="store_true",
+                        help="Index-Verzeichnisse nach dem Lauf nicht löschen")
+    # interne Optionen für den Worker-Prozess
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--pdf-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--db-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    work = Path(args.work_dir)
+    all_dir = work / "corpus" / "all"
+
+    print(f"Erzeuge synthetischen Korpus ({max(sizes)} PDFs) in {all_dir} ...")
+    t0 = time.perf_counter()
+    generate_corpus(str(all_dir), max(sizes), seed=args.seed)
+    print(f"  fertig in {time.perf_counter() - t0:.1f}s")
+
+    results = {"meta": run_metadata(), "stub": args.stub, "sizes": {}}
+
+    for size in sizes:
+        size_dir = work / "corpus" / f"n{size}"
+        db_dir = work / "db" / f"n{size}"
+        prepare_corpus(all_dir, size_dir, size)
+
+        cmd = [
+            sys.executable, "-m", "tests.bench_ingest", "--worker",
+            "--pdf-dir", str(size_dir), "--db-path", str(db_dir),
+            "--stub-embed-latency-ms", str(args.stub_embed_latency_ms),
+        ]
+        if args.stub:
+            cmd.append("--stub")
+        if args.extract_cache:
+            cmd.append("--extract-cache")
+
+        print(f"[n={size}] Ingestion läuft ...")
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [ln for ln in proc.stdout.splitlines() if ln.startswith(RESULT_PREFIX)]
+        if proc.returncode != 0 or not lines:
+            print(f"[n={size}] FEHLER (exit={proc.returncode})\n{proc.stderr[-2000:]}")
+            results["sizes"][str(size)] = {"error": proc.stderr[-2000:]}
+            continue
+
+        res = json.loads(lines[-1][len(RESULT_PREFIX):])
+        results["sizes"][str(size)] = res
+        print(
+            f"[n={size}] pages={res['pages']} chunks={res['chunks']} "
+            f"wall={res['wall_s']:.1f}s pages/s={res['pages_per_s']:.1f} "
+            f"chunks/s={res['chunks_per_s']:.1f} emb/s={res['embeddings_per_s']:.1f} "
+            f"peak_rss={res['peak_rss_mb']:.0f}MB index={res['index_bytes'] / 1e6:.1f}MB"
+        )
+
+        if not args.keep_index:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+    write_json(args.out, results)
+    print(f"Ergebnisse in: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# tests/bench_ollama_pool.py
+#
+# Lastverteilung des Ollama-Endpoint-Pools gegen mehrere lokale Stand-ins.
+#
+# Startet --hosts Stub-Server (tests/ollama_stub.py) mit unterschiedlicher
+# Latenz (Host i: --latency-ms * (1 + i * --skew)), schickt parallel
+# Chat-Anfragen und Embedding-Batches durch rag.ollama_pool.OllamaPool und
+# gibt Verteilung, Fehler und Durchsatz je Host aus. Mit --fail-rate
+# scheitern Anfragen zufällig (503), mit --kill-after wird Host 0 nach so
+# vielen Anfragen beendet – beides muss der Pool über andere Hosts abfangen.
+#
+#   python -m tests.bench_ollama_pool --hosts 3 --requests 200 --fail-rate 0.05 --kill-after 50
+#
+# Ergebnis: bench/ollama_pool.json
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.bench_common import latency_summary, run_metadata, write_json
+from tests.ollama_stub import start_stub
+
+OUT_PATH = "bench/ollama_pool.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama-Endpoint-Pool gegen mehrere Stubs")
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=200, help="Anfragen insgesamt")
+    parser.add_argument("--embed-share", type=float, default=0.5, help="Anteil Embedding-Batches")
+    parser.add_argument("--batch-size", type=int, default=16, help="Texte pro Embedding-Batch")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--skew", type=float, default=1.0, help="relative Zusatzlatenz je Host-Index")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--kill-after", type=int, default=0, help="Host 0 nach n Anfragen beenden (0 = nie)")
+    parser.add_argument("--health-interval-s", type=float, default=1.0)
+    parser.add_argument("--out", default=OUT_PATH)
+    args = parser.parse_args()
+
+    servers, urls = [], []
+    for i in range(args.hosts):
+        latency = args.latency_ms * (1.0 + i * args.skew)
+        server, url = start_stub(
+            chat_latency_ms=latency, embed_latency_ms=latency, seed=42 + i, fail_rate=args.fail_rate,
+        )
+        servers.append(server)
+        urls.append(url)
+        print(f"Stub {i}: {url} latency={latency:.0f}ms")
+
+    from rag.ollama_pool import OllamaPool
+
+    pool = OllamaPool(urls, health_interval_s=args.health_interval_s)
+    texts = [f"Beschlussempfehlung TOP {i} Senat DHBW Sitzung" for i in range(args.batch_size)]
+    latencies: list[float] = []
+    errors = 0
+    done = 0
+    lock = threading.Lock()
+
+    def one(i: int):
+        nonlocal errors, done
+        t0 = time.perf_counter()
+        try:
+            if i < args.requests * args.embed_share:
+                pool.embed("qwen3-embedding:0.6b", texts)
+            else:
+                pool.chat(model="llama3.2", messages=[{"role": "user", "content": f"Frage {i}"}])
+        except Exception as e:
+            with lock:
+                errors += 1
+            print(f"Anfrage {i} endgültig fehlgeschlagen: {e!r}")
+            return
+        with lock:
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            done += 1
+            if args.kill_after and done == args.kill_after:
+                print(f"Beende Host 0 nach {done} Anfragen")
+                servers[0].shutdown()
+                servers[0].server_close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        list(ex.map(one, range(args.requests)))
+    wall_s = time.perf_counter() - t0
+
+    stats = pool.stats()
+    pool.log_stats()
+    pool.close()
+    for server in servers[1 if args.kill_after else 0:]:
+        server.shutdown()
+
+    print(f"\n{done}/{args.requests} erfolgreich, {errors} Fehler, {wall_s:.2f}s, {done / wall_s:.1f} Anfragen/s")
+    print(f"{'Host':<28} {'gesund':>6} {'Anfr.':>6} {'Fehler':>6} {'Items':>7} {'Items/s':>8} {'ms/Anfr.':>8}")
+    for host, s in stats.items():
+        print(
+            f"{host:<28} {str(s['healthy']):>6} {s['requests']:>6} {s['failures']:>6} "
+            f"{s['items']:>7} {s['items_per_s']:>8.1f} {s['avg_latency_ms']:>8.1f}"
+        )
+
+    write_json(args.out, {
+        "meta": run_metadata(),
+        "config": vars(args),
+        "wall_s": wall_s,
+        "succeeded": done,
+        "errors": errors,
+        "latency_ms": latency_summary(latencies),
+        "endpoints": stats,
+    })
+    print(f"Ergebnis: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# tests/bench_query.py
+#
+# Latenz-Benchmark für PDFRAG.query.
+#
+# Führt alle Fragen aus tests/eval_data.json im simple- und enhanced-Modus aus
+# und misst pro Anfrage die End-to-End-Latenz, die Laufzeit jeder
+# Pipeline-Stufe sowie die Anzahl der LLM- und Embedding-Aufrufe.
+# Ergebnisse landen als JSON (inkl. Git-Revision) in einer Datei und können
+# gegen eine Baseline verglichen werden:
+#
+#   python -m tests.bench_query --stub --out bench/query_new.json \
+#       --baseline bench/query_main.json --threshold 0.10
+#
+# Mit --stub läuft der Benchmark gegen den lokalen Ollama-Stand-in
+# (tests/ollama_stub.py) und ist damit reproduzierbar. Exit-Code 1, wenn die
+# p50- oder p95-Latenz eines Modus um mehr als --threshold schlechter ist.
+# Token-Zähler der LLM-Aufrufe je Tag stehen pro Modus unter "llm"; mit
+# --prom-out bench/llm.prom zusätzlich als bench/llm.<modus>.prom.
+
+import argparse
+import json
+import os
+import sys
+
+from tests.bench_common import latency_summary, load_json, run_metadata, write_json
+
+EVAL_DATA_PATH = "tests/eval_data.json"
+DEFAULT_OUT = "bench/query_latency.json"
+
+MODES = {
+    "simple": ("simple", False),
+    "enhanced": ("enhanced", True),
+    "expand": ("expand", False),
+}
+
+
+def summarize(samples: list[dict]) -> dict:
+    """
+    Verdichtet die Einzelmessungen eines Modus zu Perzentilen
+    (Latenzen in Millisekunden) und mittleren Aufrufzahlen.
+    """
+    totals = [s["total_s"] * 1000.0 for s in samples]
+
+    stage_names: list[str] = []
+    for s in samples:
+        for name in s["stages_s"]:
+            if name not in stage_names:
+                stage_names.append(name)
+
+    stages = {}
+    for name in stage_names:
+        # Stufen, die bei einer Anfrage nicht liefen, zählen als 0 ms
+        values = [s["stages_s"].get(name, 0.0) * 1000.0 for s in samples]
+        stages[name] = latency_summary(values)
+
+    counter_names = sorted({k for s in samples for k in s["counters"]})
+    counters = {
+        name: sum(s["counters"].get(name, 0) for s in samples) / len(samples)
+        for name in counter_names
+    } if samples else {}
+
+    return {
+        "latency_ms": latency_summary(totals),
+        "stages_ms": stages,
+        "mean_counters_per_query": counters,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Vergleicht p50/p95 pro Modus mit einer Baseline.
+    Gibt eine Liste von Regressionsmeldungen zurück (leer = ok).
+    """
+    regressions = []
+    for mode, cur in current["modes"].items():
+        base = baseline.get("modes", {}).get(mode)
+        if not base:
+            continue
+        for key in ("p50", "p95"):
+            b = base["latency_ms"][key]
+            c = cur["latency_ms"][key]
+            change = (c - b) / b if b > 0 else 0.0
+            flag = "REGRESSION" if change > threshold else "ok"
+            print(f"  {mode:9s} {key}: {b:9.1f} ms -> {c:9.1f} ms ({change:+.1%}) {flag}")
+            if change > threshold:
+                regressions.append(f"{mode} {key} {change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latenz-Benchmark für PDFRAG.query")
+    parser.add_argument("--data", default=EVAL_DATA_PATH)
+    parser.add_argument("--modes", default="simple,enhanced")
+    parser.add_argument("--repeat", type=int, default=1, help="Durchläufe pro Frage")
+    parser.add_argument("--warmup", type=int, default=1, help="ungemessene Anfragen vorab")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--baseline", help="frühere Ergebnisdatei zum Vergleich")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="erlaubte relative Verschlechterung (0.10 = 10%%)")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Zeitbudget pro Anfrage (optionale Stufen entfallen bei Bedarf)")
+    parser.add_argument("--agenda-fast-path", action="store_true",
+                        help="Direktantworten aus dem AgendaIndex mitmessen (Default: aus)")
+    parser.add_argument("--stub", action="store_true",
+                        help="lokalen Ollama-Stand-in statt echtem Ollama verwenden")
+    parser.add_argument("--stub-latency-ms", type=float, default=200.0)
+    parser.add_argument("--stub-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--stub-gap-mode", choices=["none", "queries"], default="queries")
+    parser.add_argument("--prom-out", help="LLM-Token-Zähler zusätzlich im Prometheus-Textformat schreiben")
+    args = parser.parse_args()
+
+    stub_server = None
+    if args.stub:
+        # Muss vor dem Import von config/rag passieren, da der ollama-Client
+        # OLLAMA_HOST beim Import liest.
+        from tests.ollama_stub import start_stub
+        stub_server, url = start_stub(
+            chat_latency_ms=args.stub_latency_ms,
+            chat_jitter_ms=args.stub_jitter_ms,
+            gap_mode=args.stub_gap_mode,
+        )
+        os.environ["RAG_OLLAMA_HOST"] = url
+
+    import config
+    from config import set_global_seed, set_rag_mode, log_line
+    from rag.pipeline import PDFRAG
+    from rag.rag_config import RAGConfig
+    from rag.profiling import Profile
+    from rag.llm_metrics import get_metrics
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    set_global_seed()
+    # Ohne Antwort-Cache, sonst wären Wiederholungen reine Cache-Treffer;
+    # der AgendaIndex würde die Pipeline für TOP-Fragen ganz umgehen
+    rag = PDFRAG(RAGConfig(answer_cache=False, agenda_fast_path=args.agenda_fast_path))
+
+    result = {
+        "meta": run_metadata(),
+        "config": {
+            "embed_model": config.EMBED_MODEL,
+            "ollama_model": config.OLLAMA_MODEL,
+            "top_k": config.TOP_K,
+            "rerank_top_n": config.RERANK_TOP_N,
+            "stub": args.stub,
+            "repeat": args.repeat,
+            "budget_ms": args.budget_ms,
+            "questions": len(data),
+        },
+        "modes": {},
+        "samples": {},
+    }
+
+    budget_s = args.budget_ms / 1000.0 if args.budget_ms is not None else None
+
+    for mode_name in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        mode, enable_gap = MODES[mode_name]
+        set_rag_mode(mode, enable_gap)
+        log_line(f"[BENCH] mode={mode_name} START")
+
+        for item in data[:args.warmup]:
+            rag.query(item["question"])
+        get_metrics().reset()
+
+        samples = []
+        for _ in range(args.repeat):
+            for item in data:
+                profile = Profile()
+                rag.query(item["question"], profile=profile, budget_s=budget_s)
+                sample = profile.as_dict()
+                sample["id"] = item["id"]
+                samples.append(sample)
+
+        result["modes"][mode_name] = summarize(samples)
+        result["samples"][mode_name] = samples
+        result["modes"][mode_name]["llm"] = get_metrics().snapshot()
+
+        lat = result["modes"][mode_name]["latency_ms"]
+        print(
+            f"[{mode_name}] n={lat['n']} p50={lat['p50']:.1f}ms "
+            f"p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms"
+        )
+        for stage, st in result["modes"][mode_name]["stages_ms"].items():
+            print(f"    {stage:18s} p50={st['p50']:8.1f}ms p95={st['p95']:8.1f}ms")
+        for name, v in result["modes"][mode_name]["mean_counters_per_query"].items():
+            print(f"    {name:18s} {v:.2f} / Anfrage")
+        for tag, s in result["modes"][mode_name]["llm"].items():
+            print(
+                f"    LLM {tag:14s} calls={s['calls']} in={s['prompt_tokens']} out={s['eval_tokens']} "
+                f"prefill={s['prefill_s']:.2f}s ({s['prefill_tok_s']:.0f} tok/s) "
+                f"decode={s['decode_s']:.2f}s ({s['decode_tok_s']:.0f} tok/s)"
+            )
+        if args.prom_out:
+            root, ext = os.path.splitext(args.prom_out)
+            prom_path = f"{root}.{mode_name}{ext or '.prom'}"
+            os.makedirs(os.path.dirname(prom_path) or ".", exist_ok=True)
+            with open(prom_path, "w", encoding="utf-8") as f:
+                f.write(get_metrics().prometheus_text())
+
+    write_json(args.out, result)
+    print(f"Ergebnisse in: {args.out}")
+
+    if stub_server is not None:
+        stub_server.shutdown()
+
+    if args.baseline:
+        print(f"Vergleich mit Baseline {args.baseline} (Schwelle {args.threshold:.0%}):")
+        regressions = compare(result, load_json(args.baseline), args.threshold)
+        if regressions:
+            print("Regressionen: " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# tests/generate_synthetic_pdfs.py
+#
+# Erzeugt synthetische deutschsprachige Senats-Dokumente (Tagesordnungen,
+# TOP-Vorlagen und Protokolle) als PDF mit PyMuPDF.
+#
+# Variiert werden Seitenzahl, Tabellendichte und Textlänge. Jedes Dokument
+# wird aus (seed, index) abgeleitet, d.h. die ersten n Dokumente eines
+# größeren Korpus sind identisch mit einem kleineren Korpus gleichen Seeds.
+#
+#   python -m tests.generate_synthetic_pdfs --out bench/corpus --count 1000
+
+import argparse
+import random
+import textwrap
+from pathlib import Path
+
+import fitz
+
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size("a4")
+MARGIN = 56
+FONT_SIZE = 10
+LINE_HEIGHT = 13
+WRAP_CHARS = 95
+
+GREMIEN = ["Senat", "Fachkommission Sozialwesen", "Fachkommission Technik",
+           "Fachkommission Wirtschaft", "Hochschulrat", "Studienkommission"]
+THEMEN = [
+    "Verabschiedung der Grundordnung", "Nachfolgeprojekt Go-N",
+    "Leitbild Lehren und Lernen", "Studien- und Prüfungsordnung IBMT",
+    "Portfolioentscheidung Bachelor Soziale Arbeit", "Ausschreibung Die Welt ist mein Campus",
+    "Einrichtung eines Studienschwerpunkts", "Änderung der Zulassungssatzung",
+    "Evaluationsordnung", "Bericht der Präsidentin", "Haushaltsplanung",
+    "Akkreditierung von Studiengängen", "Digitalisierungsstrategie",
+    "Gleichstellungsplan", "Forschungsförderung", "Qualitätsmanagement",
+]
+PERSONEN = ["Präsidentin Klärle", "Vizepräsident Schmidt", "Prorektorin Weber",
+            "Dekan Müller", "Kanzler Fischer", "Studiendekanin Wagner"]
+SATZ_BAUSTEINE = [
+    "Der {gremium} hat sich in seiner Sitzung mit dem Thema {thema} befasst.",
+    "Die Vorlage wurde durch {person} erläutert und ausführlich diskutiert.",
+    "Nach eingehender Beratung wird die Angelegenheit dem {gremium} zur Entscheidung vorgelegt.",
+    "Die Anlage enthält den Entwurf sowie eine Synopse der Änderungen.",
+    "Die Umsetzung soll zum kommenden Semester erfolgen.",
+    "Die finanziellen Auswirkungen sind im Haushalt bereits berücksichtigt.",
+    "Die Studierendenvertretung wurde frühzeitig in den Prozess eingebunden.",
+    "Es bestehen keine rechtlichen Bedenken gegen das Vorhaben.",
+    "Die Fachkommission hat dem Vorschlag mehrheitlich zugestimmt.",
+    "Im Rahmen der Anhörung gingen mehrere Stellungnahmen ein.",
+    "Die Geschäftsstelle wird beauftragt, die weiteren Schritte vorzubereiten.",
+    "Der Sachstand wurde im Vorfeld mit den Standorten abgestimmt.",
+]
+
+
+class _PageWriter:
+    """Schreibt Zeilen und Tabellen fortlaufend auf Seiten eines fitz-Dokuments."""
+
+    def __init__(self, doc: fitz.Document, header: str, footer: str):
+        self.doc = doc
+        self.header = header
+        self.footer = footer
+        self.page = None
+        self.y = 0.0
+        self.new_page()
+
+    def new_page(self):
+        self.page = self.doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        # Wiederkehrender Briefkopf / Fußzeile wie in echten Senatsunterlagen
+        self.page.insert_text((MARGIN, MARGIN - 20), self.header, fontsize=8)
+        self.page.insert_text(
+            (MARGIN, PAGE_HEIGHT - MARGIN + 24),
+            f"{self.footer} - Seite {len(self.doc)}",
+            fontsize=8,
+        )
+        self.y = MARGIN + 10
+
+    def ensure_space(self, height: float):
+        if self.y + height > PAGE_HEIGHT - MARGIN:
+            self.new_page()
+
+    def line(self, text: str, fontsize: float = FONT_SIZE, bold: bool = False):
+        self.ensure_space(LINE_HEIGHT)
+        fontname = "hebo" if bold else "helv"
+        self.page.insert_text((MARGIN, self.y), text, fontsize=fontsize, fontname=fontname)
+        self.y += LINE_HEIGHT if fontsize <= FONT_SIZE else fontsize + 6
+
+    def paragraph(self, text: str):
+        for ln in textwrap.wrap(text, WRAP_CHARS):
+            self.line(ln)
+        self.y += LINE_HEIGHT / 2
+
+    def table(self, header: list[str], rows: list[list[str]]):
+        """Zeichnet eine Tabelle mit Gitterlinien (erkennbar für page.find_tables)."""
+        n_cols = len(header)
+        col_w = (PAGE_WIDTH - 2 * MARGIN) / n_cols
+        row_h = LINE_HEIGHT + 6
+        self.ensure_space(row_h * (len(rows) + 1) + LINE_HEIGHT)
+
+        top = self.y - LINE_HEIGHT + 2
+        for r, cells in enumerate([header] + rows):
+            y0 = top + r * row_h
+            for c, cell in enumerate(cells):
+                x0 = MARGIN + c * col_w
+                rect = fitz.Rect(x0, y0, x0 + col_w, y0 + row_h)
+                self.page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+                self.page.insert_text(
+                    (x0 + 3, y0 + row_h - 5),
+                    cell[: int(col_w / 5)],
+                    fontsize=FONT_SIZE - 1,
+                    fontname="hebo" if r == 0 else "helv",
+                )
+        self.y = top + row_h * (len(rows) + 1) + LINE_HEIGHT * 1.5
+
+
+def _sentences(rng: random.Random, n: int, thema: str) -> str:
+    out = []
+    for _ in range(n):
+        tpl = rng.choice(SATZ_BAUSTEINE)
+        out.append(tpl.format(gremium=rng.choice(GREMIEN), thema=thema, person=rng.choice(PERSONEN)))
+    return " ".join(out)
+
+
+def _agenda(w: _PageWriter, rng: random.Random, sitzung: int, n_tops: int):
+    w.line(f"Tagesordnung der {sitzung}. Sitzung des Senats", fontsize=14, bold=True)
+    w.paragraph(f"Öffentliche Sitzung am {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025, "
+                f"Beginn {rng.randint(9, 15)}:00 Uhr, Sitzungssaal der Präsidentin.")
+    rows = []
+    for top in range(1, n_tops + 1):
+        thema = rng.choice(THEMEN)
+        rows.append([f"TOP {top}", thema, rng.choice(PERSONEN)])
+    w.table(["TOP", "Gegenstand", "Berichterstattung"], rows)
+    for top, (_, thema, person) in enumerate(rows, start=1):
+        w.line(f"TOP {top} {thema}", bold=True)
+        w.paragraph(f"Berichterstattung: {person}")
+        w.paragraph(f"Beschlussempfehlung: Der Senat befürwortet {thema}.")
+
+
+def _vorlage(w: _PageWriter, rng: random.Random, sitzung: int, top: int,
+             n_pages: int, table_density: float, sentences_per_par: int):
+    thema = rng.choice(THEMEN)
+    w.line(f"{sitzung}. Sitzung des Senats - TOP {top}", fontsize=14, bold=True)
+    w.line(thema, bold=True)
+    w.paragraph(f"Berichterstattung: {rng.choice(PERSONEN)}")
+    w.paragraph(f"Beschluss Nr. 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}-{top}")
+
+    while len(w.doc) < n_pages:
+        w.line("Sachstand", bold=True)
+        w.paragraph(_sentences(rng, sentences_per_par, thema))
+        if rng.random() < table_density:
+            ja, nein = rng.randint(5, 30), rng.randint(0, 5)
+            w.table(
+                ["Abstimmung", "Ja", "Nein", "Enthaltung"],
+                [[f"TOP {top} {thema[:20]}", str(ja), str(nein), str(rng.randint(0, 4))]],
+            )
+
+    w.line("Beschlussempfehlung", bold=True)
+    w.paragraph(f"Der Senat stimmt {thema} in der vorgelegten Fassung zu.")
+    w.line("Anlagen", bold=True)
+    w.paragraph(rng.choice(["Keine", f"Entwurf {thema}", "Synopse der Änderungen"]))
+
+
+def generate_document(path: Path, seed: int, index: int) -> int:
+    """
+    Erzeugt ein einzelnes synthetisches PDF. Gibt die Seitenzahl zurück.
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    sitzung = 100 + index // 12
+    doc = fitz.open()
+    w = _PageWriter(
+        doc,
+        header="Duale Hochschule Baden-Württemberg - Präsidium - Geschäftsstelle Senat",
+        footer=f"{sitzung}. Sitzung Senat",
+    )
+
+    if index % 12 == 0:
+        _agenda(w, rng, sitzung, n_tops=rng.randint(6, 14))
+    else:
+        _vorlage(
+            w, rng, sitzung, top=index % 12 + 2,
+            n_pages=rng.choice([1, 1, 2, 2, 3, 4, 6, 8]),
+            table_density=rng.choice([0.0, 0.2, 0.5, 0.8]),
+            sentences_per_par=rng.randint(3, 12),
+        )
+
+    n_pages = len(doc)
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return n_pages
+
+
+def generate_corpus(out_dir: str, count: int, seed: int = 42) -> list[Path]:
+    """
+    Erzeugt `count` PDFs in `out_dir`. Bereits vorhandene Dateien gleichen
+    Namens werden wiederverwendet (Generierung ist deterministisch).
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(count):
+        kind = "Tagesordnung" if i % 12 == 0 else f"TOP {i % 12 + 2:02d}"
+        path = out / f"syn-{i:06d} - {kind}.pdf"
+        if not path.exists():
+            generate_document(path, seed, i)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetische Senats-PDFs erzeugen")
+    parser.add_argument("--out", default="bench/corpus/all")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out, args.count, args.seed)
+    print(f"{len(paths)} PDFs in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# tests/manage_shards.py
+#
+# Verwaltung der Shards einer Vektor-DB (VDB_SHARDING, rag/sharded_retriever.py).
+#
+#   python -m tests.manage_shards list
+#   python -m tests.manage_shards ingest s102 ./pdfs/sitzung_102   # nur dieser Shard
+#   python -m tests.manage_shards reindex s101                     # HNSW neu aufbauen
+#   python -m tests.manage_shards drop s099                        # Sitzung archivieren/entfernen
+#
+# Andere Shards werden dabei nicht angefasst.
+
+import argparse
+
+import config
+from config import DB_PATH, set_global_seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shards der Vektor-DB verwalten")
+    parser.add_argument("--db-path", default=DB_PATH)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    p_ingest = sub.add_parser("ingest")
+    p_ingest.add_argument("shard")
+    p_ingest.add_argument("pdf_dir")
+    p_drop = sub.add_parser("drop")
+    p_drop.add_argument("shard")
+    p_reindex = sub.add_parser("reindex")
+    p_reindex.add_argument("shard")
+    args = parser.parse_args()
+
+    # Sharding für dieses Werkzeug immer aktiv (vor dem Import von rag.*)
+    config.VDB_SHARDING = True
+
+    if args.cmd == "ingest":
+        from rag.pipeline import PDFRAG
+
+        set_global_seed()
+        PDFRAG(db_path=args.db_path).ingest(args.pdf_dir, shard=args.shard)
+        return
+    if args.cmd == "drop":
+        # Über PDFRAG, damit auch Tabellen-, Agenda- und Dokument-Index sowie
+        # der Nachbarschaftsgraph den Shard vergessen
+        from rag.pipeline import PDFRAG
+
+        files = PDFRAG(db_path=args.db_path).drop_shard(args.shard)
+        print(f"Shard {args.shard} gelöscht ({len(files)} PDFs)")
+        return
+
+    from rag.sharded_retriever import ShardedRetriever
+
+    retriever = ShardedRetriever(args.db_path)
+    if args.cmd == "list":
+        stats = retriever.shard_stats()
+        for shard, n in stats.items():
+            print(f"{shard:<20} {n:>8}")
+        print(f"{'gesamt':<20} {sum(stats.values()):>8}")
+    elif args.cmd == "reindex":
+        if args.shard not in retriever.shards:
+            parser.error(f"Unbekannter Shard: {args.shard}")
+        retriever.reindex_shard(args.shard)
+        print(f"Shard {args.shard} neu indiziert")
+
+
+if __name__ == "__main__":
+    main()
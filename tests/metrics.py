@@ -1,3 +1,5 @@
+import numpy as np
+
 
 def recall_at_k(res, gold):
     return int(gold in res)
@@ -6,3 +8,69 @@ def mrr(res, gold):
     if gold in res:
         return 1/(res.index(gold)+1)
     return 0
+
+
+def relevance_matrix(result_ids: list[list[str]], gold_ids: list[set[str]], k_max: int) -> np.ndarray:
+    """
+    Binäre Relevanzmatrix der Form (n_queries, k_max):
+    rel[q, r] = 1, wenn der Treffer auf Rang r+1 von Query q ein Gold-Chunk ist.
+    Fehlende Ränge (weniger als k_max Treffer) bleiben 0.
+    """
+    rel = np.zeros((len(result_ids), k_max), dtype=np.float32)
+    for q, (ids, gold) in enumerate(zip(result_ids, gold_ids)):
+        for r, d_id in enumerate(ids[:k_max]):
+            if d_id in gold:
+                rel[q, r] = 1.0
+    return rel
+
+
+def retrieval_metrics(rel: np.ndarray, n_gold: np.ndarray, ks: list[int]) -> dict[str, np.ndarray]:
+    """
+    Recall@k, MRR@k und nDCG@k für alle k in `ks` in einem Durchlauf.
+
+    Parameter
+    ---------
+    rel : np.ndarray
+        Relevanzmatrix (n_queries, k_max) aus relevance_matrix().
+    n_gold : np.ndarray
+        Anzahl Gold-Chunks pro Query (n_queries,). Queries ohne Gold-Chunk
+        gehen mit 0 in alle Mittelwerte ein.
+    ks : list[int]
+        Cutoffs, jeweils <= k_max.
+
+    Rückgabe
+    --------
+    dict[str, np.ndarray]
+        "recall", "mrr", "ndcg": Mittelwerte über alle Queries, je ein Wert pro k.
+    """
+    n_q, k_max = rel.shape
+    if n_q == 0:
+        zeros = np.zeros(len(ks))
+        return {"recall": zeros, "mrr": zeros, "ndcg": zeros}
+
+    ks_arr = np.asarray(ks, dtype=np.int64)
+    n_gold = np.asarray(n_gold, dtype=np.float32)
+    safe_gold = np.maximum(n_gold, 1.0)[:, None]
+
+    # Recall@k: Anteil gefundener Gold-Chunks unter den ersten k Treffern
+    hits_cum = np.cumsum(rel, axis=1)                       # (n_q, k_max)
+    recall = (hits_cum[:, ks_arr - 1] / safe_gold)          # (n_q, len(ks))
+
+    # MRR@k: 1 / Rang des ersten relevanten Treffers, falls dieser <= k
+    has_hit = rel.any(axis=1)
+    first_rank = np.where(has_hit, rel.argmax(axis=1) + 1, k_max + 1)
+    mrr_k = np.where(first_rank[:, None] <= ks_arr[None, :], 1.0 / first_rank[:, None], 0.0)
+
+    # nDCG@k mit binärer Relevanz
+    discounts = 1.0 / np.log2(np.arange(2, k_max + 2))      # (k_max,)
+    dcg_cum = np.cumsum(rel * discounts[None, :], axis=1)
+    ideal_cum = np.concatenate([[0.0], np.cumsum(discounts)])
+    ideal_len = np.minimum(n_gold[:, None], ks_arr[None, :]).astype(np.int64)
+    idcg = ideal_cum[ideal_len]
+    ndcg = np.where(idcg > 0, dcg_cum[:, ks_arr - 1] / np.where(idcg > 0, idcg, 1.0), 0.0)
+
+    return {
+        "recall": recall.mean(axis=0),
+        "mrr": mrr_k.mean(axis=0),
+        "ndcg": ndcg.mean(axis=0),
+    }
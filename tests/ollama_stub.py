@@ -0,0 +1,392 @@
+# tests/ollama_stub.py
+#
+# Lokaler Stand-in für den Ollama-Server (nur Standardbibliothek).
+#
+# Implementiert die HTTP-Endpunkte, die rag/embeddings.py und rag/llm.py über
+# den ollama-Client verwenden:
+#   POST /api/embeddings   (ollama.embeddings)
+#   POST /api/embed        (ollama.embed, Batch-Variante)
+#   POST /api/chat         (ollama.chat, ohne Streaming)
+#   GET  /, /api/version, /api/tags  (Health-Checks)
+#
+# Embeddings sind deterministisch und hash-basiert (Feature-Hashing über
+# Wörter), sodass ähnliche Texte ähnliche Vektoren erhalten. Chat-Antworten
+# kommen aus einem Skript (Regeln "Prompt enthält X -> Antwort Y") mit
+# konfigurierbarer Latenz und Jitter.
+#
+# Einbindung ohne Änderungen in rag/: in config.py OLLAMA_HOST setzen
+# (bzw. Umgebungsvariable RAG_OLLAMA_HOST), z.B.
+#
+#   python -m tests.ollama_stub --port 11500 --latency-ms 300 --jitter-ms 50
+#   RAG_OLLAMA_HOST=http://127.0.0.1:11500 python run_query.py
+#
+# Für den Endpoint-Pool (rag/ollama_pool.py) mehrere Instanzen auf
+# aufeinanderfolgenden Ports, optional mit zufälligen 503-Fehlern:
+#
+#   python -m tests.ollama_stub --port 11500 --instances 3 --fail-rate 0.1
+#   RAG_OLLAMA_HOSTS=http://127.0.0.1:11500,http://127.0.0.1:11501,http://127.0.0.1:11502 \
+#       python run_query.py
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Dimension je Embedding-Modell (qwen3-embedding:0.6b liefert 1024)
+EMBED_DIMS = {
+    "qwen3-embedding:0.6b": 1024,
+}
+DEFAULT_EMBED_DIM = 1024
+
+# Erkennungsmerkmale der Prompts aus rag/gap_analyzer.py und rag/answer_combiner.py
+GAP_MARKER = "Du bewertest, ob die vorhandenen Informationen ausreichen"
+COLLECT_MARKER = "Identifiziere ALLE Textstellen"
+CHOOSE_MARKER = "Relevante Textstellen:"
+COMBINE_MARKER = "Antwort (kurz, maximal zwei Sätze):"
+
+CANNED_GAP_QUERIES = (
+    "Beschlussempfehlung TOP 4 Senat DHBW\n"
+    "TOP 4 Beschluss Nr. Senat\n"
+    "Tagesordnung Sitzung Senat Anlagen"
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def hash_embedding(text: str, dim: int = DEFAULT_EMBED_DIM) -> list[float]:
+    """
+    Deterministisches Embedding über Feature-Hashing.
+
+    Jedes (kleingeschriebene) Wort wird per BLAKE2b auf einen Index und ein
+    Vorzeichen abgebildet. Texte mit gemeinsamen Wörtern haben dadurch eine
+    positive Kosinus-Ähnlichkeit, identische Texte identische Vektoren.
+    """
+    vec = [0.0] * dim
+    tokens = _TOKEN_RE.findall(text.lower()) or [text]
+    for tok in tokens:
+        h = hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest()
+        n = int.from_bytes(h, "little")
+        idx = n % dim
+        sign = 1.0 if (n >> 63) & 1 else -1.0
+        vec[idx] += sign
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _default_script(gap_mode: str) -> list[dict]:
+    gap_response = "NONE" if gap_mode == "none" else CANNED_GAP_QUERIES
+    return [
+        {"match": GAP_MARKER, "responses": [gap_response]},
+        {"match": COLLECT_MARKER, "responses": ["{first_snippet}"]},
+        {"match": CHOOSE_MARKER, "responses": ["{first_snippet}"]},
+        {"match": COMBINE_MARKER, "responses": ["{first_snippet}"]},
+    ]
+
+
+def _first_snippet(prompt: str, max_chars: int = 240) -> str:
+    """
+    Extrahiert den ersten Kontext-Ausschnitt aus einem Prompt
+    (Text nach "Informationen ...:" bzw. "Relevante Textstellen:" bis "---").
+    """
+    for marker in ("(Ausschnitte aus den Dokumenten):", CHOOSE_MARKER):
+        pos = prompt.find(marker)
+        if pos >= 0:
+            rest = prompt[pos + len(marker):].strip()
+            snippet = rest.split("\n---\n", 1)[0].split("\n\n", 1)[0].strip()
+            if snippet:
+                return snippet[:max_chars]
+    return "Die Informationen reichen nicht aus."
+
+
+class StubState:
+    def __init__(
+        self,
+        script: list[dict],
+        default_response: str = "NONE",
+        chat_latency_ms: float = 0.0,
+        chat_jitter_ms: float = 0.0,
+        embed_latency_ms: float = 0.0,
+        embed_jitter_ms: float = 0.0,
+        seed: int = 42,
+        fail_rate: float = 0.0,
+    ):
+        """
+        Gemeinsamer Zustand aller Request-Handler eines Stub-Servers:
+        Chat-Skript, Latenzmodell, Fehlerrate und Zähler.
+        """
+        self.script = script
+        self.default_response = default_response
+        self.chat_latency_ms = chat_latency_ms
+        self.chat_jitter_ms = chat_jitter_ms
+        self.embed_latency_ms = embed_latency_ms
+        self.embed_jitter_ms = embed_jitter_ms
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._rule_calls = [0] * len(script)
+        self.counters = {"chat": 0, "embeddings": 0, "embed_inputs": 0, "failures": 0}
+
+    def delay(self, base_ms: float, jitter_ms: float) -> float:
+        """Berechnet (reproduzierbar über den Seed) eine Latenz in Sekunden."""
+        with self._lock:
+            jitter = self._rng.uniform(-jitter_ms, jitter_ms) if jitter_ms > 0 else 0.0
+        return max(0.0, base_ms + jitter) / 1000.0
+
+    def should_fail(self) -> bool:
+        """True mit Wahrscheinlichkeit fail_rate (simulierter Serverfehler)."""
+        if self.fail_rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < self.fail_rate
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def chat_response(self, prompt: str) -> str:
+        """
+        Wählt die Antwort der ersten passenden Regel. Mehrere Antworten einer
+        Regel werden der Reihe nach (zyklisch) ausgegeben.
+        """
+        for i, rule in enumerate(self.script):
+            if rule.get("match", "") in prompt:
+                responses = rule.get("responses") or [self.default_response]
+                with self._lock:
+                    n = self._rule_calls[i]
+                    self._rule_calls[i] += 1
+                template = responses[n % len(responses)]
+                return template.replace("{first_snippet}", _first_snippet(prompt))
+        return self.default_response
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "OllamaStub/0.1"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # Kein Request-Logging auf stderr, um Messungen nicht zu verfälschen
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw or b"{}")
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path in ("/", ""):
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-stub"})
+        elif self.path == "/api/tags":
+            models = [{"name": m, "model": m} for m in list(EMBED_DIMS) + ["llama3.2"]]
+            self._send_json({"models": models})
+        elif self.path == "/api/stub/stats":
+            self._send_json(dict(self.state.counters))
+        else:
+            self._send_json({"error": f"unknown path {self.path}"}, status=404)
+
+    def do_POST(self):
+        try:
+            req = self._read_json()
+        except json.JSONDecodeError as e:
+            self._send_json({"error": f"invalid json: {e}"}, status=400)
+            return
+
+        if self.state.should_fail():
+            self.state.count("failures")
+            self._send_json({"error": "simulated failure"}, status=503)
+            return
+
+        if self.path == "/api/embeddings":
+            self._handle_embeddings(req)
+        elif self.path == "/api/embed":
+            self._handle_embed(req)
+        elif self.path == "/api/chat":
+            self._handle_chat(req)
+        else:
+            self._send_json({"error": f"unknown path {self.path}"}, status=404)
+
+    def _dim(self, model: str) -> int:
+        return EMBED_DIMS.get(model, DEFAULT_EMBED_DIM)
+
+    def _handle_embeddings(self, req: dict):
+        st = self.state
+        time.sleep(st.delay(st.embed_latency_ms, st.embed_jitter_ms))
+        st.count("embeddings")
+        st.count("embed_inputs")
+        model = req.get("model", "")
+        self._send_json({"embedding": hash_embedding(req.get("prompt", ""), self._dim(model))})
+
+    def _handle_embed(self, req: dict):
+        st = self.state
+        inputs = req.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        time.sleep(st.delay(st.embed_latency_ms, st.embed_jitter_ms))
+        st.count("embeddings")
+        st.count("embed_inputs", len(inputs))
+        model = req.get("model", "")
+        dim = self._dim(model)
+        self._send_json({
+            "model": model,
+            "embeddings": [hash_embedding(t, dim) for t in inputs],
+        })
+
+    def _handle_chat(self, req: dict):
+        st = self.state
+        messages = req.get("messages") or []
+        prompt = "\n".join(m.get("content", "") for m in messages)
+        content = st.chat_response(prompt)
+
+        delay = st.delay(st.chat_latency_ms, st.chat_jitter_ms)
+        time.sleep(delay)
+        st.count("chat")
+
+        # Token-Zähler und Dauern wie bei Ollama (Nanosekunden); Prefill und
+        # Decode teilen sich die simulierte Latenz im Verhältnis 1:3.
+        total_ns = int(delay * 1e9)
+        self._send_json({
+            "model": req.get("model", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": total_ns,
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": total_ns // 4,
+            "eval_count": len(content.split()),
+            "eval_duration": total_ns - total_ns // 4,
+        })
+
+
+def load_script(path: str) -> tuple[list[dict], str | None]:
+    """
+    Lädt ein Chat-Skript im JSON-Format:
+
+        {"rules": [{"match": "TEXT IM PROMPT", "responses": ["A", "B"]}],
+         "default": "NONE"}
+
+    In Antworten wird "{first_snippet}" durch den ersten Kontextausschnitt
+    des Prompts ersetzt.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("rules", []), data.get("default")
+
+
+def start_stub(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    script: list[dict] | None = None,
+    gap_mode: str = "none",
+    default_response: str = "NONE",
+    chat_latency_ms: float = 0.0,
+    chat_jitter_ms: float = 0.0,
+    embed_latency_ms: float = 0.0,
+    embed_jitter_ms: float = 0.0,
+    seed: int = 42,
+    fail_rate: float = 0.0,
+) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Startet einen Stub-Server in einem Hintergrund-Thread.
+
+    Mit port=0 wird ein freier Port gewählt. Gibt (server, base_url) zurück;
+    beenden mit server.shutdown().
+    """
+    state = StubState(
+        script=script if script is not None else _default_script(gap_mode),
+        default_response=default_response,
+        chat_latency_ms=chat_latency_ms,
+        chat_jitter_ms=chat_jitter_ms,
+        embed_latency_ms=embed_latency_ms,
+        embed_jitter_ms=embed_jitter_ms,
+        seed=seed,
+        fail_rate=fail_rate,
+    )
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True)
+    thread.start()
+    url = f"http://{host}:{server.server_address[1]}"
+    return server, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministischer Ollama-Stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--script", help="JSON-Datei mit Chat-Regeln")
+    parser.add_argument("--gap-mode", choices=["none", "queries"], default="none",
+                        help="Antwort auf Gap-Analyse: NONE oder feste Suchanfragen")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Chat-Latenz")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Chat-Jitter (+/-)")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--embed-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--instances", type=int, default=1,
+                        help="Anzahl Server auf aufeinanderfolgenden Ports (ab --port)")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="Anteil der POST-Anfragen, die mit 503 scheitern")
+    args = parser.parse_args()
+
+    script, default = (None, None)
+    if args.script:
+        script, default = load_script(args.script)
+
+    servers = []
+    for i in range(max(1, args.instances)):
+        server, url = start_stub(
+            host=args.host,
+            port=args.port + i,
+            script=script,
+            gap_mode=args.gap_mode,
+            default_response=default or "NONE",
+            chat_latency_ms=args.latency_ms,
+            chat_jitter_ms=args.jitter_ms,
+            embed_latency_ms=args.embed_latency_ms,
+            embed_jitter_ms=args.embed_jitter_ms,
+            seed=args.seed + i,
+            fail_rate=args.fail_rate,
+        )
+        servers.append(server)
+        print(f"Ollama-Stub läuft unter {url}")
+    print("Strg+C zum Beenden")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# tests/rehydrate_log.py
+#
+# Stellt aus einem Log im "ids"-Modus (LOG_CHUNKS="ids") das Volltext-Log her.
+#
+# Jede Zeile mit einer Chunk-Referenz "id=<16 Hex-Zeichen>" bekommt den
+# zugehörigen Text als "text_START ... text_END"-Block angehängt. Texte kommen
+# aus dem Chunk-Wörterbuch des Laufs (<logdatei>.chunks.jsonl); IDs, die dort
+# fehlen (z.B. Treffer, die nie gererankt wurden), werden aus dem Index
+# nachgeladen:
+#
+#   python -m tests.rehydrate_log logs/pdf_rag_20260101_120000.log
+#   python -m tests.rehydrate_log <log> --out voll.log --db-path ./vector_db
+#   python -m tests.rehydrate_log <log> --no-index     # nur Wörterbuch
+
+import argparse
+import json
+import os
+import re
+import sys
+
+_REF_RE = re.compile(r"\bid=([0-9a-f]{16})\b")
+
+
+def default_dict_path(log_path: str) -> str:
+    root, _ = os.path.splitext(log_path)
+    return root + ".chunks.jsonl"
+
+
+def load_chunk_dict(path: str) -> dict[str, str]:
+    texts: dict[str, str] = {}
+    if not os.path.exists(path):
+        return texts
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                texts[rec["id"]] = rec["text"]
+    return texts
+
+
+def referenced_ids(lines: list[str]) -> set[str]:
+    ids: set[str] = set()
+    for line in lines:
+        if "text_START" not in line:
+            ids.update(_REF_RE.findall(line))
+    return ids
+
+
+def lookup_index(ids: list[str], db_path: str, collection: str) -> dict[str, str]:
+    """Fehlende Texte aus ChunkStore bzw. Chroma (import erst bei Bedarf)."""
+    from rag.retriever import Retriever
+
+    retriever = Retriever(db_path, collection)
+    return {cid: t for cid, t in zip(ids, retriever.texts(ids)) if t is not None}
+
+
+def rehydrate(lines: list[str], texts: dict[str, str]) -> list[str]:
+    out: list[str] = []
+    for line in lines:
+        out.append(line)
+        if "text_START" in line:
+            continue
+        for cid in _REF_RE.findall(line):
+            text = texts.get(cid)
+            out.append(f"text_START\n{text}\ntext_END\n" if text is not None else "text_MISSING\n")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk-Texte in ein ID-Log zurückschreiben")
+    parser.add_argument("log", help="Logdatei eines Laufs mit LOG_CHUNKS=ids")
+    parser.add_argument("--chunks", default=None, help="Chunk-Wörterbuch (Default: <log>.chunks.jsonl)")
+    parser.add_argument("--out", default=None, help="Ausgabedatei (Default: stdout)")
+    parser.add_argument("--db-path", default=None, help="Vektor-DB für fehlende IDs (Default: DB_PATH)")
+    parser.add_argument("--collection", default="pdf")
+    parser.add_argument("--no-index", action="store_true", help="Index nicht abfragen")
+    args = parser.parse_args()
+
+    with open(args.log, encoding="utf-8") as f:
+        lines = f.readlines()
+
+    texts = load_chunk_dict(args.chunks or default_dict_path(args.log))
+    missing = sorted(referenced_ids(lines) - texts.keys())
+    if missing and not args.no_index:
+        from config import DB_PATH
+
+        texts.update(lookup_index(missing, args.db_path or DB_PATH, args.collection))
+
+    unresolved = len(referenced_ids(lines) - texts.keys())
+    result = rehydrate(lines, texts)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.writelines(result)
+    else:
+        sys.stdout.writelines(result)
+    print(
+        f"Referenzen: {len(referenced_ids(lines))}, aus Wörterbuch/Index aufgelöst: "
+        f"{len(referenced_ids(lines)) - unresolved}, nicht gefunden: {unresolved}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,304 @@
-# tests/run_eval.py
-
-import json
-import os
-
-from bert_score import score as bertscore
-
-from config import (
-    set_global_seed,
-    set_rag_mode,
-    RAG_MODE,
-    ENABLE_GAP_RETRIEVAL,
-    log_line,
-)
-from rag.pipeline import PDFRAG
-
-
-EVAL_DATA_PATH = "tests/eval_data.json"
-EVAL_RESULTS_PATH = "tests/eval_results.json"
-
-
-def load_eval_data(path: str = EVAL_DATA_PATH):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def run_rag_for_mode(mode: str, enable_gap: bool):
-    """
-    Führt den RAG für alle Fragen im angegebenen Modus aus.
-    Gibt eine Liste von Dicts zurück: id, mode, question, gold, answer.
-    """
-    set_rag_mode(mode, enable_gap)
-    log_line(f"[EVAL] Starte Run für mode={mode}, enable_gap={enable_gap}")
-
-    # Für Reproduzierbarkeit
-    set_global_seed()
-
-    rag = PDFRAG()
-
-    data = load_eval_data()
-    results = []
-
-    for item in data:
-        qid = item["id"]
-        question = item["question"]
-        gold = item["gold"]
-
-        log_line(f"[EVAL] QUERY id={qid} mode={mode} question={question}")
-        answer = rag.query(question)
-
-        results.append(
-            {
-                "id": qid,
-                "mode": mode,
-                "question": question,
-                "gold": gold,
-                "answer": answer,
-            }
-        )
-
-    return results
-
-
-def add_bertscore(results):
-    """
-    Berechnet BERTScore(F1) für alle Einträge in 'results' und
-    fügt pro Eintrag ein Feld 'bertscore_f1' hinzu.
-    """
-    golds = [r["gold"] for r in results]
-    preds = [r["answer"] for r in results]
-
-    # Deutsch
-    P, R, F1 = bertscore(
-        preds,
-        golds,
-        lang="de",
-        rescale_with_baseline=True,
-    )
-
-    for r, f1 in zip(results, F1):
-        r["bertscore_f1"] = float(f1.item())
-
-
-def main():
-    # Optional: Ingestion einmal hier machen.
-    # Wenn deine Vector-DB schon existiert, kannst du das auskommentieren.
-    set_global_seed()
-    rag_ingest = PDFRAG()
-    rag_ingest.ingest()
-
-    # Run A: simple (ohne Gap-Analyse)
-    results_simple = run_rag_for_mode(mode="simple", enable_gap=False)
-
-    # Run B: enhanced (mit Gap-Analyse)
-    results_enhanced = run_rag_for_mode(mode="enhanced", enable_gap=True)
-
-    # Ergebnisse zusammenführen
-    all_results = results_simple + results_enhanced
-
-    # BERTScore berechnen
-    add_bertscore(all_results)
-
-    # Durchschnitt pro Modus ausgeben
-    simple_scores = [r["bertscore_f1"] for r in all_results if r["mode"] == "simple"]
-    enhanced_scores = [r["bertscore_f1"] for r in all_results if r["mode"] == "enhanced"]
-
-    if simple_scores:
-        mean_simple = sum(simple_scores) / len(simple_scores)
-    else:
-        mean_simple = 0.0
-
-    if enhanced_scores:
-        mean_enhanced = sum(enhanced_scores) / len(enhanced_scores)
-    else:
-        mean_enhanced = 0.0
-
-    print("=== EVAL RESULTATE ===")
-    print(f"BERTScore F1 (simple):   {mean_simple:.4f}")
-    print(f"BERTScore F1 (enhanced): {mean_enhanced:.4f}")
-    print(f"Detailergebnisse in: {EVAL_RESULTS_PATH}")
-
-    # Ergebnisse als JSON speichern
-    os.makedirs(os.path.dirname(EVAL_RESULTS_PATH), exist_ok=True)
-    with open(EVAL_RESULTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(all_results, f, ensure_ascii=False, indent=2)
-
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+# tests/run_eval.py
+#
+# Evaluation simple vs. enhanced mit BERTScore.
+#
+# - Der modusunabhängige erste Teil (Embedding, Retrieval, Reranking) wird pro
+#   Frage nur EINMAL berechnet und für beide Modi verwendet.
+# - Fragen laufen parallel in einem begrenzten Thread-Pool (--workers).
+# - Jedes Ergebnis wird sofort als Zeile in eine JSONL-Checkpoint-Datei
+#   geschrieben; ein abgebrochener Lauf setzt beim nächsten Start dort fort.
+# - Mit --ids bzw. --shard i/n lässt sich die Fragenmenge aufteilen, z.B. auf
+#   mehrere Prozesse; --merge führt die Checkpoints danach zusammen.
+#
+#   python -m tests.run_eval --workers 4
+#   python -m tests.run_eval --shard 0/2 &  python -m tests.run_eval --shard 1/2
+#   python -m tests.run_eval --merge
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    set_global_seed,
+    log_line,
+)
+from rag.pipeline import PDFRAG
+from rag.profiling import Profile
+from tests.scoring import CachedBERTScorer
+
+
+EVAL_DATA_PATH = "tests/eval_data.json"
+EVAL_RESULTS_PATH = "tests/eval_results.json"
+CHECKPOINT_PATH = "tests/eval_results.jsonl"
+
+# Modus -> (enhanced = Gap-Analyse, expand = Erweiterung über den Nachbarschaftsgraphen)
+MODES = {
+    "simple": (False, False),
+    "enhanced": (True, False),
+    "expand": (False, True),
+}
+
+
+def load_eval_data(path: str = EVAL_DATA_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def select_items(data: list[dict], ids: str | None = None, shard: str | None = None) -> list[dict]:
+    """
+    Wählt die zu evaluierenden Fragen aus.
+
+    ids   : kommagetrennte Frage-IDs, z.B. "1,2,7"
+    shard : "i/n" -> jede n-te Frage ab Position i (0-basiert)
+    """
+    items = data
+    if ids:
+        wanted = {x.strip() for x in ids.split(",") if x.strip()}
+        items = [d for d in items if str(d["id"]) in wanted]
+    if shard:
+        i, n = (int(x) for x in shard.split("/"))
+        if not 0 <= i < n:
+            raise ValueError(f"Ungültige Shard-Angabe: {shard}")
+        items = [d for pos, d in enumerate(items) if pos % n == i]
+    return items
+
+
+def load_checkpoint(path: str) -> list[dict]:
+    """
+    Liest alle vollständigen Zeilen einer Checkpoint-Datei.
+    Eine unvollständige letzte Zeile (Abbruch beim Schreiben) wird ignoriert.
+    """
+    if not os.path.exists(path):
+        return []
+    results = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                log_line(f"[EVAL] Checkpoint: unvollständige Zeile ignoriert in {path}")
+    return results
+
+
+class CheckpointWriter:
+    def __init__(self, path: str):
+        """
+        Thread-sicheres Anhängen von Ergebnissen an eine JSONL-Datei.
+        Jede Zeile wird sofort geflusht, damit ein Abbruch nichts verliert.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._f = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+def evaluate_item(rag: PDFRAG, item: dict, modes: list[str], done: set, writer: CheckpointWriter) -> int:
+    """
+    Beantwortet eine Frage in allen noch fehlenden Modi. Der erste Teil
+    (Embedding, Retrieval, Reranking) wird dabei nur einmal ausgeführt.
+    Gibt die Anzahl geschriebener Ergebnisse zurück.
+    """
+    qid = str(item["id"])
+    question = item["question"]
+    todo = [m for m in modes if (qid, m) not in done]
+    if not todo:
+        return 0
+
+    first_profile = Profile()
+    first = rag.first_stage(question, first_profile)
+    first_profile.finish()
+
+    for mode in todo:
+        log_line(f"[EVAL] QUERY id={qid} mode={mode} question={question}")
+        profile = Profile()
+        enhanced, expand = MODES[mode]
+        answer = rag.answer(first, enhanced, profile, expand=expand)
+        profile.finish()
+
+        writer.write(
+            {
+                "id": qid,
+                "mode": mode,
+                "question": question,
+                "gold": item["gold"],
+                "answer": answer,
+                "first_stage_s": first_profile.total_s,
+                "answer_s": profile.total_s,
+                "llm_calls": profile.counters.get("llm_calls", 0),
+            }
+        )
+    return len(todo)
+
+
+def run_eval(items: list[dict], modes: list[str], workers: int, checkpoint: str, ingest: bool):
+    """
+    Führt die Evaluation für `items` aus und schreibt jedes Ergebnis in den
+    Checkpoint. Bereits vorhandene (id, mode)-Paare werden übersprungen.
+    """
+    done = {(str(r["id"]), r["mode"]) for r in load_checkpoint(checkpoint)}
+    pending = [it for it in items if any((str(it["id"]), m) not in done for m in modes)]
+    log_line(
+        f"[EVAL] Start: items={len(items)} pending={len(pending)} "
+        f"modes={modes} workers={workers} checkpoint={checkpoint}"
+    )
+    print(f"{len(items) - len(pending)} von {len(items)} Fragen bereits im Checkpoint.")
+
+    set_global_seed()
+    # Ein PDFRAG für alle Modi und Worker; bei mehreren Workern werden die
+    # Reranking-Paare paralleler Fragen gemeinsam gebatcht.
+    rag = PDFRAG(micro_batching=workers > 1)
+    if ingest:
+        rag.ingest()
+
+    if not pending:
+        return
+
+    writer = CheckpointWriter(checkpoint)
+    t0 = time.perf_counter()
+    n_written = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {
+                pool.submit(evaluate_item, rag, it, modes, done, writer): it["id"]
+                for it in pending
+            }
+            for fut in as_completed(futures):
+                qid = futures[fut]
+                try:
+                    n_written += fut.result()
+                except Exception as e:
+                    # Fehlgeschlagene Fragen bleiben offen und werden beim
+                    # nächsten Lauf erneut versucht.
+                    log_line(f"[EVAL] FEHLER id={qid}: {e!r}")
+                    print(f"FEHLER bei Frage {qid}: {e!r}")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - t0
+    print(f"{n_written} Ergebnisse in {elapsed:.1f}s geschrieben ({checkpoint}).")
+
+
+def add_bertscore(results, scorer: CachedBERTScorer | None = None):
+    """
+    Berechnet BERTScore(F1) für alle Einträge in 'results' und
+    fügt pro Eintrag ein Feld 'bertscore_f1' hinzu.
+
+    Unveränderte (Antwort, Gold)-Paare kommen aus dem Cache des Scorers;
+    nur neue oder geänderte Antworten werden neu bewertet.
+    """
+    if scorer is None:
+        scorer = CachedBERTScorer()
+
+    golds = [r["gold"] for r in results]
+    preds = [r["answer"] for r in results]
+
+    hits, todo = scorer.stats_for(preds, golds)
+    log_line(f"[EVAL] BERTScore Cache: hits={hits} neu={todo}")
+    print(f"BERTScore: {hits} aus Cache, {todo} neu zu bewerten")
+
+    # Deutsch (lang="de", rescale_with_baseline=True im Scorer-Default)
+    for r, f1 in zip(results, scorer.score(preds, golds)):
+        r["bertscore_f1"] = f1
+
+
+def finalize(results: list[dict], scorer: CachedBERTScorer | None = None):
+    """
+    BERTScore berechnen, Mittelwerte pro Modus ausgeben und alle Ergebnisse
+    als JSON nach EVAL_RESULTS_PATH schreiben.
+    """
+    # Nach id und Modus sortieren, damit die Ausgabe unabhängig von der
+    # Abarbeitungsreihenfolge der Worker ist.
+    mode_order = {m: i for i, m in enumerate(MODES)}
+    results = sorted(
+        results,
+        key=lambda r: (mode_order.get(r["mode"], len(mode_order)),
+                       int(r["id"]) if str(r["id"]).isdigit() else str(r["id"])),
+    )
+
+    add_bertscore(results, scorer)
+
+    print("=== EVAL RESULTATE ===")
+    for mode in MODES:
+        scores = [r["bertscore_f1"] for r in results if r["mode"] == mode]
+        mean = sum(scores) / len(scores) if scores else 0.0
+        print(f"BERTScore F1 ({mode}):{' ' * (10 - len(mode))}{mean:.4f}  (n={len(scores)})")
+    print(f"Detailergebnisse in: {EVAL_RESULTS_PATH}")
+
+    os.makedirs(os.path.dirname(EVAL_RESULTS_PATH), exist_ok=True)
+    with open(EVAL_RESULTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG-Evaluation simple vs. enhanced")
+    parser.add_argument("--data", default=EVAL_DATA_PATH)
+    parser.add_argument("--modes", default="simple,enhanced")
+    parser.add_argument("--workers", type=int, default=4, help="parallele Fragen")
+    parser.add_argument("--ids", help="nur diese Frage-IDs (kommagetrennt)")
+    parser.add_argument("--shard", help="i/n: nur jede n-te Frage ab Position i")
+    parser.add_argument("--checkpoint", help="JSONL-Checkpoint (Default abhängig von --shard)")
+    parser.add_argument("--fresh", action="store_true", help="vorhandenen Checkpoint verwerfen")
+    parser.add_argument("--ingest", action="store_true", help="PDFs vorher (erneut) indizieren")
+    parser.add_argument("--merge", action="store_true",
+                        help="nur alle Checkpoints zusammenführen und bewerten")
+    parser.add_argument("--no-score", action="store_true", help="keine BERTScore-Berechnung")
+    parser.add_argument("--score-batch-size", type=int, default=64)
+    parser.add_argument("--score-threads", type=int, default=None)
+    args = parser.parse_args()
+
+    scorer = CachedBERTScorer(batch_size=args.score_batch_size, num_threads=args.score_threads)
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for m in modes:
+        if m not in MODES:
+            raise ValueError(f"Unbekannter Modus: {m}")
+
+    if args.merge:
+        results = []
+        for path in sorted(glob.glob(CHECKPOINT_PATH.replace(".jsonl", "*.jsonl"))):
+            results.extend(load_checkpoint(path))
+        # Doppelte (id, mode) aus mehreren Läufen: letzter Eintrag gewinnt
+        merged = {(str(r["id"]), r["mode"]): r for r in results}
+        finalize(list(merged.values()), scorer)
+        return
+
+    checkpoint = args.checkpoint
+    if checkpoint is None:
+        checkpoint = CHECKPOINT_PATH
+        if args.shard:
+            i, n = args.shard.split("/")
+            checkpoint = CHECKPOINT_PATH.replace(".jsonl", f".shard{i}of{n}.jsonl")
+    if args.fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    items = select_items(load_eval_data(args.data), ids=args.ids, shard=args.shard)
+    run_eval(items, modes, args.workers, checkpoint, args.ingest)
+
+    # Bei Sharding erst nach --merge bewerten
+    if args.shard or args.no_score:
+        return
+
+    wanted = {(str(it["id"]), m) for it in items for m in modes}
+    results = [r for r in load_checkpoint(checkpoint) if (str(r["id"]), r["mode"]) in wanted]
+    finalize(results, scorer)
+
+
+if __name__ == "__main__":
+    main()
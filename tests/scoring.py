@@ -0,0 +1,173 @@
+# tests/scoring.py
+#
+# BERTScore-Bewertung mit einmal geladenem Modell und persistentem Cache.
+#
+# Scores werden pro (Antworttext, Goldtext, Scorer-Konfiguration) in einer
+# JSONL-Datei gespeichert. Bei einem erneuten Lauf werden nur neue oder
+# geänderte Antworten bewertet – Prompt-Iterationen in
+# rag/answer_combiner.py erfordern damit kein komplettes Neuberechnen.
+#
+#   python -m tests.scoring                       # tests/eval_results.json neu bewerten
+#   python -m tests.scoring --batch-size 128 --threads 8
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+BERTSCORE_CACHE_PATH = "tests/bertscore_cache.jsonl"
+
+
+class CachedBERTScorer:
+    def __init__(
+        self,
+        lang: str = "de",
+        rescale_with_baseline: bool = True,
+        model_type: str | None = None,
+        batch_size: int = 64,
+        num_threads: int | None = None,
+        cache_path: str = BERTSCORE_CACHE_PATH,
+    ):
+        """
+        BERTScore-F1 mit Cache.
+
+        Das BERTScore-Modell wird erst beim ersten Cache-Miss geladen und dann
+        für alle weiteren Aufrufe wiederverwendet.
+
+        Parameter
+        ---------
+        lang, rescale_with_baseline, model_type :
+            Wie bei bert_score.BERTScorer; Teil des Cache-Schlüssels.
+        batch_size : int
+            Batch-Größe für die Modellauswertung.
+        num_threads : int, optional
+            Anzahl Torch-CPU-Threads (None = Torch-Default).
+        cache_path : str
+            JSONL-Datei für den Score-Cache.
+        """
+        self.lang = lang
+        self.rescale_with_baseline = rescale_with_baseline
+        self.model_type = model_type
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.cache_path = cache_path
+
+        self._scorer = None
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+
+    @property
+    def config_key(self) -> str:
+        """Konfiguration, die die Scores beeinflusst (Teil des Cache-Schlüssels)."""
+        try:
+            from importlib.metadata import version
+            bs_version = version("bert-score")
+        except Exception:
+            bs_version = "unknown"
+        return json.dumps(
+            {
+                "lang": self.lang,
+                "rescale": self.rescale_with_baseline,
+                "model_type": self.model_type,
+                "bert_score": bs_version,
+            },
+            sort_keys=True,
+        )
+
+    def _key(self, answer: str, gold: str) -> str:
+        raw = json.dumps([answer, gold, self.config_key], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _load_cache(self) -> dict[str, float]:
+        cache: dict[str, float] = {}
+        if not os.path.exists(self.cache_path):
+            return cache
+        with open(self.cache_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                cache[entry["key"]] = entry["f1"]
+        return cache
+
+    def _get_scorer(self):
+        if self._scorer is None:
+            import torch
+            from bert_score import BERTScorer
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            self._scorer = BERTScorer(
+                lang=self.lang,
+                model_type=self.model_type,
+                rescale_with_baseline=self.rescale_with_baseline,
+                batch_size=self.batch_size,
+            )
+        return self._scorer
+
+    def score(self, answers: list[str], golds: list[str]) -> list[float]:
+        """
+        BERTScore-F1 für jedes (Antwort, Gold)-Paar. Nur Paare ohne
+        Cache-Eintrag werden (dedupliziert, in Batches) neu berechnet.
+        """
+        keys = [self._key(a, g) for a, g in zip(answers, golds)]
+
+        with self._lock:
+            missing: dict[str, tuple[str, str]] = {}
+            for k, a, g in zip(keys, answers, golds):
+                if k not in self._cache and k not in missing:
+                    missing[k] = (a, g)
+
+            if missing:
+                miss_keys = list(missing)
+                cands = [missing[k][0] for k in miss_keys]
+                refs = [missing[k][1] for k in miss_keys]
+                _, _, f1 = self._get_scorer().score(cands, refs, batch_size=self.batch_size)
+
+                directory = os.path.dirname(self.cache_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.cache_path, "a", encoding="utf-8") as f:
+                    for k, v in zip(miss_keys, f1):
+                        value = float(v.item())
+                        self._cache[k] = value
+                        f.write(json.dumps({"key": k, "f1": value}) + "\n")
+
+            return [self._cache[k] for k in keys]
+
+    def stats_for(self, answers: list[str], golds: list[str]) -> tuple[int, int]:
+        """Gibt (Cache-Treffer, neu zu berechnen) für die Paare zurück."""
+        keys = {self._key(a, g) for a, g in zip(answers, golds)}
+        hits = sum(1 for k in keys if k in self._cache)
+        return hits, len(keys) - hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eval-Ergebnisse mit BERTScore (gecacht) bewerten")
+    parser.add_argument("--results", default="tests/eval_results.json")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--cache", default=BERTSCORE_CACHE_PATH)
+    args = parser.parse_args()
+
+    with open(args.results, "r", encoding="utf-8") as f:
+        results = json.load(f)
+
+    scorer = CachedBERTScorer(batch_size=args.batch_size, num_threads=args.threads, cache_path=args.cache)
+    answers = [r["answer"] for r in results]
+    golds = [r["gold"] for r in results]
+    hits, todo = scorer.stats_for(answers, golds)
+    print(f"Cache: {hits} Treffer, {todo} neu zu bewerten")
+
+    for r, f1 in zip(results, scorer.score(answers, golds)):
+        r["bertscore_f1"] = f1
+
+    with open(args.results, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Bewertet: {args.results}")
+
+
+if __name__ == "__main__":
+    main()
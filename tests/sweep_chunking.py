@@ -0,0 +1,160 @@
+# tests/sweep_chunking.py
+#
+# Parameter-Sweep über CHUNK_SIZE / CHUNK_OVERLAP ohne komplette Re-Ingestion.
+#
+# - Alle PDFs werden genau EINMAL geparst, bei
+#   unveränderten Dateien direkt aus dem Extraktions-Cache.
+# - Pro (size, overlap) wird mit chunk_page neu gechunkt; eingebettet werden
+#   nur Chunk-Texte, die in einer früheren Konfiguration noch nicht vorkamen.
+# - Pro Konfiguration entsteht ein eigener Index unter --work-dir, auf demselben
+#   Weg wie PDFRAG.ingest: chunk_records -> dedup_records (DEDUP_ENABLED) ->
+#   Retriever.add_chunks (ChunkStore, sofern CHUNK_STORE_ENABLED).
+# - Berichtet werden Ingest-Zeit, Chunk-Anzahl, Indexgröße, Retrieval-Recall
+#   (Testdaten wie tests/test_retrieval.py) und Query-Latenz.
+#
+#   python -m tests.sweep_chunking --sizes 80,120,200 --overlaps 0,25,50
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from config import PDF_DIR, EMBED_MODEL, DEDUP_ENABLED, CHUNK_STORE_ENABLED, log_line
+from rag.chunker import format_chunk
+from rag.embeddings import Embedder
+from rag.extraction_cache import extract_cached
+from rag.pipeline import chunk_records, dedup_records, iter_pdfs
+from rag.retriever import Retriever, chunk_id
+from tests.bench_common import run_metadata, write_json
+from tests.bench_ingest import dir_size_bytes
+from tests.test_retrieval import TEST_DATA_PATH, evaluate_backend
+
+WORK_DIR = "bench/chunk_sweep"
+
+
+def parse_corpus(pdf_dir: str) -> list[tuple[str, list]]:
+    """
+    Parst alle PDFs einmal (über den Extraktions-Cache):
+    Liste von (pdf_name, pages).
+    """
+    corpus = []
+    for pdf in iter_pdfs(pdf_dir):
+        pages, _, _ = extract_cached(str(pdf))
+        corpus.append((pdf.name, pages))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking-Parameter-Sweep")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--sizes", default="80,120,160,200")
+    parser.add_argument("--overlaps", default="0,25,50")
+    parser.add_argument("--data", default=TEST_DATA_PATH)
+    parser.add_argument("--ks", default="5,10,20")
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--out", default=os.path.join(WORK_DIR, "results.json"))
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",") if x.strip()]
+    overlaps = [int(x) for x in args.overlaps.split(",") if x.strip()]
+    ks = sorted({int(k) for k in args.ks.split(",") if k.strip()})
+
+    with open(args.data, encoding="utf-8") as f:
+        data = json.load(f)
+
+    t0 = time.perf_counter()
+    corpus = parse_corpus(args.pdf_dir)
+    parse_s = time.perf_counter() - t0
+    n_pages = sum(len(pages) for _, pages in corpus)
+    print(f"{len(corpus)} PDFs / {n_pages} Seiten geparst in {parse_s:.1f}s (einmalig)")
+
+    embedder = Embedder(EMBED_MODEL)
+    q_embs = embedder.encode([d["question"] for d in data])
+
+    # Chunk-Text -> Embedding, über alle Konfigurationen geteilt
+    emb_cache: dict[str, np.ndarray] = {}
+
+    results = {"meta": run_metadata(), "parse_s": parse_s, "configs": []}
+    for size in sizes:
+        for overlap in overlaps:
+            if overlap >= size:
+                continue
+            name = f"s{size}_o{overlap}"
+            log_line(f"[SWEEP] config={name} START")
+
+            t_start = time.perf_counter()
+            records: list[tuple[str, int, str]] = []
+            page_texts: dict[tuple[str, int], str] = {}
+            for pdf_name, pages in corpus:
+                records.extend(chunk_records(pdf_name, pages, size, overlap))
+                page_texts.update(((pdf_name, pno), text) for pno, text in pages)
+            if DEDUP_ENABLED:
+                keep, sources = dedup_records(records)
+            else:
+                keep = list(range(len(records)))
+                sources = [[f"{r[0]}:{r[1]}"] for r in records]
+            # Identische Chunk-Texte nur einmal indizieren (IDs sind Text-Hashes)
+            first: dict[str, int] = {}
+            for j, i in enumerate(keep):
+                first.setdefault(format_chunk(*records[i]), j)
+            chunks = [records[keep[j]] for j in first.values()]
+            metadatas = [
+                {"sources": json.dumps(sources[j], ensure_ascii=False), "n_sources": len(sources[j])}
+                for j in first.values()
+            ]
+            docs = list(first)
+            t_chunk = time.perf_counter()
+
+            new_docs = [d for d in docs if d not in emb_cache]
+            if new_docs:
+                for d, e in zip(new_docs, embedder.encode(new_docs)):
+                    emb_cache[d] = e
+            t_embed = time.perf_counter()
+
+            db_path = os.path.join(args.work_dir, name)
+            shutil.rmtree(db_path, ignore_errors=True)
+            retriever = Retriever(db_path, "pdf")
+            retriever.add_chunks(
+                [chunk_id(d) for d in docs],
+                chunks,
+                np.vstack([emb_cache[d] for d in docs]),
+                metadatas,
+                page_texts=page_texts if CHUNK_STORE_ENABLED else None,
+            )
+            t_index = time.perf_counter()
+
+            metrics = evaluate_backend(retriever, q_embs, data, ks)
+            row = {
+                "config": name,
+                "chunk_size": size,
+                "chunk_overlap": overlap,
+                "chunks": len(docs),
+                "embedded_new": len(new_docs),
+                "chunk_s": t_chunk - t_start,
+                "embed_s": t_embed - t_chunk,
+                "index_s": t_index - t_embed,
+                "ingest_s": t_index - t_start,
+                "index_bytes": dir_size_bytes(db_path),
+                "query_ms": metrics["search_ms_per_query"],
+                "recall": dict(zip(map(str, ks), metrics["recall"].tolist())),
+                "mrr": dict(zip(map(str, ks), metrics["mrr"].tolist())),
+            }
+            results["configs"].append(row)
+            log_line(f"[SWEEP] config={name} END chunks={len(docs)} new={len(new_docs)}")
+
+            recall_str = " ".join(f"R@{k}={v:.3f}" for k, v in row["recall"].items())
+            print(
+                f"{name:10s} chunks={row['chunks']:6d} new_emb={row['embedded_new']:6d} "
+                f"ingest={row['ingest_s']:7.1f}s index={row['index_bytes'] / 1e6:6.1f}MB "
+                f"query={row['query_ms']:6.2f}ms {recall_str}"
+            )
+
+    write_json(args.out, results)
+    print(f"Ergebnisse in: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# tests/sweep_hnsw_ef.py
+#
+# Recall vs. Suchlatenz über verschiedene HNSW-search_ef-Werte.
+#
+# Die Embeddings einer bestehenden Collection werden für jeden ef-Wert in eine
+# In-Memory-Collection mit den HNSW-Parametern aus config (bzw. --m /
+# --construction-ef) geladen. Recall@k ist der Anteil der exakten k nächsten
+# Nachbarn (Brute Force mit NumPy, gleiche Distanz wie der Index), den die
+# HNSW-Suche findet; gemessen wird die Latenz pro Einzel-Query.
+#
+#   python -m tests.sweep_hnsw_ef --efs 10,20,40,80,160
+#   python -m tests.sweep_hnsw_ef --queries sample --n-sample 500   # ohne Embedding-Modell
+#
+# Ergebnis: bench/hnsw_ef.json und Diagramm bench/hnsw_ef.png
+
+import argparse
+import json
+import time
+
+import chromadb
+import numpy as np
+
+import config
+from config import DB_PATH, EMBED_MODEL, HNSW_M, HNSW_CONSTRUCTION_EF, RANDOM_SEED
+from rag.retriever import Retriever, bulk_add, distances, hnsw_metadata, max_batch_size
+from tests.bench_common import latency_summary, run_metadata, write_json
+from tests.test_retrieval import TEST_DATA_PATH
+
+OUT_PATH = "bench/hnsw_ef.json"
+PLOT_PATH = "bench/hnsw_ef.png"
+
+
+def load_embeddings(retriever: Retriever, page_size: int = 5000) -> tuple[list[str], np.ndarray]:
+    """Alle IDs und Embeddings einer Collection (seitenweise gelesen)."""
+    ids: list[str] = []
+    parts: list[np.ndarray] = []
+    n = retriever.count()
+    for offset in range(0, n, page_size):
+        page = retriever.col.get(limit=page_size, offset=offset, include=["embeddings"])
+        ids.extend(page["ids"])
+        parts.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return ids, np.vstack(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+
+def exact_neighbors(embs: np.ndarray, queries: np.ndarray, k: int, space: str) -> list[set[int]]:
+    out = []
+    for q in queries:
+        d = distances(embs, q, space)
+        n = min(k, len(d))
+        out.append(set(np.argpartition(d, n - 1)[:n].tolist()))
+    return out
+
+
+def plot(results: list[dict], k: int, path: str):
+    import matplotlib.pyplot as plt
+
+    plt.rcParams["font.family"] = "serif"
+    fig, ax = plt.subplots(figsize=(7, 4.5))
+    xs = [r["latency_ms"]["p50"] for r in results]
+    ys = [r["recall"] for r in results]
+    ax.plot(xs, ys, marker="o", linestyle="-", color="#1f77b4")
+    for r, x, y in zip(results, xs, ys):
+        ax.annotate(f"ef={r['ef']}", (x, y), textcoords="offset points", xytext=(5, -12), fontsize=9)
+    ax.set_xlabel("Suchlatenz p50 [ms]")
+    ax.set_ylabel(f"Recall@{k} (vs. exakte Suche)")
+    ax.set_title("HNSW: Recall vs. Latenz über search_ef")
+    ax.set_ylim(min(ys) - 0.05 if ys else 0.0, 1.01)
+    ax.grid(True, linestyle=":", alpha=0.6)
+    plt.tight_layout()
+    plt.savefig(path, dpi=150, bbox_inches="tight")
+    print(f"Diagramm: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HNSW search_ef: Recall vs. Latenz")
+    parser.add_argument("--db-path", default=DB_PATH)
+    parser.add_argument("--collection", default="pdf")
+    parser.add_argument("--efs", default="10,20,40,80,160,320")
+    parser.add_argument("--k", type=int, default=config.TOP_K)
+    parser.add_argument("--m", type=int, default=HNSW_M)
+    parser.add_argument("--construction-ef", type=int, default=HNSW_CONSTRUCTION_EF)
+    parser.add_argument("--queries", choices=["test", "sample"], default="test",
+                        help="test = Fragen aus --data einbetten, sample = gespeicherte Embeddings als Queries")
+    parser.add_argument("--data", default=TEST_DATA_PATH)
+    parser.add_argument("--n-sample", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="Messdurchläufe pro ef")
+    parser.add_argument("--out", default=OUT_PATH)
+    parser.add_argument("--plot", default=PLOT_PATH)
+    args = parser.parse_args()
+
+    efs = sorted({int(x) for x in args.efs.split(",") if x.strip()})
+
+    source = Retriever(args.db_path, args.collection)
+    ids, embs = load_embeddings(source)
+    if not ids:
+        parser.error(f"Collection {args.collection} in {args.db_path} ist leer")
+    space = config.HNSW_SPACE
+
+    if args.queries == "test":
+        from rag.embeddings import Embedder
+
+        with open(args.data, encoding="utf-8") as f:
+            data = json.load(f)
+        queries = Embedder(EMBED_MODEL).encode([d["question"] for d in data])
+    else:
+        rng = np.random.RandomState(RANDOM_SEED)
+        queries = embs[rng.choice(len(ids), size=min(args.n_sample, len(ids)), replace=False)]
+
+    k = min(args.k, len(ids))
+    truth = exact_neighbors(embs, queries, k, space)
+    index_of = {cid: i for i, cid in enumerate(ids)}
+    print(f"{len(ids)} Vektoren, {len(queries)} Queries, k={k}, space={space}, M={args.m}")
+
+    client = chromadb.EphemeralClient()
+    batch_size = max_batch_size(client)
+    results = []
+    for ef in efs:
+        meta = hnsw_metadata(search_ef=ef)
+        meta.update({"hnsw:M": args.m, "hnsw:construction_ef": args.construction_ef})
+        name = f"ef-sweep-{ef}"
+        col = client.create_collection(name, metadata=meta)
+        t0 = time.perf_counter()
+        bulk_add(col, batch_size, ids, embs)
+        build_s = time.perf_counter() - t0
+
+        latencies: list[float] = []
+        hits = 0
+        for rep in range(args.repeat):
+            for qi, q in enumerate(queries):
+                t0 = time.perf_counter()
+                res = col.query(query_embeddings=[q], n_results=k, include=[])
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                if rep == 0:
+                    found = {index_of[cid] for cid in res["ids"][0]}
+                    hits += len(found & truth[qi])
+
+        recall = hits / (k * len(queries))
+        lat = latency_summary(latencies)
+        results.append({"ef": ef, "recall": recall, "latency_ms": lat, "build_s": build_s})
+        print(f"ef={ef:<5} recall@{k}={recall:.4f}  p50={lat['p50']:.2f}ms  p95={lat['p95']:.2f}ms")
+        client.delete_collection(name)
+
+    write_json(args.out, {
+        "meta": run_metadata(),
+        "config": {
+            "db_path": args.db_path, "collection": args.collection, "n_vectors": len(ids),
+            "n_queries": len(queries), "k": k, "space": space, "m": args.m,
+            "construction_ef": args.construction_ef, "queries": args.queries,
+        },
+        "results": results,
+    })
+    print(f"Ergebnis: {args.out}")
+    plot(results, k, args.plot)
+
+
+if __name__ == "__main__":
+    main()
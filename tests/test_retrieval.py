@@ -1,32 +1,139 @@
+# tests/test_retrieval.py
+#
+# Retrieval-Evaluation mit k-Sweep.
+#
+# Alle Fragen werden in einem Aufruf eingebettet und mit EINER Multi-Query-Suche
+# pro Backend abgefragt. Gold-Chunks werden über ihre IDs gematcht; Recall@k,
+# MRR@k und nDCG@k werden für alle k gleichzeitig vektorisiert berechnet.
+# Mehrere Backends (Vektor-DB-Pfad und Collection) werden nebeneinander
+# verglichen:
+#
+#   python -m tests.test_retrieval --ks 1,3,5,10,20,50
+#   python -m tests.test_retrieval --backend ./vector_db:pdf --backend /tmp/db_c200:pdf
+#
+# Testdaten: Einträge mit "question" und entweder "gold_ids" (Liste von
+# Chunk-IDs) oder "gold_chunk" (Text; wird über die Collection auf IDs
+# aufgelöst – exakte Übereinstimmung, sonst Teilstring).
+
+import argparse
 import json
-from rag.pipeline import PDFRAG
-from tests.metrics import recall_at_k, mrr
+import time
+
+import numpy as np
+
+from config import DB_PATH, EMBED_MODEL, log_line
+from rag.embeddings import Embedder
+from rag.retriever import Retriever
+from tests.metrics import relevance_matrix, retrieval_metrics
+
+TEST_DATA_PATH = "tests/test_data.json"
+DEFAULT_KS = "1,3,5,10,20"
+
+
+def parse_backend(spec: str) -> tuple[str, str]:
+    """ "pfad[:collection]" -> (pfad, collection) """
+    path, _, collection = spec.partition(":")
+    return path, collection or "pdf"
+
+
+def resolve_gold_ids(retriever: Retriever, data: list[dict]) -> list[set[str]]:
+    """
+    Ermittelt pro Testeintrag die Menge der Gold-Chunk-IDs in diesem Backend.
+    """
+    need_text = any("gold_ids" not in d for d in data)
+    all_ids: list[str] = []
+    all_docs: list[str] = []
+    if need_text:
+        all_ids = retriever.all_ids()
+        all_docs = [t or "" for t in retriever.texts(all_ids)]
+
+    golds: list[set[str]] = []
+    for d in data:
+        if "gold_ids" in d:
+            golds.append(set(d["gold_ids"]))
+            continue
+        text = d.get("gold_chunk", "")
+        exact = {i for i, doc in zip(all_ids, all_docs) if doc == text}
+        if not exact and text:
+            exact = {i for i, doc in zip(all_ids, all_docs) if text in doc}
+        if not exact:
+            print(f"WARNUNG: gold_chunk nicht im Index ({retriever.collection_name}): {d['question']}")
+        golds.append(exact)
+    return golds
+
+
+def evaluate_backend(retriever: Retriever, q_embs: np.ndarray, data: list[dict], ks: list[int]) -> dict:
+    k_max = max(ks)
+    gold = resolve_gold_ids(retriever, data)
+
+    t0 = time.perf_counter()
+    results = retriever.search_many(q_embs, k_max)
+    search_s = time.perf_counter() - t0
+
+    rel = relevance_matrix([r["ids"] for r in results], gold, k_max)
+    n_gold = np.array([len(g) for g in gold])
+    metrics = retrieval_metrics(rel, n_gold, ks)
+    metrics["search_ms_per_query"] = search_s * 1000.0 / max(1, len(data))
+    metrics["queries_without_gold"] = int((n_gold == 0).sum())
+    return metrics
+
+
+def print_table(rows: dict[str, dict], ks: list[int]):
+    header = f"{'Backend':40s} " + " ".join(f"{'R@' + str(k):>7s}" for k in ks)
+    header += " " + " ".join(f"{'MRR@' + str(k):>7s}" for k in ks)
+    header += " " + " ".join(f"{'nDCG@' + str(k):>8s}" for k in ks)
+    header += f" {'ms/q':>7s}"
+    print(header)
+    print("-" * len(header))
+    for name, m in rows.items():
+        line = f"{name[:40]:40s} "
+        line += " ".join(f"{v:7.3f}" for v in m["recall"])
+        line += " " + " ".join(f"{v:7.3f}" for v in m["mrr"])
+        line += " " + " ".join(f"{v:8.3f}" for v in m["ndcg"])
+        line += f" {m['search_ms_per_query']:7.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval-Evaluation mit k-Sweep")
+    parser.add_argument("--data", default=TEST_DATA_PATH)
+    parser.add_argument("--ks", default=DEFAULT_KS, help="kommagetrennte Cutoffs")
+    parser.add_argument("--backend", action="append",
+                        help="pfad[:collection], mehrfach angebbar (Default: DB_PATH:pdf)")
+    parser.add_argument("--ingest", action="store_true", help="PDFs vorher in DB_PATH indizieren")
+    parser.add_argument("--out", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    ks = sorted({int(k) for k in args.ks.split(",") if k.strip()})
+    backends = args.backend or [f"{DB_PATH}:pdf"]
 
-with open("tests/test_data.json", encoding="utf-8") as f:
-    data = json.load(f)
+    with open(args.data, encoding="utf-8") as f:
+        data = json.load(f)
 
-rag = PDFRAG()
-rag.ingest()
+    if args.ingest:
+        from rag.pipeline import PDFRAG
+        PDFRAG().ingest()
 
-r, m = 0, 0
-for d in data:
-    question = d["question"]
-    gold_chunk = d["gold_chunk"]
+    # Alle Fragen in einem Aufruf einbetten
+    embedder = Embedder(EMBED_MODEL)
+    q_embs = embedder.encode([d["question"] for d in data])
 
-    # Query-Embedding
-    q_emb = rag.embedder.encode([question])[0]
+    rows = {}
+    for spec in backends:
+        path, collection = parse_backend(spec)
+        log_line(f"[RETRIEVAL_EVAL] backend={path}:{collection} queries={len(data)} ks={ks}")
+        rows[f"{path}:{collection}"] = evaluate_backend(Retriever(path, collection), q_embs, data, ks)
 
-    # Top-20 Chunks aus der Vector-DB holen
-    docs = rag.retriever.search(q_emb, k=20)
+    print_table(rows, ks)
 
-    # Sicherstellen, dass der Gold-Chunk überhaupt im Index vorkommen KANN:
-    # Optional: Debug-Ausgabe, falls nie gefunden
-    if gold_chunk not in docs:
-        print("WARNUNG: gold_chunk nicht in Top-20 für Frage:")
-        print("Frage:", question)
-        # Du kannst hier auch weiterdebuggen, aber für die Metrik werten wir trotzdem aus.
+    if args.out:
+        serializable = {
+            name: {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in m.items()}
+            for name, m in rows.items()
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"ks": ks, "backends": serializable}, f, indent=2)
 
-    r += recall_at_k(docs, gold_chunk)
-    m += mrr(docs, gold_chunk)
 
-print("Recall@", r / len(data), "MRR", m / len(data))
\ No newline at end of file
+if __name__ == "__main__":
+    main()